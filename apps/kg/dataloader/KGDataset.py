@@ -1,5 +1,7 @@
 import os
+import hashlib
 import numpy as np
+from dgl.data.edge_list import IdMap, read_text_chunks
 
 def _download_and_extract(url, path, filename):
     import shutil, zipfile
@@ -23,6 +25,80 @@ def _download_and_extract(url, path, filename):
                     writer.write(chunk)
             print('Download finished. Unzipping the file...')
 
+def _read_dict(fname, name_col, id_col):
+    '''Read a dictionary of tab-separated names and Ids into an IdMap.
+
+    The Ids must number the distinct names from 0, so that the IdMap maps
+    each name to its Id.
+    '''
+    chunks = list(read_text_chunks(fname, '\t', None, min_cols=2))
+    cols = np.concatenate(chunks) if chunks else np.empty((0, 2), dtype='S1')
+    ids = cols[:, id_col].astype(np.int64)
+    names = np.empty_like(cols[:, name_col])
+    if not np.array_equal(np.sort(ids), np.arange(len(ids))):
+        raise ValueError('Expect the Ids in {} to be 0 to {}.'.format(fname, len(ids) - 1))
+    names[ids] = cols[:, name_col]
+    id_map = IdMap(names)
+    if len(id_map) != len(names):
+        raise ValueError('Expect distinct names in {}.'.format(fname))
+    return id_map
+
+def _lookup(id_map, names):
+    '''Map an array of names to Ids, raising KeyError for unknown names.'''
+    ids = id_map.map(names, add=False)
+    if (ids < 0).any():
+        raise KeyError(names[ids < 0][0])
+    return ids
+
+def _read_ids(fname):
+    '''Read a file of one integer per line.'''
+    with open(fname, 'rb') as f:
+        return np.array(f.read().split()).astype(np.int64)
+
+def _triple_cache_name(fname, encoder, dict_files, skip_first_line):
+    '''Return the name of the file caching the encoded triples of fname.
+
+    The name is keyed on everything the encoded Ids depend on: the size and
+    mtime of the triple file and of the dictionaries, the encoder and the
+    reading options. A change to any of them selects a different cache file.
+    '''
+    key = [encoder, str(bool(skip_first_line))]
+    for f in [fname] + list(dict_files):
+        st = os.stat(f)
+        key.append('{}:{}:{}'.format(os.path.abspath(f), st.st_size, st.st_mtime_ns))
+    digest = hashlib.md5('\n'.join(key).encode()).hexdigest()[:16]
+    return '{}.{}.triples.npy'.format(fname, digest)
+
+def _read_triple_file(fname, encode, encoder, dict_files=(), skip_first_line=False,
+                      chunk_size=1 << 26):
+    '''Read tab-separated triples in chunks with dgl.data.read_text_chunks and
+    encode each chunk with one vectorized call.
+
+    The encoded (3, N) int64 array is cached next to the file. encoder names
+    the encoding and dict_files lists the files it reads, so that the cache
+    is not reused once the encoding or the dictionaries change.
+    '''
+    cache = _triple_cache_name(fname, encoder, dict_files, skip_first_line)
+    if os.path.exists(cache):
+        return np.load(cache)
+
+    chunks = []
+    for cols in read_text_chunks(fname, '\t', None, 1 if skip_first_line else 0, 3, chunk_size):
+        if cols.shape[1] != 3:
+            raise ValueError('Expect 3 tab-separated columns in {}, got {}.'.format(
+                fname, cols.shape[1]))
+        chunks.append(encode(cols))
+    triples = np.concatenate(chunks, axis=1) if chunks else np.empty((3, 0), dtype=np.int64)
+
+    try:
+        tmp = cache + '.tmp.npy'
+        np.save(tmp, triples)
+        os.replace(tmp, cache)
+    except OSError:
+        # the dataset directory may be read-only
+        pass
+    return triples
+
 class KGDataset1:
     '''Load a knowledge graph with format 1
 
@@ -45,21 +121,8 @@ class KGDataset1:
             _download_and_extract(url, path, name + '.zip')
         path = os.path.join(path, name)
 
-        with open(os.path.join(path, 'entities.dict')) as f:
-            entity2id = {}
-            for line in f:
-                eid, entity = line.strip().split('\t')
-                entity2id[entity] = int(eid)
-
-        self.entity2id = entity2id
-
-        with open(os.path.join(path, 'relations.dict')) as f:
-            relation2id = {}
-            for line in f:
-                rid, relation = line.strip().split('\t')
-                relation2id[relation] = int(rid)
-
-        self.relation2id = relation2id
+        self.entity2id = _read_dict(os.path.join(path, 'entities.dict'), 1, 0)
+        self.relation2id = _read_dict(os.path.join(path, 'relations.dict'), 1, 0)
 
         # TODO: to deal with contries dataset.
 
@@ -74,18 +137,13 @@ class KGDataset1:
 
     def read_triple(self, path, mode):
         # mode: train/valid/test
-        heads = []
-        tails = []
-        rels = []
-        with open(os.path.join(path, '{}.txt'.format(mode))) as f:
-            for line in f:
-                h, r, t = line.strip().split('\t')
-                heads.append(self.entity2id[h])
-                rels.append(self.relation2id[r])
-                tails.append(self.entity2id[t])
-        heads = np.array(heads, dtype=np.int64)
-        tails = np.array(tails, dtype=np.int64)
-        rels = np.array(rels, dtype=np.int64)
+        def encode(cols):
+            return np.stack([_lookup(self.entity2id, cols[:, 0]),
+                             _lookup(self.relation2id, cols[:, 1]),
+                             _lookup(self.entity2id, cols[:, 2])])
+        heads, rels, tails = _read_triple_file(
+            os.path.join(path, '{}.txt'.format(mode)), encode, 'dict',
+            [os.path.join(path, 'entities.dict'), os.path.join(path, 'relations.dict')])
 
         return (heads, rels, tails)
 
@@ -132,21 +190,13 @@ class KGDataset2:
                 self.test = self.read_triple(self.path, 'test')
 
     def read_triple(self, path, mode, skip_first_line=False):
-        heads = []
-        tails = []
-        rels = []
         print('Reading {} triples....'.format(mode))
-        with open(os.path.join(path, '{}.txt'.format(mode))) as f:
-            if skip_first_line:
-                _ = f.readline()
-            for line in f:
-                h, t, r = line.strip().split('\t')
-                heads.append(int(h))
-                tails.append(int(t))
-                rels.append(int(r))
-        heads = np.array(heads, dtype=np.int64)
-        tails = np.array(tails, dtype=np.int64)
-        rels = np.array(rels, dtype=np.int64)
+        def encode(cols):
+            # the columns are (head, tail, relation)
+            return cols[:, [0, 2, 1]].T.astype(np.int64)
+        heads, rels, tails = _read_triple_file(
+            os.path.join(path, '{}.txt'.format(mode)), encode, 'raw_ids',
+            skip_first_line=skip_first_line)
         print('Finished. Read {} {} triples.'.format(len(heads), mode))
         return (heads, rels, tails)
 
@@ -174,15 +224,8 @@ def get_partition_dataset(data_path, data_name, format_str, part_id):
 
     path = os.path.join(data_path, part_name)
 
-    partition_book = []
-    with open(os.path.join(path, 'partition_book.txt')) as f:
-        for line in f:
-            partition_book.append(int(line))
-
-    local_to_global = []
-    with open(os.path.join(path, 'local_to_global.txt')) as f:
-        for line in f:
-            local_to_global.append(int(line))
+    partition_book = _read_ids(os.path.join(path, 'partition_book.txt')).tolist()
+    local_to_global = _read_ids(os.path.join(path, 'local_to_global.txt')).tolist()
 
     return dataset, partition_book, local_to_global
 
@@ -199,18 +242,10 @@ def get_server_partition_dataset(data_path, data_name, format_str, part_id):
 
     path = os.path.join(data_path, part_name)
 
-    n_entities = len(open(os.path.join(path, 'partition_book.txt')).readlines())
-
-    local_to_global = []
-    with open(os.path.join(path, 'local_to_global.txt')) as f:
-        for line in f:
-            local_to_global.append(int(line))
-
-    global_to_local = [0] * n_entities
-    for i in range(len(local_to_global)):
-        global_id = local_to_global[i]
-        global_to_local[global_id] = i
+    n_entities = len(_read_ids(os.path.join(path, 'partition_book.txt')))
+    local_to_global = _read_ids(os.path.join(path, 'local_to_global.txt'))
 
-    local_to_global = None
+    global_to_local = np.zeros(n_entities, dtype=np.int64)
+    global_to_local[local_to_global] = np.arange(len(local_to_global))
 
-    return global_to_local, dataset
+    return global_to_local.tolist(), dataset
@@ -10,7 +10,67 @@ import time
 
 from dgl.base import NID, EID
 
-def SoftRelationPartition(edges, n, threshold=0.05):
+def _load_partition_plan(cache_file, cnts):
+    """Load the partition plan saved for the same relation counts."""
+    if cache_file is None or not os.path.exists(cache_file):
+        return None
+    plan = np.load(cache_file)
+    if not np.array_equal(plan['cnts'], cnts):
+        return None
+    print('Load relation partition from ' + cache_file)
+    return plan['seg_rel'], plan['seg_part'], plan['seg_cnt'], \
+        int(plan['num_cross_part']), plan['cross_rels']
+
+def _save_partition_plan(cache_file, cnts, seg_rel, seg_part, seg_cnt, num_cross_part, cross_rels):
+    """Save the partition plan of the relation counts."""
+    if cache_file is not None:
+        np.savez(cache_file, cnts=cnts, seg_rel=seg_rel, seg_part=seg_part, seg_cnt=seg_cnt,
+                 num_cross_part=num_cross_part, cross_rels=cross_rels)
+
+def _sorted_relations(cnts):
+    """Return the relations with edges in the descending order of their counts."""
+    rel_ids = np.nonzero(cnts)[0]
+    return rel_ids[np.argsort(-cnts[rel_ids], kind='stable')]
+
+def _apply_partition_plan(edges, n, seg_rel, seg_part, seg_cnt, num_cross_part):
+    """Shuffle the edges into partitions as planned by the segments.
+
+    Segment i puts seg_cnt[i] edges of relation seg_rel[i] into partition
+    seg_part[i]. The edges of a relation are assigned to its segments in the
+    order of their appearance. After the shuffle, the edges of each partition
+    are grouped by relation.
+
+    Returns
+    -------
+    List of np.array
+        Edges of each partition
+    List of np.array
+        Edge types of each partition
+    """
+    heads, rels, tails = edges
+    # stable sorts of 16-bit keys are radix sorts
+    rel_key = rels.astype(np.uint16) if len(rels) > 0 and rels.max() < (1 << 16) else rels
+    edge_order = np.argsort(rel_key, kind='stable')
+    seg_order = np.argsort(seg_rel, kind='stable')
+    edge_part = np.repeat(seg_part[seg_order], seg_cnt[seg_order])
+    if n < (1 << 15):
+        edge_part = edge_part.astype(np.int16)
+    shuffle_idx = edge_order[np.argsort(edge_part, kind='stable')]
+    heads[:] = heads[shuffle_idx]
+    rels[:] = rels[shuffle_idx]
+    tails[:] = tails[shuffle_idx]
+
+    edge_cnts = np.bincount(seg_part, weights=seg_cnt, minlength=n).astype(np.int64)
+    offsets = np.cumsum(edge_cnts) - edge_cnts
+    parts = [np.arange(offsets[i], offsets[i] + edge_cnts[i]) for i in range(n)]
+    rel_parts = [np.unique(seg_rel[seg_part == i]) for i in range(n)]
+    for i, edge_cnt in enumerate(edge_cnts):
+        print('part {} has {} edges and {} relations'.format(i, edge_cnt, len(rel_parts[i])))
+    print('{}/{} duplicated relation across partitions'.format(num_cross_part,
+                                                               len(np.unique(seg_rel))))
+    return parts, rel_parts
+
+def SoftRelationPartition(edges, n, threshold=0.05, cache_file=None):
     """This partitions a list of edges to n partitions according to their
     relation types. For any relation with number of edges larger than the
     threshold, its edges will be evenly distributed into all partitions.
@@ -25,6 +85,9 @@ def SoftRelationPartition(edges, n, threshold=0.05):
             Find partition with fewest edges, and put edges of r into 
             this partition.
 
+    Only the loop over the small relations is sequential. The edges are
+    assigned to the partitions with vectorized sorts.
+
     Parameters
     ----------
     edges : (heads, rels, tails) triple
@@ -34,6 +97,10 @@ def SoftRelationPartition(edges, n, threshold=0.05):
     threshold : float
         The threshold of whether a relation is LARGE or SMALL
         Default: 5%
+    cache_file : str
+        If given, the partition plan is saved into this file and reused
+        by later runs with the same relation counts.
+        Default: None
 
     Returns
     -------
@@ -43,87 +110,49 @@ def SoftRelationPartition(edges, n, threshold=0.05):
         Edge types of each partition
     bool
         Whether there exists some relations belongs to multiple partitions
+    np.array
+        Relations belonging to multiple partitions
     """
     heads, rels, tails = edges
     print('relation partition {} edges into {} parts'.format(len(heads), n))
-    uniq, cnts = np.unique(rels, return_counts=True)
-    idx = np.flip(np.argsort(cnts))
-    cnts = cnts[idx]
-    uniq = uniq[idx]
-    assert cnts[0] > cnts[-1]
-    edge_cnts = np.zeros(shape=(n,), dtype=np.int64)
-    rel_cnts = np.zeros(shape=(n,), dtype=np.int64)
-    rel_dict = {}
-    rel_parts = []
-    cross_rel_part = []
-    for _ in range(n):
-        rel_parts.append([])
-
-    large_threshold = int(len(rels) * threshold)
-    capacity_per_partition = int(len(rels) / n)
-    # ensure any relation larger than the partition capacity will be split
-    large_threshold = capacity_per_partition if capacity_per_partition < large_threshold \
-                      else large_threshold
-    num_cross_part = 0
-    for i in range(len(cnts)):
-        cnt = cnts[i]
-        r = uniq[i]
-        r_parts = []
-        if cnt > large_threshold:
-            avg_part_cnt = (cnt // n) + 1
-            num_cross_part += 1
-            for j in range(n):
-                part_cnt = avg_part_cnt if cnt > avg_part_cnt else cnt
-                r_parts.append([j, part_cnt])
-                rel_parts[j].append(r)
-                edge_cnts[j] += part_cnt
-                rel_cnts[j] += 1
-                cnt -= part_cnt
-            cross_rel_part.append(r)
-        else:
+    cnts = np.bincount(rels)
+    plan = _load_partition_plan(cache_file, cnts)
+    if plan is None:
+        rel_ids = _sorted_relations(cnts)
+        assert cnts[rel_ids[0]] > cnts[rel_ids[-1]]
+        large_threshold = int(len(rels) * threshold)
+        capacity_per_partition = int(len(rels) / n)
+        # ensure any relation larger than the partition capacity will be split
+        large_threshold = min(capacity_per_partition, large_threshold)
+        large = rel_ids[cnts[rel_ids] > large_threshold]
+        small = rel_ids[cnts[rel_ids] <= large_threshold]
+
+        # partition j takes min(avg, remaining) edges of a large relation
+        large_cnts = cnts[large][:, None]
+        avg_part_cnt = large_cnts // n + 1
+        part_cnts = np.clip(large_cnts - avg_part_cnt * np.arange(n)[None, :], 0, avg_part_cnt)
+        edge_cnts = part_cnts.sum(0)
+        small_parts = np.empty((len(small),), dtype=np.int64)
+        for i, r in enumerate(small):
             idx = np.argmin(edge_cnts)
-            r_parts.append([idx, cnt])
-            rel_parts[idx].append(r)
-            edge_cnts[idx] += cnt
-            rel_cnts[idx] += 1
-        rel_dict[r] = r_parts
-
-    for i, edge_cnt in enumerate(edge_cnts):
-        print('part {} has {} edges and {} relations'.format(i, edge_cnt, rel_cnts[i]))
-    print('{}/{} duplicated relation across partitions'.format(num_cross_part, len(cnts)))
-
-    parts = []
-    for i in range(n):
-        parts.append([])
-        rel_parts[i] = np.array(rel_parts[i])
-
-    for i, r in enumerate(rels):
-        r_part = rel_dict[r][0]
-        part_idx = r_part[0]
-        cnt = r_part[1]
-        parts[part_idx].append(i)
-        cnt -= 1
-        if cnt == 0:
-            rel_dict[r].pop(0)
-        else:
-            rel_dict[r][0][1] = cnt
-
-    for i, part in enumerate(parts):
-        parts[i] = np.array(part, dtype=np.int64)
-    shuffle_idx = np.concatenate(parts)
-    heads[:] = heads[shuffle_idx]
-    rels[:] = rels[shuffle_idx]
-    tails[:] = tails[shuffle_idx]
-
-    off = 0
-    for i, part in enumerate(parts):
-        parts[i] = np.arange(off, off + len(part))
-        off += len(part)
-    cross_rel_part = np.array(cross_rel_part)
+            small_parts[i] = idx
+            edge_cnts[idx] += cnts[r]
+
+        seg_rel = np.concatenate([np.repeat(large, n), small])
+        seg_part = np.concatenate([np.tile(np.arange(n), len(large)), small_parts])
+        seg_cnt = np.concatenate([part_cnts.reshape(-1), cnts[small]])
+        num_cross_part = len(large)
+        cross_rels = large
+        _save_partition_plan(cache_file, cnts, seg_rel, seg_part, seg_cnt,
+                             num_cross_part, cross_rels)
+    else:
+        seg_rel, seg_part, seg_cnt, num_cross_part, cross_rels = plan
 
-    return parts, rel_parts, num_cross_part > 0, cross_rel_part
+    parts, rel_parts = _apply_partition_plan(edges, n, seg_rel, seg_part, seg_cnt,
+                                             num_cross_part)
+    return parts, rel_parts, num_cross_part > 0, cross_rels
 
-def BalancedRelationPartition(edges, n):
+def BalancedRelationPartition(edges, n, cache_file=None):
     """This partitions a list of edges based on relations to make sure
     each partition has roughly the same number of edges and relations.
     Algo:
@@ -135,12 +164,19 @@ def BalancedRelationPartition(edges, n):
       else
          put edges of r into this partition.
 
+    Only the loop over the relations is sequential. The edges are assigned
+    to the partitions with vectorized sorts.
+
     Parameters
     ----------
     edges : (heads, rels, tails) triple
         Edge list to partition
     n : int
         number of partitions
+    cache_file : str
+        If given, the partition plan is saved into this file and reused
+        by later runs with the same relation counts.
+        Default: None
 
     Returns
     -------
@@ -153,76 +189,91 @@ def BalancedRelationPartition(edges, n):
     """
     heads, rels, tails = edges
     print('relation partition {} edges into {} parts'.format(len(heads), n))
-    uniq, cnts = np.unique(rels, return_counts=True)
-    idx = np.flip(np.argsort(cnts))
-    cnts = cnts[idx]
-    uniq = uniq[idx]
-    assert cnts[0] > cnts[-1]
-    edge_cnts = np.zeros(shape=(n,), dtype=np.int64)
-    rel_cnts = np.zeros(shape=(n,), dtype=np.int64)
-    rel_dict = {}
-    rel_parts = []
-    for _ in range(n):
-        rel_parts.append([])
-
-    max_edges = (len(rels) // n) + 1
-    num_cross_part = 0
-    for i in range(len(cnts)):
-        cnt = cnts[i]
-        r = uniq[i]
-        r_parts = []
-
-        while cnt > 0:
-            idx = np.argmin(edge_cnts)
-            if edge_cnts[idx] + cnt <= max_edges:
-                r_parts.append([idx, cnt])
-                rel_parts[idx].append(r)
-                edge_cnts[idx] += cnt
-                rel_cnts[idx] += 1
-                cnt = 0
-            else:
-                cur_cnt = max_edges - edge_cnts[idx]
-                r_parts.append([idx, cur_cnt])
-                rel_parts[idx].append(r)
+    cnts = np.bincount(rels)
+    plan = _load_partition_plan(cache_file, cnts)
+    if plan is None:
+        rel_ids = _sorted_relations(cnts)
+        assert cnts[rel_ids[0]] > cnts[rel_ids[-1]]
+        edge_cnts = np.zeros(shape=(n,), dtype=np.int64)
+        max_edges = (len(rels) // n) + 1
+        num_cross_part = 0
+        seg_rel, seg_part, seg_cnt = [], [], []
+        for r in rel_ids:
+            cnt = cnts[r]
+            while cnt > 0:
+                idx = np.argmin(edge_cnts)
+                cur_cnt = min(cnt, max_edges - edge_cnts[idx])
+                if cur_cnt < cnt:
+                    num_cross_part += 1
+                seg_rel.append(r)
+                seg_part.append(idx)
+                seg_cnt.append(cur_cnt)
                 edge_cnts[idx] += cur_cnt
-                rel_cnts[idx] += 1
-                num_cross_part += 1
                 cnt -= cur_cnt
-        rel_dict[r] = r_parts
+        seg_rel = np.array(seg_rel, dtype=np.int64)
+        seg_part = np.array(seg_part, dtype=np.int64)
+        seg_cnt = np.array(seg_cnt, dtype=np.int64)
+        _save_partition_plan(cache_file, cnts, seg_rel, seg_part, seg_cnt,
+                             num_cross_part, np.empty((0,), dtype=np.int64))
+    else:
+        seg_rel, seg_part, seg_cnt, num_cross_part, _ = plan
 
-    for i, edge_cnt in enumerate(edge_cnts):
-        print('part {} has {} edges and {} relations'.format(i, edge_cnt, rel_cnts[i]))
-    print('{}/{} duplicated relation across partitions'.format(num_cross_part, len(cnts)))
+    parts, rel_parts = _apply_partition_plan(edges, n, seg_rel, seg_part, seg_cnt,
+                                             num_cross_part)
+    return parts, rel_parts, num_cross_part > 0
 
-    parts = []
-    for i in range(n):
-        parts.append([])
-        rel_parts[i] = np.array(rel_parts[i])
-
-    for i, r in enumerate(rels):
-        r_part = rel_dict[r][0]
-        part_idx = r_part[0]
-        cnt = r_part[1]
-        parts[part_idx].append(i)
-        cnt -= 1
-        if cnt == 0:
-            rel_dict[r].pop(0)
-        else:
-            rel_dict[r][0][1] = cnt
+def RelationPartitionCSR(rels, parts):
+    """Build the CSR of relation -> edges of each partition created by
+    SoftRelationPartition or BalancedRelationPartition, whose edges are
+    grouped by relation.
 
-    for i, part in enumerate(parts):
-        parts[i] = np.array(part, dtype=np.int64)
-    shuffle_idx = np.concatenate(parts)
-    heads[:] = heads[shuffle_idx]
-    rels[:] = rels[shuffle_idx]
-    tails[:] = tails[shuffle_idx]
+    Parameters
+    ----------
+    rels : np.array
+        Edge types of the partitioned edges.
+    parts : List of np.array
+        Edges of each partition.
 
-    off = 0
-    for i, part in enumerate(parts):
-        parts[i] = np.arange(off, off + len(part))
-        off += len(part)
+    Returns
+    -------
+    List of (np.array, np.array)
+        The relations of each partition and the offsets of their edges. The
+        edges of relation rel_ids[k] are part[indptr[k]:indptr[k + 1]].
+    """
+    csrs = []
+    for part in parts:
+        part_rels = rels[part]
+        bounds = np.flatnonzero(part_rels[1:] != part_rels[:-1]) + 1
+        indptr = np.concatenate([[0], bounds, [len(part_rels)]]) if len(part_rels) > 0 \
+            else np.zeros((1,), dtype=np.int64)
+        csrs.append((part_rels[indptr[:-1]], indptr))
+    return csrs
+
+def CrossRelationStats(rel_csrs, n_relations):
+    """Statistics of the relations belonging to multiple partitions.
 
-    return parts, rel_parts, num_cross_part > 0
+    Parameters
+    ----------
+    rel_csrs : List of (np.array, np.array)
+        The CSR of relation -> edges of each partition.
+    n_relations : int
+        Number of relations.
+
+    Returns
+    -------
+    dict
+        The number of cross-partition relations, their number of edges and
+        the maximal number of partitions of a relation.
+    """
+    num_parts = np.zeros((n_relations,), dtype=np.int64)
+    num_edges = np.zeros((n_relations,), dtype=np.int64)
+    for rel_ids, indptr in rel_csrs:
+        num_parts[rel_ids] += 1
+        num_edges[rel_ids] += np.diff(indptr)
+    cross = num_parts > 1
+    return {'num_cross_rels': int(cross.sum()),
+            'num_cross_edges': int(num_edges[cross].sum()),
+            'max_parts_per_rel': int(num_parts.max()) if n_relations > 0 else 0}
 
 def RandomPartition(edges, n):
     """This partitions a list of edges randomly across n partitions
@@ -299,12 +350,19 @@ class TrainDataset(object):
         num_train = len(triples[0])
         print('|Train|:', num_train)
 
+        # The pickled graph depends on the edge order of the partitions,
+        # so the partition plan is cached together with it.
+        cache_dir = os.path.join(args.data_path, args.dataset)
         if ranks > 1 and args.soft_rel_part:
+            cache_file = os.path.join(cache_dir, 'soft_rel_part_{}.npz'.format(ranks)) \
+                if args.pickle_graph else None
             self.edge_parts, self.rel_parts, self.cross_part, self.cross_rels = \
-            SoftRelationPartition(triples, ranks)
+            SoftRelationPartition(triples, ranks, cache_file=cache_file)
         elif ranks > 1 and args.rel_part:
+            cache_file = os.path.join(cache_dir, 'rel_part_{}.npz'.format(ranks)) \
+                if args.pickle_graph else None
             self.edge_parts, self.rel_parts, self.cross_part = \
-                BalancedRelationPartition(triples, ranks)
+                BalancedRelationPartition(triples, ranks, cache_file=cache_file)
         elif ranks > 1:
             self.edge_parts = RandomPartition(triples, ranks)
             self.cross_part = True
@@ -313,6 +371,12 @@ class TrainDataset(object):
             self.rel_parts = [np.arange(dataset.n_relations)]
             self.cross_part = False
 
+        if ranks > 1 and (args.soft_rel_part or args.rel_part):
+            self.rel_csrs = RelationPartitionCSR(triples[1], self.edge_parts)
+            stats = CrossRelationStats(self.rel_csrs, dataset.n_relations)
+            print('{} cross-partition relations with {} edges, at most in {} partitions'.format(
+                stats['num_cross_rels'], stats['num_cross_edges'], stats['max_parts_per_rel']))
+
         self.g = ConstructGraph(triples, dataset.n_entities, args)
 
     def create_sampler(self, batch_size, neg_sample_size=2, neg_chunk_size=None, mode='head', num_workers=32,
@@ -400,6 +464,39 @@ class ChunkNegEdgeSubgraph(dgl.DGLGraph):
         return self.subg.tail_nid
 
 
+class AllNegNodes(object):
+    """Negative graph wrapper corrupting every positive edge with all nodes.
+
+    It provides the same information as a ChunkNegEdgeSubgraph of a single
+    chunk, but holds no negative edges: the batch_size * num_nodes negative
+    edges are only scored, for a range of nodes at a time.
+
+        Parameters
+        ----------
+        node_ids : tensor
+            The IDs of all nodes.
+        batch_size : int
+            Number of positive edges.
+        neg_head : bool
+            If True, negative_mode is 'head'
+            If False, negative_mode is 'tail'
+    """
+    def __init__(self, node_ids, batch_size, neg_head):
+        self.ndata = {'id': node_ids}
+        self.num_chunks = 1
+        self.chunk_size = batch_size
+        self.neg_sample_size = F.shape(node_ids)[0]
+        self.neg_head = neg_head
+
+    @property
+    def head_nid(self):
+        return self.ndata['id']
+
+    @property
+    def tail_nid(self):
+        return self.ndata['id']
+
+
 def create_neg_subgraph(pos_g, neg_g, chunk_size, neg_sample_size, is_chunked,
                         neg_head, num_nodes):
     """KG models need to know the number of chunks, the chunk size and negative sample size
@@ -452,6 +549,178 @@ def create_neg_subgraph(pos_g, neg_g, chunk_size, neg_sample_size, is_chunked,
     return ChunkNegEdgeSubgraph(neg_g, num_chunks, chunk_size,
                                 neg_sample_size, neg_head)
 
+class SortedCSR(object):
+    """Map int64 keys to sorted lists of int64 values in CSR format.
+
+    Parameters
+    ----------
+    keys : np.array
+        The key of each (key, value) pair.
+    values : np.array
+        The value of each (key, value) pair.
+    """
+    def __init__(self, keys, values):
+        order = np.lexsort((values, keys))
+        self.indices = values[order]
+        self.keys, counts = np.unique(keys[order], return_counts=True)
+        self.indptr = np.zeros((len(self.keys) + 1,), dtype=np.int64)
+        np.cumsum(counts, out=self.indptr[1:])
+
+    def lookup(self, keys):
+        """Get the concatenated lists of keys.
+
+        Only the lists of the given keys are read, so the cost is O(d) per key
+        where d is the length of its list, after a binary search for the key.
+
+        Parameters
+        ----------
+        keys : np.array
+            The keys.
+
+        Returns
+        -------
+        np.array
+            The position in keys of the key of each value.
+        np.array
+            The values.
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        if len(self.keys) == 0:
+            return np.zeros((0,), dtype=np.int64), np.zeros((0,), dtype=np.int64)
+        row = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = self.keys[row] == keys
+        begin = self.indptr[row]
+        degree = np.where(found, self.indptr[row + 1] - begin, 0)
+        key_pos = np.repeat(np.arange(len(keys)), degree)
+        # position of each value in indices, counting from the begin of its list
+        shift = np.repeat(begin - (np.cumsum(degree) - degree), degree)
+        return key_pos, self.indices[np.arange(len(key_pos)) + shift]
+
+class FilterIndex(object):
+    """Index of the known triples of a KG for filtered evaluation.
+
+    It holds two sorted CSR maps, (head, relation) -> tails and
+    (relation, tail) -> heads, built once from all triples. The known triples
+    among the corrupted triples of a batch are then found by scattering the
+    lists of the positive triples into the negative nodes, without querying
+    the graph.
+
+    Parameters
+    ----------
+    heads : np.array
+        Head entity IDs of the triples.
+    rels : np.array
+        Relation IDs of the triples.
+    tails : np.array
+        Tail entity IDs of the triples.
+    """
+    def __init__(self, heads, rels, tails):
+        heads = np.asarray(heads, dtype=np.int64)
+        rels = np.asarray(rels, dtype=np.int64)
+        tails = np.asarray(tails, dtype=np.int64)
+        self.n_relations = int(rels.max()) + 1 if len(rels) > 0 else 1
+        self.n_entities = int(max(heads.max(), tails.max())) + 1 if len(heads) > 0 else 1
+        self.hr2t = SortedCSR(heads * self.n_relations + rels, tails)
+        self.rt2h = SortedCSR(tails * self.n_relations + rels, heads)
+
+    def filter_bias(self, heads, rels, tails, neg_ids, neg_head):
+        """Compute the filter bias of chunks of corrupted triples.
+
+        The cost is O(d log n) per positive triple, where d is the number of
+        known triples sharing its relation and uncorrupted entity and n the
+        number of negative nodes, plus the size of the bias. With sorted
+        negative nodes, e.g. a range of all entities, no sort is needed.
+
+        Parameters
+        ----------
+        heads : np.array
+            Head entity IDs of the positive triples, of shape
+            (num_chunks, chunk_size).
+        rels : np.array
+            Relation IDs of the positive triples, of the same shape.
+        tails : np.array
+            Tail entity IDs of the positive triples, of the same shape.
+        neg_ids : np.array
+            The negative entity IDs of each chunk, of shape
+            (num_chunks, neg_sample_size).
+        neg_head : bool
+            If True, the negative entities replace the heads, otherwise the tails.
+
+        Returns
+        -------
+        np.array
+            Float32 array of shape (num_chunks, chunk_size, neg_sample_size),
+            -1 for the known triples and 0 otherwise.
+        """
+        num_chunks, chunk_size = np.shape(heads)
+        neg_sample_size = np.shape(neg_ids)[1]
+        bias = np.zeros((num_chunks * chunk_size, neg_sample_size), dtype=np.float32)
+        if neg_head:
+            keys = np.asarray(tails, dtype=np.int64) * self.n_relations + rels
+            key_pos, values = self.rt2h.lookup(keys.reshape(-1))
+        else:
+            keys = np.asarray(heads, dtype=np.int64) * self.n_relations + rels
+            key_pos, values = self.hr2t.lookup(keys.reshape(-1))
+        # search the known entities among the negative nodes of their chunk
+        num_ids = max(self.n_entities, int(neg_ids.max()) + 1 if neg_ids.size > 0 else 0)
+        chunk_ids = np.arange(num_chunks, dtype=np.int64)[:, None] * num_ids
+        sorted_ids = (chunk_ids + neg_ids).reshape(-1)
+        order = None
+        if np.any(sorted_ids[1:] < sorted_ids[:-1]):
+            order = np.argsort(sorted_ids, kind='stable')
+            sorted_ids = sorted_ids[order]
+        targets = key_pos // chunk_size * num_ids + values
+        begin = np.searchsorted(sorted_ids, targets, 'left')
+        count = np.searchsorted(sorted_ids, targets, 'right') - begin
+        # every negative node equal to a known entity, including duplicates
+        rows = np.repeat(key_pos, count)
+        pos = np.arange(len(rows)) + np.repeat(begin - (np.cumsum(count) - count), count)
+        if order is not None:
+            pos = order[pos]
+        bias[rows, pos % neg_sample_size] = -1
+        return bias.reshape(num_chunks, chunk_size, neg_sample_size)
+
+class FilterBias(object):
+    """Filter bias of the negative edges of a batch, computed for a range of
+    the negative nodes at a time.
+
+    Only the bias of the negative scores being ranked is kept in memory, so
+    the bias of all entities is never materialized.
+
+    Parameters
+    ----------
+    filter_index : FilterIndex
+        Index of the known triples.
+    pos_g : DGLGraph
+        Graph holding positive edges, with the entity and relation IDs in
+        ndata['id'] and edata['id'].
+    neg_g : ChunkNegEdgeSubgraph
+        Negative graph wrapper, with the entity IDs in ndata['id'].
+    """
+    def __init__(self, filter_index, pos_g, neg_g):
+        num_chunks = neg_g.num_chunks
+        heads, tails = pos_g.all_edges(order='eid')
+        self.filter_index = filter_index
+        self.heads = F.asnumpy(pos_g.ndata['id'][heads]).reshape(num_chunks, -1)
+        self.tails = F.asnumpy(pos_g.ndata['id'][tails]).reshape(num_chunks, -1)
+        self.rels = F.asnumpy(pos_g.edata['id']).reshape(num_chunks, -1)
+        neg_nid = neg_g.head_nid if neg_g.neg_head else neg_g.tail_nid
+        self.neg_ids = F.asnumpy(neg_g.ndata['id'][neg_nid]).reshape(num_chunks, -1)
+        self.neg_head = neg_g.neg_head
+
+    def __call__(self, start, end):
+        """Get the filter bias of the negative nodes from start to end.
+
+        Returns
+        -------
+        tensor
+            The bias of shape (num_chunks * chunk_size, end - start), -1 for the
+            negative edges that are known triples and 0 otherwise.
+        """
+        bias = self.filter_index.filter_bias(self.heads, self.rels, self.tails,
+                                             self.neg_ids[:, start:end], self.neg_head)
+        return F.zerocopy_from_numpy(bias.reshape(-1, end - start))
+
 class EvalSampler(object):
     """Sampler for validation and testing
 
@@ -475,26 +744,40 @@ class EvalSampler(object):
         If True, exlucde true positive edges in sampled negative edges
         If False, return all sampled negative edges even there are positive edges
         Default: True
+    filter_index : FilterIndex
+        Index of the known triples used to find the true positive edges. If
+        None, it is built from the edges of g.
+        Default: None
     """
     def __init__(self, g, edges, batch_size, neg_sample_size, neg_chunk_size, mode, num_workers=32,
-                 filter_false_neg=True):
+                 filter_false_neg=True, filter_index=None):
         EdgeSampler = getattr(dgl.contrib.sampling, 'EdgeSampler')
+        # With all nodes as negative nodes, only positive edges are sampled and
+        # the negative edges of a batch are never created.
+        self.all_neg_nodes = neg_sample_size >= g.number_of_nodes()
+        if self.all_neg_nodes:
+            self.node_ids = F.arange(0, g.number_of_nodes())
         self.sampler = EdgeSampler(g,
                                    batch_size=batch_size,
                                    seed_edges=edges,
-                                   neg_sample_size=neg_sample_size,
+                                   neg_sample_size=0 if self.all_neg_nodes else neg_sample_size,
                                    chunk_size=neg_chunk_size,
-                                   negative_mode=mode,
+                                   negative_mode='' if self.all_neg_nodes else mode,
                                    num_workers=num_workers,
                                    shuffle=False,
                                    exclude_positive=False,
                                    relations=g.edata['tid'],
-                                   return_false_neg=filter_false_neg)
+                                   return_false_neg=False)
         self.sampler_iter = iter(self.sampler)
         self.mode = mode
         self.neg_head = 'head' in mode
         self.g = g
         self.filter_false_neg = filter_false_neg
+        if filter_false_neg and filter_index is None:
+            heads, tails = g.all_edges(order='eid')
+            filter_index = FilterIndex(F.asnumpy(heads), F.asnumpy(g.edata['tid']),
+                                       F.asnumpy(tails))
+        self.filter_index = filter_index
         self.neg_chunk_size = neg_chunk_size
         self.neg_sample_size = neg_sample_size
 
@@ -508,27 +791,30 @@ class EvalSampler(object):
         -------
         DGLGraph
             Sampled positive graph
-        ChunkNegEdgeSubgraph
+        ChunkNegEdgeSubgraph or AllNegNodes
             Negative graph wrapper
         """
-        while True:
-            pos_g, neg_g = next(self.sampler_iter)
-            if self.filter_false_neg:
-                neg_positive = neg_g.edata['false_neg']
-            neg_g = create_neg_subgraph(pos_g, neg_g, 
-                                        self.neg_chunk_size, 
-                                        self.neg_sample_size, 
-                                        'chunk' in self.mode, 
-                                        self.neg_head, 
-                                        self.g.number_of_nodes())
-            if neg_g is not None:
-                break
+        if self.all_neg_nodes:
+            pos_g = next(self.sampler_iter)
+            neg_g = AllNegNodes(self.node_ids, pos_g.number_of_edges(), self.neg_head)
+        else:
+            while True:
+                pos_g, neg_g = next(self.sampler_iter)
+                neg_g = create_neg_subgraph(pos_g, neg_g, 
+                                            self.neg_chunk_size, 
+                                            self.neg_sample_size, 
+                                            'chunk' in self.mode, 
+                                            self.neg_head, 
+                                            self.g.number_of_nodes())
+                if neg_g is not None:
+                    break
+            neg_g.ndata['id'] = neg_g.parent_nid
 
         pos_g.ndata['id'] = pos_g.parent_nid
-        neg_g.ndata['id'] = neg_g.parent_nid
         pos_g.edata['id'] = pos_g._parent.edata['tid'][pos_g.parent_eid]
         if self.filter_false_neg:
-            neg_g.edata['bias'] = F.astype(-neg_positive, F.float32)
+            # the bias is computed for each range of negative nodes being ranked
+            neg_g.filter_bias = FilterBias(self.filter_index, pos_g, neg_g)
         return pos_g, neg_g
 
     def reset(self):
@@ -565,6 +851,7 @@ class EvalDataset(object):
                 with open(os.path.join(args.data_path, args.dataset, pickle_name), 'wb') as graph_file:
                     pickle.dump(g, graph_file)
         self.g = g
+        self.filter_index = None
         self.num_train = len(dataset.train[0])
         self.num_valid = len(dataset.valid[0])
         self.num_test = len(dataset.test[0])
@@ -639,8 +926,25 @@ class EvalDataset(object):
         beg = edges.shape[0] * rank // ranks
         end = min(edges.shape[0] * (rank + 1) // ranks, edges.shape[0])
         edges = edges[beg: end]
+        filter_index = self.get_filter_index() if filter_false_neg else None
         return EvalSampler(self.g, edges, batch_size, neg_sample_size, neg_chunk_size,
-                           mode, num_workers, filter_false_neg)
+                           mode, num_workers, filter_false_neg, filter_index)
+
+    def get_filter_index(self):
+        """Get the index of all triples for filtered evaluation.
+
+        The index is built on the first call and shared by all samplers.
+
+        Returns
+        -------
+        FilterIndex
+            The index.
+        """
+        if self.filter_index is None:
+            heads, tails = self.g.all_edges(order='eid')
+            self.filter_index = FilterIndex(F.asnumpy(heads), F.asnumpy(self.g.edata['tid']),
+                                            F.asnumpy(tails))
+        return self.filter_index
 
 class NewBidirectionalOneShotIterator:
     """Grouped samper iterator
@@ -1,5 +1,6 @@
 from dataloader import EvalDataset, TrainDataset
 from dataloader import get_dataset
+from models import RankingMetrics
 
 import argparse
 import os
@@ -50,6 +51,8 @@ class ArgParser(argparse.ArgumentParser):
                           help='sample some percentage for evaluation.')
         self.add_argument('--no_eval_filter', action='store_true',
                           help='do not filter positive edges among negative edges for evaluation')
+        self.add_argument('--eval_chunk_size', type=int, default=65536,
+                          help='the number of negative nodes scored at a time in evaluation')
 
         self.add_argument('--gpu', type=int, default=[-1], nargs='+',
                           help='a list of active gpu ids, e.g. 0')
@@ -185,16 +188,10 @@ def main(args):
             procs.append(proc)
             proc.start()
 
-        total_metrics = {}
-        metrics = {}
-        logs = []
+        logs = RankingMetrics()
         for i in range(args.num_proc):
-            log = queue.get()
-            logs = logs + log
-
-        for metric in logs[0].keys():
-            metrics[metric] = sum([log[metric] for log in logs]) / len(logs)
-        for k, v in metrics.items():
+            logs.merge(queue.get())
+        for k, v in logs.result().items():
             print('Test average {} at [{}/{}]: {}'.format(k, args.step, args.max_step, v))
 
         for proc in procs:
@@ -74,6 +74,8 @@ class ArgParser(argparse.ArgumentParser):
                           help='sample some percentage for evaluation.')
         self.add_argument('--no_eval_filter', action='store_true',
                           help='do not filter positive edges among negative edges for evaluation')
+        self.add_argument('--eval_chunk_size', type=int, default=65536,
+                          help='the number of negative nodes scored at a time in evaluation')
 
         self.add_argument('--gpu', type=int, default=[-1], nargs='+', 
                           help='a list of active gpu ids, e.g. 0 1 2 4')
@@ -121,6 +123,10 @@ class ArgParser(argparse.ArgumentParser):
                           help='num of omp threads used per process in multi-process training')
         self.add_argument('--async_update', action='store_true',
                           help='allow async_update on node embedding')
+        self.add_argument('--async_update_threads', type=int, default=4,
+                          help='the number of threads applying async_update, each owning a range of node IDs')
+        self.add_argument('--async_max_staleness', type=int, default=2,
+                          help='the maximal number of pending async_update requests per thread')
         self.add_argument('--force_sync_interval', type=int, default=-1,
                           help='We force a synchronization between processes every x steps')
         self.add_argument('--strict_rel_part', action='store_true',
@@ -134,6 +140,15 @@ class ArgParser(argparse.ArgumentParser):
                           help='IP configuration file of kvstore')
         self.add_argument('--num_client', type=int, default=1,
                           help='Number of client on each machine.')
+        self.add_argument('--cache_size', type=int, default=0,
+                          help='Number of entity embeddings cached by each client. 0 disables the cache.')
+        self.add_argument('--cache_staleness', type=int, default=16,
+                          help='Maximal number of steps a cached entity embedding is used without pulling it.')
+        self.add_argument('--cache_policy', type=str, default='lru', choices=['lru', 'lfu'],
+                          help='Eviction policy of the entity embedding cache.')
+        self.add_argument('--push_topk_ratio', type=float, default=1.0,
+                          help='Fraction of the entity gradient rows pushed in each step. '\
+                                  'The other rows are accumulated and pushed later.')
 
 
 def get_long_tail_partition(n_relations, n_machine):
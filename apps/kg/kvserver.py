@@ -86,6 +86,13 @@ class ArgParser(argparse.ArgumentParser):
                           help='IP configuration file of kvstore')
         self.add_argument('--total_client', type=int, default=1,
                           help='Total number of client worker nodes')
+        self.add_argument('--num_server_threads', type=int, default=1,
+                          help='Number of threads processing requests on each server. '\
+                                  'PUSH requests are serialized per range of entity IDs.')
+        self.add_argument('--kv_id_codec', type=str, default=None, choices=['delta'],
+                          help='Transport encoding of the embedding IDs sent to and from servers.')
+        self.add_argument('--kv_data_codec', type=str, default=None, choices=['fp16', 'int8'],
+                          help='Transport encoding of the embeddings and gradients sent to and from servers.')
 
 
 def get_server_data(args, machine_id):
@@ -119,21 +126,32 @@ def start_server(args):
 
     server_namebook = dgl.contrib.read_ip_config(filename=args.ip_config)
 
+    # The Adagrad update reads and writes the shared rows, which co-located
+    # servers and clients update concurrently, so pushes lock them.
     my_server = KGEServer(server_id=args.server_id, 
                           server_namebook=server_namebook, 
-                          num_client=args.total_client)
+                          num_client=args.total_client,
+                          num_threads=args.num_server_threads,
+                          lock_shared_data=True)
 
     my_server.set_clr(args.lr)
+    for name in ('entity_emb', 'relation_emb'):
+        my_server.set_codec(name, ids=args.kv_id_codec, data=args.kv_data_codec)
+    # Clients caching entity embeddings pull their Adagrad state, which is
+    # updated by the pushes of the embeddings.
+    my_server.set_pull_after('entity_emb_state', 'entity_emb')
 
     if my_server.get_id() % my_server.get_group_count() == 0: # master server
         g2l, entity_emb, entity_emb_state, relation_emb, relation_emb_state = get_server_data(args, my_server.get_machine_id())
         my_server.set_global2local(name='entity_emb', global2local=g2l)
+        my_server.set_global2local(name='entity_emb_state', global2local=g2l)
         my_server.init_data(name='relation_emb', data_tensor=relation_emb)
         my_server.init_data(name='relation_emb_state', data_tensor=relation_emb_state)
         my_server.init_data(name='entity_emb', data_tensor=entity_emb)
         my_server.init_data(name='entity_emb_state', data_tensor=entity_emb_state)
     else: # backup server
         my_server.set_global2local(name='entity_emb')
+        my_server.set_global2local(name='entity_emb_state')
         my_server.init_data(name='relation_emb')
         my_server.init_data(name='relation_emb_state')
         my_server.init_data(name='entity_emb')
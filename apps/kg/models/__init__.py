@@ -1 +1 @@
-from .general_models import KEModel
+from .general_models import KEModel, RankingMetrics
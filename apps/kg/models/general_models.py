@@ -29,8 +29,82 @@ else:
     from .pytorch.tensor_models import reshape
     from .pytorch.tensor_models import cuda
     from .pytorch.tensor_models import ExternalEmbedding
+    from .pytorch.tensor_models import EmbeddingCache
+    from .pytorch.tensor_models import adagrad_update
     from .pytorch.score_fun import *
 
+class RankingMetrics(object):
+    """ Running sums of the ranking metrics of link prediction.
+
+    The sums are accumulated with tensor operators on the device of the
+    rankings, so no data is copied to host memory until the results are
+    requested. Metrics of different batches, samplers or worker processes are
+    combined with :meth:`merge`.
+    """
+    NAMES = ['MRR', 'MR', 'HITS@1', 'HITS@3', 'HITS@10']
+
+    def __init__(self):
+        self.count = 0
+        self._sums = None
+
+    def update(self, rankings):
+        """Add the rankings of a batch of test edges.
+
+        Parameters
+        ----------
+        rankings : tensor
+            The 1-based rank of each positive edge.
+        """
+        rankings = F.astype(rankings, F.float64)
+        sums = F.stack([F.sum(1.0 / rankings, 0),
+                        F.sum(rankings, 0),
+                        F.sum(F.astype(rankings <= 1, F.float64), 0),
+                        F.sum(F.astype(rankings <= 3, F.float64), 0),
+                        F.sum(F.astype(rankings <= 10, F.float64), 0)], 0)
+        self._sums = sums if self._sums is None else self._sums + sums
+        self.count += F.shape(rankings)[0]
+
+    def sums(self):
+        """Return the sums of the metrics as a numpy array."""
+        if self._sums is None:
+            return np.zeros((len(self.NAMES),), dtype=np.float64)
+        if F.is_tensor(self._sums):
+            return F.asnumpy(self._sums).astype(np.float64)
+        return self._sums
+
+    def merge(self, other):
+        """Add the metrics accumulated by another instance.
+
+        Parameters
+        ----------
+        other : RankingMetrics
+            The other metrics.
+
+        Returns
+        -------
+        RankingMetrics
+            self
+        """
+        self._sums = self.sums() + other.sums()
+        self.count += other.count
+        return self
+
+    def result(self):
+        """Return the average of each metric.
+
+        Returns
+        -------
+        dict of str to float
+            The averages. Empty if no edge has been ranked.
+        """
+        if self.count == 0:
+            return {}
+        return {name: float(val) / self.count for name, val in zip(self.NAMES, self.sums())}
+
+    def __getstate__(self):
+        # Send host arrays between processes instead of device tensors.
+        return {'count': self.count, '_sums': self.sums()}
+
 class KEModel(object):
     """ DGL Knowledge Embedding Model.
 
@@ -83,6 +157,8 @@ class KEModel(object):
         self.entity_dim = entity_dim
         self.strict_rel_part = args.strict_rel_part
         self.soft_rel_part = args.soft_rel_part
+        # cache of entity embeddings pulled from kvstore
+        self.entity_cache = None
         if not self.strict_rel_part and not self.soft_rel_part:
             self.relation_emb = ExternalEmbedding(args, n_relations, rel_dim,
                                                   F.cpu() if args.mix_cpu_gpu else device)
@@ -275,6 +351,61 @@ class KEModel(object):
         else:
             return neg_score
 
+    def predict_neg_score_chunks(self, pos_g, neg_g, eval_chunk_size, to_device=None,
+                                 gpu_id=-1):
+        """Calculate the negative score chunk by chunk of the negative nodes.
+
+        The negative nodes of every chunk of positive edges are split into
+        consecutive groups of at most ``eval_chunk_size`` nodes, whose
+        embeddings are looked up and scored one group at a time. This bounds the
+        memory of evaluating against a large number of negative nodes, e.g.
+        all entities. The computation is not traced.
+
+        Parameters
+        ----------
+        pos_g : DGLGraph
+            Graph holding positive edges.
+        neg_g : DGLGraph
+            Graph holding negative edges.
+        eval_chunk_size : int
+            The maximal number of negative nodes scored at a time.
+        to_device : func
+            Function to move data into device.
+        gpu_id : int
+            Which gpu to move data to.
+
+        Returns
+        -------
+        iterator of (tensor, int, int)
+            The negative scores of shape (num_chunks, chunk_size, end - start)
+            of the negative nodes from ``start`` to ``end``.
+        """
+        num_chunks = neg_g.num_chunks
+        chunk_size = neg_g.chunk_size
+        neg_sample_size = neg_g.neg_sample_size
+        neg_nid = neg_g.head_nid if neg_g.neg_head else neg_g.tail_nid
+        neg_ids = F.reshape(neg_g.ndata['id'][neg_nid], (num_chunks, neg_sample_size))
+        head_ids, tail_ids = pos_g.all_edges(order='eid')
+        pos_ids = tail_ids if neg_g.neg_head else head_ids
+        if to_device is not None and gpu_id >= 0:
+            pos_ids = to_device(pos_ids, gpu_id)
+        pos_emb = pos_g.ndata['emb'][pos_ids]
+        rel = pos_g.edata['emb']
+        for start in range(0, neg_sample_size, eval_chunk_size):
+            end = min(start + eval_chunk_size, neg_sample_size)
+            neg_emb = self.entity_emb(F.reshape(neg_ids[:, start:end], (-1,)), gpu_id, False)
+            if neg_g.neg_head:
+                neg_head, tail = self.head_neg_prepare(pos_g.edata['id'], num_chunks,
+                                                       neg_emb, pos_emb, gpu_id, False)
+                neg_score = self.head_neg_score(neg_head, rel, tail,
+                                                num_chunks, chunk_size, end - start)
+            else:
+                head, neg_tail = self.tail_neg_prepare(pos_g.edata['id'], num_chunks,
+                                                       pos_emb, neg_emb, gpu_id, False)
+                neg_score = self.tail_neg_score(head, rel, neg_tail,
+                                                num_chunks, chunk_size, end - start)
+            yield neg_score, start, end
+
     def forward_test(self, pos_g, neg_g, logs, gpu_id=-1):
         """Do the forward and generate ranking results.
 
@@ -283,9 +414,11 @@ class KEModel(object):
         pos_g : DGLGraph
             Graph holding positive edges.
         neg_g : DGLGraph
-            Graph holding negative edges.
-        logs : List
-            Where to put results in.
+            Graph holding negative edges. With the eval filter, its
+            filter_bias(start, end) gives the bias of the negative nodes
+            from start to end.
+        logs : RankingMetrics
+            Where to accumulate the ranking metrics.
         gpu_id : int
             Which gpu to accelerate the calculation. if -1 is provided, cpu is used.
         """
@@ -298,31 +431,31 @@ class KEModel(object):
         pos_scores = self.predict_score(pos_g)
         pos_scores = reshape(logsigmoid(pos_scores), batch_size, -1)
 
-        neg_scores = self.predict_neg_score(pos_g, neg_g, to_device=cuda,
-                                            gpu_id=gpu_id, trace=False,
-                                            neg_deg_sample=self.args.neg_deg_sample_eval)
-        neg_scores = reshape(logsigmoid(neg_scores), batch_size, -1)
-
-        # We need to filter the positive edges in the negative graph.
-        if self.args.eval_filter:
-            filter_bias = reshape(neg_g.edata['bias'], batch_size, -1)
-            if gpu_id >= 0:
-                filter_bias = cuda(filter_bias, gpu_id)
-            neg_scores += filter_bias
+        eval_chunk_size = self.args.eval_chunk_size
+        if self.args.neg_deg_sample_eval or not eval_chunk_size \
+                or eval_chunk_size >= neg_g.neg_sample_size:
+            neg_scores = self.predict_neg_score(pos_g, neg_g, to_device=cuda,
+                                                gpu_id=gpu_id, trace=False,
+                                                neg_deg_sample=self.args.neg_deg_sample_eval)
+            neg_chunks = [(neg_scores, 0, neg_g.neg_sample_size)]
+        else:
+            neg_chunks = self.predict_neg_score_chunks(pos_g, neg_g, eval_chunk_size,
+                                                       to_device=cuda, gpu_id=gpu_id)
+
         # To compute the rank of a positive edge among all negative edges,
         # we need to know how many negative edges have higher scores than
-        # the positive edge.
-        rankings = F.sum(neg_scores >= pos_scores, dim=1) + 1
-        rankings = F.asnumpy(rankings)
-        for i in range(batch_size):
-            ranking = rankings[i]
-            logs.append({
-                'MRR': 1.0 / ranking,
-                'MR': float(ranking),
-                'HITS@1': 1.0 if ranking <= 1 else 0.0,
-                'HITS@3': 1.0 if ranking <= 3 else 0.0,
-                'HITS@10': 1.0 if ranking <= 10 else 0.0
-            })
+        # the positive edge. Only the counts are kept across chunks.
+        rankings = 1
+        for neg_scores, start, end in neg_chunks:
+            neg_scores = reshape(logsigmoid(neg_scores), batch_size, -1)
+            # We need to filter the positive edges in the negative graph.
+            if self.args.eval_filter:
+                filter_bias = neg_g.filter_bias(start, end)
+                if gpu_id >= 0:
+                    filter_bias = cuda(filter_bias, gpu_id)
+                neg_scores += filter_bias
+            rankings = rankings + F.sum(neg_scores >= pos_scores, dim=1)
+        logs.update(rankings)
 
     # @profile
     def forward(self, pos_g, neg_g, gpu_id=-1):
@@ -464,34 +597,65 @@ class KEModel(object):
         self.entity_emb.finish_async_update()
 
 
+    def create_entity_cache(self, capacity, staleness, policy='lru'):
+        """Cache the entity embeddings pulled from kvstore.
+
+        Parameters
+        ----------
+        capacity : int
+            Maximal number of cached entities.
+        staleness : int
+            Maximal number of steps a cached entity embedding is used without
+            pulling it again.
+        policy : str
+            Eviction policy, 'lru' or 'lfu'.
+        """
+        self.entity_cache = EmbeddingCache(self.n_entities, capacity, staleness, policy)
+
     def pull_model(self, client, pos_g, neg_g):
         with th.no_grad():
             entity_id = F.cat(seq=[pos_g.ndata['id'], neg_g.ndata['id']], dim=0)
             relation_id = pos_g.edata['id']
             entity_id = F.tensor(np.unique(F.asnumpy(entity_id)))
             relation_id = F.tensor(np.unique(F.asnumpy(relation_id)))
-
-            l2g = client.get_local2global()
-            global_entity_id = l2g[entity_id]
-
-            entity_data = client.pull(name='entity_emb', id_tensor=global_entity_id)
-            relation_data = client.pull(name='relation_emb', id_tensor=relation_id)
-
-            self.entity_emb.emb[entity_id] = entity_data
-            self.relation_emb.emb[relation_id] = relation_data
-
-
-    def push_gradient(self, client):
+            if self.entity_cache is not None:
+                entity_id = self.entity_cache.lookup(entity_id)
+
+            # Send both requests before waiting for either of them
+            relation_pull = client.pull_async(name='relation_emb', id_tensor=relation_id)
+            if entity_id.shape[0] > 0:
+                l2g = client.get_local2global()
+                global_entity_id = l2g[entity_id]
+                entity_pull = client.pull_async(name='entity_emb', id_tensor=global_entity_id)
+                if self.entity_cache is not None:
+                    # Cached rows are updated locally by push_gradient, which
+                    # needs the Adagrad state of the server for these rows.
+                    state_pull = client.pull_async(name='entity_emb_state',
+                                                   id_tensor=global_entity_id)
+                self.entity_emb.emb[entity_id] = entity_pull.wait()
+                if self.entity_cache is not None:
+                    self.entity_emb.state_sum[entity_id] = state_pull.wait()
+                    self.entity_cache.insert(entity_id)
+
+            self.relation_emb.emb[relation_id] = relation_pull.wait()
+
+
+    def push_gradient(self, client, gpu_id=-1):
         with th.no_grad():
             l2g = client.get_local2global()
             for entity_id, entity_data in self.entity_emb.trace:
                 grad = entity_data.grad.data
                 global_entity_id =l2g[entity_id]
                 client.push(name='entity_emb', id_tensor=global_entity_id, data_tensor=grad)
+                # Write through: also update the cached copies, which are
+                # used again before they are pulled. Their Adagrad state was
+                # pulled with them, so they follow the server's update.
+                if self.entity_cache is not None:
+                    adagrad_update(self.entity_emb, entity_id, grad, self.args.lr, gpu_id)
 
             for relation_id, relation_data in self.relation_emb.trace:
                 grad = relation_data.grad.data
                 client.push(name='relation_emb', id_tensor=relation_id, data_tensor=grad)
 
         self.entity_emb.trace = []
-        self.relation_emb.trace = []
\ No newline at end of file
+        self.relation_emb.trace = []
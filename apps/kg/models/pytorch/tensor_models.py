@@ -12,6 +12,8 @@ import torch.nn.init as INIT
 import torch.multiprocessing as mp
 from torch.multiprocessing import Queue
 from _thread import start_new_thread
+import threading
+import queue as thread_queue
 import traceback
 from functools import wraps
 
@@ -58,13 +60,173 @@ def thread_wrapped_func(func):
             raise exception.__class__(trace)
     return decorated_function
 
+def adagrad_update(emb, grad_indices, grad_values, clr, gpu_id=-1):
+    """Apply Adagrad to the rows of the embeddings given their gradients.
+
+    Parameters
+    ----------
+    emb : ExternalEmbedding
+        The embeddings.
+    grad_indices : th.tensor
+        The rows to update.
+    grad_values : th.tensor
+        The gradients of the rows.
+    clr : float
+        The learning rate.
+    gpu_id : int
+        Which gpu to accelerate the calculation. if -1 is provided, cpu is used.
+    """
+    grad_sum = (grad_values * grad_values).mean(1)
+    device = emb.state_sum.device
+    if device != grad_indices.device:
+        grad_indices = grad_indices.to(device)
+    if device != grad_sum.device:
+        grad_sum = grad_sum.to(device)
+
+    emb.state_sum.index_add_(0, grad_indices, grad_sum)
+    std = emb.state_sum[grad_indices]  # _sparse_mask
+    if gpu_id >= 0:
+        std = std.cuda(gpu_id)
+    std_values = std.sqrt_().add_(1e-10).unsqueeze(1)
+    tmp = (-clr * grad_values / std_values)
+    if tmp.device != device:
+        tmp = tmp.to(device)
+    emb.emb.index_add_(0, grad_indices, tmp)
+
+def coalesce_grad(grad_indices, grad_values):
+    """Sum up the gradients of duplicate rows.
+
+    Parameters
+    ----------
+    grad_indices : th.tensor
+        The rows.
+    grad_values : th.tensor
+        The gradients of the rows.
+
+    Returns
+    -------
+    th.tensor
+        The unique rows.
+    th.tensor
+        The summed gradients of the unique rows.
+    """
+    uniq, inverse = th.unique(grad_indices, return_inverse=True)
+    values = grad_values.new_zeros((uniq.shape[0],) + grad_values.shape[1:])
+    values.index_add_(0, inverse.to(grad_values.device), grad_values)
+    return uniq, values
+
+class AsyncUpdateStats(object):
+    """Statistics of the asynchronous embedding update.
+
+    Parameters
+    ----------
+    num_shards : int
+        The number of updater threads.
+    """
+    def __init__(self, num_shards):
+        self.num_requests = 0
+        self.depth_sum = [0] * num_shards
+        self.depth_max = [0] * num_shards
+        self.num_rows = [0] * num_shards
+        self.num_unique_rows = [0] * num_shards
+
+    def record_depth(self, shard, depth):
+        """Record the queue depth of a shard seen by a new request."""
+        self.depth_sum[shard] += depth
+        self.depth_max[shard] = max(self.depth_max[shard], depth)
+
+    def summary(self):
+        """Return the statistics as a string."""
+        num_requests = max(self.num_requests, 1)
+        avg_depth = sum(self.depth_sum) / (num_requests * len(self.depth_sum))
+        num_rows = sum(self.num_rows)
+        return 'async update: {} requests, avg queue depth {:.2f}, max queue depth {}, ' \
+            '{:.2f}% rows coalesced'.format(
+                self.num_requests, avg_depth, max(self.depth_max),
+                100 * (1 - sum(self.num_unique_rows) / max(num_rows, 1)))
+
+def _put_checked(queue, item, is_alive, error):
+    """Put an item into a bounded queue, and raise instead of blocking forever
+    if its consumer has died.
+
+    Parameters
+    ----------
+    queue : queue.Queue or torch.multiprocessing.Queue
+        The queue.
+    item :
+        The item to put.
+    is_alive : callable
+        Return whether the consumer of the queue is still running.
+    error : callable
+        Return the exception to raise once the consumer has died.
+    """
+    while True:
+        try:
+            queue.put(item, timeout=1)
+            return
+        except thread_queue.Full:
+            if not is_alive():
+                raise error()
+
+def async_update_shard(emb, queue, shard, stats, errors):
+    """Apply the updates of one ID range of the entity embeddings.
+
+    All the requests waiting in the queue are merged and their duplicate rows
+    coalesced before the update is applied. An exception stops the thread and
+    is recorded in errors, formatted like in thread_wrapped_func.
+
+    Parameters
+    ----------
+    emb : ExternalEmbedding
+        The entity embeddings.
+    queue : queue.Queue
+        The request queue of the shard.
+    shard : int
+        The shard ID.
+    stats : AsyncUpdateStats
+        Where to record the statistics.
+    errors : list
+        Where to record the exception and the traceback of the shard.
+    """
+    try:
+        _async_update_shard(emb, queue, shard, stats)
+    except Exception as e:
+        errors[shard] = (e, traceback.format_exc())
+
+def _async_update_shard(emb, queue, shard, stats):
+    while True:
+        requests = [queue.get()]
+        while True:
+            try:
+                requests.append(queue.get_nowait())
+            except thread_queue.Empty:
+                break
+        finish = requests[-1] is None
+        requests = [req for req in requests if req is not None]
+        if len(requests) > 0:
+            gpu_id = requests[0][2]
+            grad_indices = th.cat([req[0] for req in requests], 0)
+            grad_values = th.cat([req[1] for req in requests], 0)
+            grad_indices, grad_values = coalesce_grad(grad_indices, grad_values)
+            stats.num_rows[shard] += sum(req[0].shape[0] for req in requests)
+            stats.num_unique_rows[shard] += grad_indices.shape[0]
+            with th.no_grad():
+                adagrad_update(emb, grad_indices, grad_values, emb.args.lr, gpu_id)
+        if finish:
+            return
+
 @thread_wrapped_func
 def async_update(args, emb, queue):
     """Asynchronous embedding update for entity embeddings.
     How it works:
         1. trainer process push entity embedding update requests into the queue.
-        2. async_update process pull requests from the queue, calculate 
-           the gradient state and gradient and write it into entity embeddings.
+        2. async_update process pull requests from the queue and split them by
+           the ID ranges of the updater threads.
+        3. each updater thread owns a disjoint ID range. It coalesces the duplicate
+           rows of its pending requests, calculates the gradient state and gradient
+           and writes it into entity embeddings.
+    The queue of each updater thread holds at most args.async_max_staleness requests,
+    so the trainer blocks when the updates fall behind.
 
     Parameters
     ----------
@@ -76,28 +238,51 @@ def async_update(args, emb, queue):
         The request queue.
     """
     th.set_num_threads(args.num_thread)
+    num_shards = max(args.async_update_threads, 1)
+    stats = AsyncUpdateStats(num_shards)
+    shard_queues = [thread_queue.Queue(max(args.async_max_staleness, 1))
+                    for _ in range(num_shards)]
+    errors = [None] * num_shards
+    threads = [threading.Thread(target=async_update_shard,
+                                args=(emb, shard_queues[i], i, stats, errors))
+               for i in range(num_shards)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    def _shard_error(i):
+        exception, trace = errors[i] if errors[i] is not None else \
+            (RuntimeError('Async update thread {} exited.'.format(i)), None)
+        return exception.__class__(trace) if trace is not None else exception
+
     while True:
         (grad_indices, grad_values, gpu_id) = queue.get()
-        clr = emb.args.lr
         if grad_indices is None:
-            return
-        with th.no_grad():
-            grad_sum = (grad_values * grad_values).mean(1)
-            device = emb.state_sum.device
-            if device != grad_indices.device:
-                grad_indices = grad_indices.to(device)
-            if device != grad_sum.device:
-                grad_sum = grad_sum.to(device)
-
-            emb.state_sum.index_add_(0, grad_indices, grad_sum)
-            std = emb.state_sum[grad_indices]  # _sparse_mask
-            if gpu_id >= 0:
-                std = std.cuda(gpu_id)
-            std_values = std.sqrt_().add_(1e-10).unsqueeze(1)
-            tmp = (-clr * grad_values / std_values)
-            if tmp.device != device:
-                tmp = tmp.to(device)
-            emb.emb.index_add_(0, grad_indices, tmp)
+            break
+        stats.num_requests += 1
+        for i in range(num_shards):
+            if errors[i] is not None:
+                raise _shard_error(i)
+        # shard i owns the rows whose IDs satisfy id * num_shards // num == i
+        shard_ids = grad_indices * num_shards // emb.num
+        for i in range(num_shards):
+            mask = shard_ids == i
+            indices = grad_indices[mask]
+            if indices.shape[0] == 0:
+                continue
+            values = grad_values[mask.to(grad_values.device)]
+            stats.record_depth(i, shard_queues[i].qsize())
+            _put_checked(shard_queues[i], (indices, values, gpu_id),
+                         threads[i].is_alive, lambda i=i: _shard_error(i))
+
+    for i, shard_queue in enumerate(shard_queues):
+        _put_checked(shard_queue, None, threads[i].is_alive, lambda i=i: _shard_error(i))
+    for thread in threads:
+        thread.join()
+    for i in range(num_shards):
+        if errors[i] is not None:
+            raise _shard_error(i)
+    print(stats.summary())
 
 class ExternalEmbedding:
     """Sparse Embedding for Knowledge Graph
@@ -217,7 +402,7 @@ class ExternalEmbedding:
                 if self.async_q is not None:
                     grad_indices.share_memory_()
                     grad_values.share_memory_()
-                    self.async_q.put((grad_indices, grad_values, gpu_id))
+                    self._put_async((grad_indices, grad_values, gpu_id))
                 else:
                     grad_sum = (grad_values * grad_values).mean(1)
                     device = self.state_sum.device
@@ -263,8 +448,18 @@ class ExternalEmbedding:
     def finish_async_update(self):
         """Notify the async update subprocess to quit.
         """
-        self.async_q.put((None, None, None))
+        self._put_async((None, None, None))
         self.async_p.join()
+        if self.async_p.exitcode != 0:
+            raise RuntimeError('The async update process failed with exit code {}.'.format(
+                self.async_p.exitcode))
+
+    def _put_async(self, request):
+        """Send a request to the async update subprocess, failing if it has died.
+        """
+        _put_checked(self.async_q, request, self.async_p.is_alive,
+                     lambda: RuntimeError('The async update process failed with exit code {}.'
+                                          .format(self.async_p.exitcode)))
 
     def curr_emb(self):
         """Return embeddings in trace.
@@ -297,3 +492,94 @@ class ExternalEmbedding:
         """
         file_name = os.path.join(path, name+'.npy')
         self.emb = th.Tensor(np.load(file_name))
+
+class EmbeddingCache:
+    """Client-side cache of embedding rows pulled from the KVServer.
+
+    The rows themselves are kept in the local embedding table the rows are
+    pulled into. The cache only tracks which rows of the table hold valid
+    copies: a row pulled at step s is served locally until step s + staleness.
+    At most capacity rows are valid at a time. When the capacity is exceeded,
+    the least recently used ('lru') or least frequently used ('lfu') rows are
+    invalidated.
+
+    Parameters
+    ----------
+    num : int
+        Number of rows of the local embedding table.
+    capacity : int
+        Maximal number of valid rows.
+    staleness : int
+        Maximal number of steps a row is served without pulling it again.
+    policy : str
+        Eviction policy, 'lru' or 'lfu'.
+        Default: 'lru'
+    """
+    def __init__(self, num, capacity, staleness, policy='lru'):
+        assert policy in ('lru', 'lfu'), 'Unknown cache policy: ' + policy
+        self.capacity = capacity
+        self.staleness = staleness
+        self.policy = policy
+        self.step = 0
+        # step at which each row was pulled, -1 if the row is not cached
+        self.fetch_step = th.full((num,), -1, dtype=th.int64)
+        self.last_used = th.zeros((num,), dtype=th.int64)
+        self.freq = th.zeros((num,), dtype=th.int64)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, idx):
+        """Start a new step and find the rows that have to be pulled.
+
+        Parameters
+        ----------
+        idx : th.tensor
+            Unique rows accessed in this step.
+
+        Returns
+        -------
+        th.tensor
+            Rows that are not cached or are too stale.
+        """
+        self.step += 1
+        fetch_step = self.fetch_step[idx]
+        valid = (fetch_step >= 0) & (self.step - fetch_step <= self.staleness)
+        self.last_used[idx] = self.step
+        self.freq[idx] += 1
+        num_hits = int(valid.sum())
+        self.hits += num_hits
+        self.misses += idx.shape[0] - num_hits
+        return idx[~valid]
+
+    def insert(self, idx):
+        """Mark rows as pulled in this step.
+
+        Parameters
+        ----------
+        idx : th.tensor
+            Unique rows pulled in this step.
+        """
+        self.size += int((self.fetch_step[idx] < 0).sum())
+        self.fetch_step[idx] = self.step
+        if self.size > self.capacity:
+            self._evict()
+
+    def _evict(self):
+        """Invalidate rows down to 90% of the capacity, which amortizes the
+        cost of selecting the victims."""
+        cached = th.nonzero(self.fetch_step >= 0, as_tuple=False).squeeze(1)
+        num_evict = self.size - int(self.capacity * 0.9)
+        key = self.last_used[cached] if self.policy == 'lru' else self.freq[cached]
+        victims = cached[th.topk(key, num_evict, largest=False)[1]]
+        self.fetch_step[victims] = -1
+        self.size -= num_evict
+
+    def hit_rate(self):
+        """Return the fraction of row accesses served by the cache."""
+        return self.hits / max(self.hits + self.misses, 1)
+
+    def summary(self):
+        """Return the statistics as a string."""
+        return 'cache: {} hits, {} misses, hit rate {:.2f}%, {} rows cached'.format(
+            self.hits, self.misses, 100 * self.hit_rate(), self.size)
@@ -1,4 +1,5 @@
 import os
+import pickle
 import scipy as sp
 import dgl
 import numpy as np
@@ -20,8 +21,10 @@ else:
 
     from models.pytorch.score_fun import *
     from models.pytorch.tensor_models import ExternalEmbedding
-from models.general_models import KEModel
-from dataloader.sampler import create_neg_subgraph
+from models.general_models import KEModel, RankingMetrics
+from dataloader.sampler import create_neg_subgraph, FilterIndex
+from dataloader.sampler import SoftRelationPartition, BalancedRelationPartition
+from dataloader.sampler import RelationPartitionCSR
 
 class dotdict(dict):
     """dot.notation access to dictionary attributes"""
@@ -178,7 +181,236 @@ def test_score_func_transr():
 
 def test_score_func_rotate():
     check_score_func('RotatE')
+
+def test_ranking_metrics():
+    rankings = np.array([1, 2, 5, 20], dtype=np.int64)
+    metrics1 = RankingMetrics()
+    metrics1.update(F.tensor(rankings[:3]))
+    metrics2 = RankingMetrics()
+    metrics2.update(F.tensor(rankings[3:]))
+    # metrics are sent between processes
+    metrics2 = pickle.loads(pickle.dumps(metrics2))
+    res = metrics1.merge(metrics2).result()
+    assert metrics1.count == 4
+    np.testing.assert_allclose(res['MRR'], np.mean(1.0 / rankings))
+    np.testing.assert_allclose(res['MR'], np.mean(rankings))
+    np.testing.assert_allclose(res['HITS@1'], 0.25)
+    np.testing.assert_allclose(res['HITS@3'], 0.5)
+    np.testing.assert_allclose(res['HITS@10'], 0.75)
+    assert RankingMetrics().result() == {}
+
+def test_filter_index():
+    num_triples, n_entities, n_relations = 500, 50, 5
+    heads = np.random.randint(0, n_entities, num_triples)
+    rels = np.random.randint(0, n_relations, num_triples)
+    tails = np.random.randint(0, n_entities, num_triples)
+    triples = set(zip(heads.tolist(), rels.tolist(), tails.tolist()))
+    index = FilterIndex(heads, rels, tails)
+
+    def check(heads, rels, tails, neg_ids, neg_head):
+        bias = index.filter_bias(heads, rels, tails, neg_ids, neg_head)
+        num_chunks, chunk_size = heads.shape
+        assert bias.shape == (num_chunks, chunk_size, neg_ids.shape[1])
+        assert bias.dtype == np.float32
+        for c in range(num_chunks):
+            for i in range(chunk_size):
+                h, r, t = heads[c, i], rels[c, i], tails[c, i]
+                for j, n in enumerate(neg_ids[c]):
+                    known = (n, r, t) in triples if neg_head else (h, r, n) in triples
+                    assert bias[c, i, j] == (-1 if known else 0)
+
+    num_chunks, chunk_size, neg_sample_size = 3, 4, 20
+    pos = np.random.randint(0, num_triples, (num_chunks, chunk_size))
+    # sampled negative nodes are unsorted and may be duplicated
+    neg_ids = np.random.randint(0, n_entities, (num_chunks, neg_sample_size))
+    all_ids = np.arange(n_entities)[None, :]
+    for neg_head in [True, False]:
+        check(heads[pos], rels[pos], tails[pos], neg_ids, neg_head)
+        check(heads[pos], rels[pos], tails[pos], neg_ids[:, 5:12], neg_head)
+        # all entities in one chunk, and a range of them
+        check(heads[pos].reshape(1, -1), rels[pos].reshape(1, -1), tails[pos].reshape(1, -1),
+              all_ids, neg_head)
+        check(heads[pos].reshape(1, -1), rels[pos].reshape(1, -1), tails[pos].reshape(1, -1),
+              all_ids[:, 10:30], neg_head)
+
+def test_eval_sampler_all_nodes():
+    from dataloader.sampler import EvalSampler, AllNegNodes
+    arr = (sp.sparse.random(50, 50, density=0.1, format='coo') != 0).astype(np.int64)
+    g = dgl.DGLGraph(arr, readonly=True)
+    g.edata['tid'] = F.tensor(np.random.randint(0, 3, g.number_of_edges()), F.int64)
+    heads, tails = (F.asnumpy(x) for x in g.all_edges(order='eid'))
+    triples = set(zip(heads.tolist(), F.asnumpy(g.edata['tid']).tolist(), tails.tolist()))
+    num_nodes = g.number_of_nodes()
+    for mode in ['head', 'tail']:
+        sampler = EvalSampler(g, F.arange(0, 20), 10, num_nodes, num_nodes, mode, num_workers=1)
+        pos_g, neg_g = next(sampler)
+        # no negative edges are created
+        assert isinstance(neg_g, AllNegNodes)
+        assert (neg_g.num_chunks, neg_g.chunk_size, neg_g.neg_sample_size) == (1, 10, num_nodes)
+        pos_heads, pos_tails = pos_g.all_edges(order='eid')
+        pos_heads = F.asnumpy(pos_g.ndata['id'][pos_heads])
+        pos_tails = F.asnumpy(pos_g.ndata['id'][pos_tails])
+        pos_rels = F.asnumpy(pos_g.edata['id'])
+        # the filter bias of a range of the nodes
+        bias = F.asnumpy(neg_g.filter_bias(5, 15))
+        assert bias.shape == (10, 10)
+        for i in range(10):
+            for j in range(10):
+                if mode == 'head':
+                    known = (5 + j, pos_rels[i], pos_tails[i]) in triples
+                else:
+                    known = (pos_heads[i], pos_rels[i], 5 + j) in triples
+                assert bias[i, j] == (-1 if known else 0)
+
+def check_relation_partition(partition_func):
+    num_edges, n_relations, num_parts = 1000, 20, 4
+    heads = np.arange(num_edges, dtype=np.int64)
+    rels = np.minimum(np.random.exponential(4, num_edges), n_relations - 1).astype(np.int64)
+    tails = heads + num_edges
+    orig = set(zip(heads.tolist(), rels.tolist(), tails.tolist()))
+    ret = partition_func((heads, rels, tails), num_parts)
+    parts, rel_parts = ret[0], ret[1]
+    # the edges are shuffled, not modified
+    assert set(zip(heads.tolist(), rels.tolist(), tails.tolist())) == orig
+    assert np.array_equal(np.concatenate(parts), np.arange(num_edges))
+    csrs = RelationPartitionCSR(rels, parts)
+    for part, rel_part, (rel_ids, indptr) in zip(parts, rel_parts, csrs):
+        assert set(rel_ids.tolist()) <= set(rel_part.tolist())
+        for k, rel in enumerate(rel_ids):
+            assert np.all(rels[part[indptr[k]:indptr[k + 1]]] == rel)
+        assert indptr[-1] == len(part)
+
+def test_relation_partition():
+    check_relation_partition(SoftRelationPartition)
+    check_relation_partition(BalancedRelationPartition)
         
+def test_kg_dataset():
+    import tempfile
+    from dataloader.KGDataset import KGDataset1
+    with tempfile.TemporaryDirectory() as path:
+        os.makedirs(os.path.join(path, 'kg'))
+        def write(fname, text):
+            with open(os.path.join(path, 'kg', fname), 'w') as f:
+                f.write(text)
+        write('entities.dict', '1\tb\n0\ta\n2\tc\n')
+        write('relations.dict', '0\tr\n')
+        write('train.txt', 'a\tr\tb \r\n\n c\tr\ta\n')
+        write('valid.txt', 'b\tr\tc\n')
+        write('test.txt', '')
+        dataset = KGDataset1(path, 'kg')
+        assert dataset.n_entities == 3
+        assert dataset.n_relations == 1
+        assert [x.tolist() for x in dataset.train] == [[0, 2], [0, 0], [1, 0]]
+        assert [x.tolist() for x in dataset.valid] == [[1], [0], [2]]
+        assert [len(x) for x in dataset.test] == [0, 0, 0]
+        # a short line and a long line do not cancel out
+        write('train.txt', 'a\tr\nb\tr\tc\ta\n')
+        try:
+            KGDataset1(path, 'kg', only_train=True)
+            fail = True
+        except dgl.DGLError as e:
+            fail = False
+            assert 'line 1' in str(e)
+        assert not fail
+        # unknown names are not mapped to a wrong Id
+        write('train.txt', 'a\tr\td\n')
+        try:
+            KGDataset1(path, 'kg', only_train=True)
+            fail = True
+        except KeyError:
+            fail = False
+        assert not fail
+
+def test_async_update_errors():
+    if backend.lower() == 'mxnet':
+        return
+    import queue
+    from models.pytorch.tensor_models import async_update_shard, _put_checked
+    from models.pytorch.tensor_models import AsyncUpdateStats
+    # an exception in an updater thread is recorded instead of being lost
+    requests = queue.Queue()
+    requests.put((th.tensor([0]), th.ones(1, 2), -1))
+    requests.put(None)
+    errors = [None]
+    async_update_shard(None, requests, 0, AsyncUpdateStats(1), errors)
+    assert isinstance(errors[0][0], AttributeError)
+    # putting into the full queue of a dead consumer raises instead of blocking
+    full = queue.Queue(1)
+    full.put(0)
+    try:
+        _put_checked(full, 1, lambda: False, lambda: RuntimeError('dead'))
+        fail = True
+    except RuntimeError:
+        fail = False
+    assert not fail
+
+class _PullHandle:
+    def __init__(self, data):
+        self._data = data
+
+    def wait(self):
+        return self._data
+
+class _FakeKVClient:
+    """Serve pulls from local tensors indexed by global ID, like a KVClient
+    that requires a partition book for every pulled data."""
+    def __init__(self, data, l2g):
+        self._data = data
+        self._l2g = l2g
+        self._books = {}
+        self.pulled = []
+
+    def get_id(self):
+        return 0
+
+    def get_local2global(self):
+        return self._l2g
+
+    def set_partition_book(self, name, partition_book=None):
+        self._books[name] = partition_book
+
+    def pull_async(self, name, id_tensor):
+        _ = self._books[name]
+        self.pulled.append(name)
+        return _PullHandle(self._data[name][id_tensor])
+
+def test_pull_model_with_cache():
+    if backend.lower() == 'mxnet':
+        return
+    from train_pytorch import set_partition_books
+    n_entities, n_relations = 10, 3
+    args = dotdict({'gpu': [-1], 'lr': 0.1, 'mix_cpu_gpu': False, 'num_client': 1,
+                    'strict_rel_part': False, 'soft_rel_part': False})
+    model = KEModel(args, 'DistMult', n_entities, n_relations, 4, 12.0)
+    model.create_entity_cache(n_entities, 2)
+    data = {'entity_emb': th.randn(n_entities, 4),
+            'entity_emb_state': th.rand(n_entities),
+            'relation_emb': th.randn(n_relations, 4)}
+    l2g = th.randperm(n_entities)
+    client = _FakeKVClient(data, l2g)
+    set_partition_books(args, client, th.zeros(n_entities, dtype=th.int64),
+                        th.zeros(n_relations, dtype=th.int64))
+
+    pos_g = dgl.DGLGraph()
+    pos_g.add_nodes(3)
+    pos_g.add_edges([0, 1], [1, 2])
+    pos_g.ndata['id'] = th.tensor([1, 4, 7])
+    pos_g.edata['id'] = th.tensor([0, 2])
+    neg_g = dgl.DGLGraph()
+    neg_g.add_nodes(2)
+    neg_g.ndata['id'] = th.tensor([4, 8])
+    model.pull_model(client, pos_g, neg_g)
+    ids = th.tensor([1, 4, 7, 8])
+    assert th.equal(model.entity_emb.emb[ids], data['entity_emb'][l2g[ids]])
+    # the Adagrad state of the cached rows is pulled with them
+    assert th.equal(model.entity_emb.state_sum[ids], data['entity_emb_state'][l2g[ids]])
+    assert th.equal(model.relation_emb.emb[th.tensor([0, 2])], data['relation_emb'][th.tensor([0, 2])])
+
+    # the cached rows are used again without pulling them
+    client.pulled = []
+    model.pull_model(client, pos_g, neg_g)
+    assert client.pulled == ['relation_emb']
+
 if __name__ == '__main__':
     test_score_func_transe()
     test_score_func_distmult()
@@ -186,3 +418,10 @@ if __name__ == '__main__':
     test_score_func_rescal()
     test_score_func_transr()
     test_score_func_rotate()
+    test_ranking_metrics()
+    test_filter_index()
+    test_eval_sampler_all_nodes()
+    test_relation_partition()
+    test_kg_dataset()
+    test_async_update_errors()
+    test_pull_model_with_cache()
@@ -1,5 +1,6 @@
 from dataloader import EvalDataset, TrainDataset, NewBidirectionalOneShotIterator
 from dataloader import get_dataset
+from models import RankingMetrics
 
 import argparse
 import os
@@ -71,6 +72,8 @@ class ArgParser(argparse.ArgumentParser):
                           help='sample some percentage for evaluation.')
         self.add_argument('--no_eval_filter', action='store_true',
                           help='do not filter positive edges among negative edges for evaluation')
+        self.add_argument('--eval_chunk_size', type=int, default=65536,
+                          help='the number of negative nodes scored at a time in evaluation')
 
         self.add_argument('--gpu', type=int, default=[-1], nargs='+', 
                           help='a list of active gpu ids, e.g. 0 1 2 4')
@@ -122,6 +125,10 @@ class ArgParser(argparse.ArgumentParser):
                           help='num of omp threads used per process in multi-process training')
         self.add_argument('--async_update', action='store_true',
                           help='allow async_update on node embedding')
+        self.add_argument('--async_update_threads', type=int, default=4,
+                          help='the number of threads applying async_update, each owning a range of node IDs')
+        self.add_argument('--async_max_staleness', type=int, default=2,
+                          help='the maximal number of pending async_update requests per thread')
         self.add_argument('--force_sync_interval', type=int, default=-1,
                           help='We force a synchronization between processes every x steps')
 
@@ -381,16 +388,10 @@ def run(args, logger):
                 procs.append(proc)
                 proc.start()
 
-            total_metrics = {}
-            metrics = {}
-            logs = []
+            logs = RankingMetrics()
             for i in range(args.num_test_proc):
-                log = queue.get()
-                logs = logs + log
-            
-            for metric in logs[0].keys():
-                metrics[metric] = sum([log[metric] for log in logs]) / len(logs)
-            for k, v in metrics.items():
+                logs.merge(queue.get())
+            for k, v in logs.result().items():
                 print('Test average {} at [{}/{}]: {}'.format(k, args.step, args.max_step, v))
 
             for proc in procs:
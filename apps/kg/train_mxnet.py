@@ -1,4 +1,4 @@
-from models import KEModel
+from models import KEModel, RankingMetrics
 
 import mxnet as mx
 from mxnet import gluon
@@ -70,7 +70,7 @@ def train(args, model, train_sampler, valid_samplers=None, rank=0, rel_parts=Non
 
 def test(args, model, test_samplers, rank=0, mode='Test', queue=None):
     assert args.num_proc <= 1, "MXNet KGE does not support multi-process now"
-    logs = []
+    logs = RankingMetrics()
 
     if len(args.gpu) > 0:
         gpu_id = args.gpu[rank % len(args.gpu)] if args.mix_cpu_gpu and args.num_proc > 1 else args.gpu[0]
@@ -86,12 +86,7 @@ def test(args, model, test_samplers, rank=0, mode='Test', queue=None):
         for pos_g, neg_g in sampler:
             model.forward_test(pos_g, neg_g, logs, gpu_id)
 
-    metrics = {}
-    if len(logs) > 0:
-        for metric in logs[0].keys():
-            metrics[metric] = sum([log[metric] for log in logs]) / len(logs)
-
-    for k, v in metrics.items():
+    for k, v in logs.result().items():
         print('{} average {} at [{}/{}]: {}'.format(mode, k, args.step, args.max_step, v))
     for i in range(len(test_samplers)):
         test_samplers[i] = test_samplers[i].reset()
@@ -1,4 +1,4 @@
-from models import KEModel
+from models import KEModel, RankingMetrics
 
 import torch.multiprocessing as mp
 from torch.utils.data import DataLoader
@@ -53,26 +53,40 @@ class KGEClient(KVClient):
         return self._l2g
 
 
+def set_partition_books(args, client, entity_pb, relation_pb):
+    """Set the partition books of the data pulled and pushed by the client
+    """
+    # The Adagrad state of entities is pulled for cached entity embeddings
+    books = [('entity_emb', entity_pb), ('entity_emb_state', entity_pb),
+             ('relation_emb', relation_pb)]
+    for name, partition_book in books:
+        if client.get_id() % args.num_client == 0:
+            client.set_partition_book(name=name, partition_book=partition_book)
+        else:
+            client.set_partition_book(name=name)
+
+
 def connect_to_kvstore(args, entity_pb, relation_pb, l2g):
     """Create kvclient and connect to kvstore service
     """
     server_namebook = dgl.contrib.read_ip_config(filename=args.ip_config)
 
-    my_client = KGEClient(server_namebook=server_namebook)
+    # Gradients of duplicate entities are summed before the Adagrad update on servers.
+    # Local pushes lock the rows like the servers do (see kvserver.py).
+    my_client = KGEClient(server_namebook=server_namebook, coalesce_push=True,
+                          lock_shared_data=True)
 
     my_client.set_clr(args.lr)
 
     my_client.connect()
 
-    if my_client.get_id() % args.num_client == 0:
-        my_client.set_partition_book(name='entity_emb', partition_book=entity_pb)
-        my_client.set_partition_book(name='relation_emb', partition_book=relation_pb)
-    else:
-        my_client.set_partition_book(name='entity_emb')
-        my_client.set_partition_book(name='relation_emb')
+    set_partition_books(args, my_client, entity_pb, relation_pb)
 
     my_client.set_local2global(l2g)
 
+    if args.push_topk_ratio < 1:
+        my_client.set_push_topk(name='entity_emb', ratio=args.push_topk_ratio)
+
     return my_client
 
 
@@ -131,7 +145,7 @@ def train(args, model, train_sampler, valid_samplers=None, rank=0, rel_parts=Non
 
         start1 = time.time()
         if client is not None:
-            model.push_gradient(client)
+            model.push_gradient(client, gpu_id)
         else:
             model.update(gpu_id)
         update_time += time.time() - start1
@@ -151,6 +165,8 @@ def train(args, model, train_sampler, valid_samplers=None, rank=0, rel_parts=Non
                                                             time.time() - start))
             print('[{}]sample: {:.3f}, forward: {:.3f}, backward: {:.3f}, update: {:.3f}'.format(
                 rank, sample_time, forward_time, backward_time, update_time))
+            if model.entity_cache is not None:
+                print('[{}]{}'.format(rank, model.entity_cache.summary()))
             sample_time = 0
             update_time = 0
             forward_time = 0
@@ -187,20 +203,16 @@ def test(args, model, test_samplers, rank=0, mode='Test', queue=None):
         model.load_relation(th.device('cuda:' + str(gpu_id)))
 
     with th.no_grad():
-        logs = []
+        logs = RankingMetrics()
         for sampler in test_samplers:
             count = 0
             for pos_g, neg_g in sampler:
                 model.forward_test(pos_g, neg_g, logs, gpu_id)
 
-        metrics = {}
-        if len(logs) > 0:
-            for metric in logs[0].keys():
-                metrics[metric] = sum([log[metric] for log in logs]) / len(logs)
         if queue is not None:
             queue.put(logs)
         else:
-            for k, v in metrics.items():
+            for k, v in logs.result().items():
                 print('[{}]{} average {} at [{}/{}]: {}'.format(rank, mode, k, args.step, args.max_step, v))
     test_samplers[0] = test_samplers[0].reset()
     test_samplers[1] = test_samplers[1].reset()
@@ -221,11 +233,14 @@ def dist_train_test(args, model, train_sampler, entity_pb, relation_pb, l2g, ran
         th.set_num_threads(args.num_thread)
 
     client = connect_to_kvstore(args, entity_pb, relation_pb, l2g)
+    if args.cache_size > 0:
+        model.create_entity_cache(args.cache_size, args.cache_staleness, args.cache_policy)
     client.barrier()
     train_time_start = time.time()
     train(args, model, train_sampler, None, rank, rel_parts, cross_rels, barrier, client)
     client.barrier()
     print('Total train time {:.3f} seconds'.format(time.time() - train_time_start))
+    print('[Client {}] kvstore traffic: {}'.format(client.get_id(), client.get_traffic_stats()))
 
     model = None
 
@@ -323,16 +338,10 @@ def dist_train_test(args, model, train_sampler, entity_pb, relation_pb, l2g, ran
                 procs.append(proc)
                 proc.start()
 
-            total_metrics = {}
-            metrics = {}
-            logs = []
+            logs = RankingMetrics()
             for i in range(args.num_test_proc):
-                log = queue.get()
-                logs = logs + log
-            
-            for metric in logs[0].keys():
-                metrics[metric] = sum([log[metric] for log in logs]) / len(logs)
-            for k, v in metrics.items():
+                logs.merge(queue.get())
+            for k, v in logs.result().items():
                 print('Test average {} at [{}/{}]: {}'.format(k, args.step, args.max_step, v))
 
             for proc in procs:
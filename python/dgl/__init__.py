@@ -12,6 +12,7 @@ from . import contrib
 from . import container
 from . import random
 from . import sampling
+from . import segment
 
 from ._ffi.runtime_ctypes import TypeCode
 from ._ffi.function import register_func, get_global_func, list_global_func_names, extract_ext_funcs
@@ -268,6 +268,23 @@ def asnumpy(input):
     """
     pass
 
+def pin_memory(input):
+    """Copy a CPU tensor into page-locked memory, which enables faster and
+    asynchronous copies to GPU.
+
+    Parameters
+    ----------
+    input : Tensor
+        The input tensor on CPU.
+
+    Returns
+    -------
+    Tensor
+        The tensor in page-locked memory. Frameworks without page-locked
+        memory support return the input itself.
+    """
+    pass
+
 def copy_to(input, ctx):
     """Copy the given tensor to the context.
 
@@ -600,6 +617,28 @@ def gather_row(data, row_index):
     """
     pass
 
+def gather_row_into(data, row_index, out):
+    """Slice out the data given the row index and write it into a preallocated
+    output tensor, without allocating new memory.
+
+    Parameters
+    ----------
+    data : Tensor
+        The data tensor
+    row_index : Tensor
+        A 1-D integer tensor containing which rows to be sliced out.
+    out : Tensor
+        The output tensor, whose first dimension equals to ``len(row_index)``.
+
+    Returns
+    -------
+    Tensor
+        The output tensor. A new tensor is returned instead by frameworks with
+        immutable tensors, and when autograd records the gather, since writes
+        into a preallocated output are not differentiable.
+    """
+    pass
+
 def slice_axis(data, axis, begin, end):
     """Slice along a given axis.
     Returns an array slice along a given axis starting from :attr:`begin` index to :attr:`end` index.
@@ -989,18 +1028,25 @@ def logical_not(input):
 # DGL should contain all the operations on index, so this set of operators
 # should be gradually removed.
 
-def unique(input):
+def unique(input, return_inverse=False):
     """Returns the unique scalar elements in a tensor.
 
     Parameters
     ----------
     input : Tensor
         Must be a 1-D tensor.
+    return_inverse : bool, optional
+        Whether to also return the position of each element of input in the
+        unique elements. (Default: False)
 
     Returns
     -------
     Tensor
         A 1-D tensor containing unique elements.
+    Tensor, optional
+        The int64 positions of the elements of input in the unique elements,
+        such that ``gather_row(unique, inverse)`` equals input. Only returned
+        if return_inverse is True.
     """
     pass
 
@@ -114,6 +114,9 @@ def astype(input, ty):
 def asnumpy(input):
     return input.asnumpy()
 
+def pin_memory(input):
+    return input.as_in_context(mx.cpu_pinned())
+
 def copy_to(input, ctx):
     return input.as_in_context(ctx)
 
@@ -197,6 +200,14 @@ def gather_row(data, row_index):
     else:
         return data[row_index,]
 
+def gather_row_into(data, row_index, out):
+    if mx.autograd.is_recording():
+        # autograd does not record ops with out=, so gather into a new tensor
+        return gather_row(data, row_index)
+    if len(row_index) == 0:
+        return out
+    return nd.take(data, row_index, out=out)
+
 def slice_axis(data, axis, begin, end):
     dim = data.shape[axis]
     if begin < 0:
@@ -309,9 +320,13 @@ def equal(x, y):
 def logical_not(input):
     return nd.logical_not(input)
 
-def unique(input):
+def unique(input, return_inverse=False):
     # TODO: fallback to numpy is unfortunate
     tmp = input.asnumpy()
+    if return_inverse:
+        tmp, inverse = np.unique(tmp, return_inverse=True)
+        return (nd.array(tmp, ctx=input.context, dtype=input.dtype),
+                nd.array(inverse, ctx=input.context, dtype=np.int64))
     tmp = np.unique(tmp)
     return nd.array(tmp, ctx=input.context, dtype=input.dtype)
 
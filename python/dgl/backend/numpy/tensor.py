@@ -182,8 +182,8 @@ def ones(shape, dtype):
 def spmm(x, y):
     return x.dot(y)
 
-def unique(input):
-    return np.unique(input)
+def unique(input, return_inverse=False):
+    return np.unique(input, return_inverse=return_inverse)
 
 def full_1d(length, fill_value):
     return np.full((length,), fill_value)
@@ -82,6 +82,9 @@ def asnumpy(input):
     else:
         return input.cpu().detach().numpy()
 
+def pin_memory(input):
+    return input.pin_memory()
+
 def copy_to(input, ctx):
     if ctx.type == 'cpu':
         return input.cpu()
@@ -151,6 +154,12 @@ def repeat(input, repeats, dim):
 def gather_row(data, row_index):
     return th.index_select(data, 0, row_index)
 
+def gather_row_into(data, row_index, out):
+    if data.requires_grad and th.is_grad_enabled():
+        # autograd does not record ops with out=, so gather into a new tensor
+        return gather_row(data, row_index)
+    return th.index_select(data, 0, row_index, out=out)
+
 def slice_axis(data, axis, begin, end):
     return th.narrow(data, axis, begin, end - begin)
 
@@ -242,8 +251,8 @@ def equal(x, y):
 def logical_not(input):
     return ~input
 
-def unique(input):
-    return th.unique(input)
+def unique(input, return_inverse=False):
+    return th.unique(input, return_inverse=return_inverse)
 
 def full_1d(length, fill_value, dtype, ctx):
     return th.full((length,), fill_value, dtype=dtype, device=ctx)
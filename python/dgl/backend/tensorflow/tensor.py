@@ -103,6 +103,11 @@ def asnumpy(input):
         return input.numpy()
 
 
+def pin_memory(input):
+    # TF manages page-locked staging memory internally
+    return input
+
+
 def copy_to(input, ctx):
     with tf.device(ctx):
         new_tensor = tf.identity(input)
@@ -202,6 +207,11 @@ def gather_row(data, row_index):
     return tf.gather(data, row_index)
 
 
+def gather_row_into(data, row_index, out):
+    # TF tensors are immutable
+    return tf.gather(data, row_index)
+
+
 def slice_axis(data, axis, begin, end):
     # assert axis == 0
     # tf doesn't behave well with negative
@@ -325,7 +335,10 @@ def logical_not(input):
     return ~input
 
 
-def unique(input):
+def unique(input, return_inverse=False):
+    if return_inverse:
+        y, idx = tf.unique(input, out_idx=tf.int64)
+        return y, idx
     return tf.unique(input).y
 
 
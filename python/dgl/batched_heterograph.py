@@ -1,10 +1,9 @@
 """Classes and functions for batching multiple heterographs together."""
 from collections.abc import Iterable
 
-from . import backend as F
 from . import heterograph_index
 from .base import ALL, is_all
-from .frame import FrameRef, Frame
+from .frame import FrameRef, Frame, concat_frame_columns, split_frame
 from .heterograph import DGLHeteroGraph
 
 __all__ = ['BatchedDGLHeteroGraph', 'unbatch_hetero', 'batch_hetero']
@@ -196,29 +195,18 @@ class BatchedDGLHeteroGraph(DGLHeteroGraph):
         node_attrs = _init_attrs(ref_ntypes, node_attrs, 'node')
         edge_attrs = _init_attrs(ref_canonical_etypes, edge_attrs, 'edge')
 
-        node_frames = []
-        for tid, typ in enumerate(ref_ntypes):
-            if len(node_attrs[typ]) == 0:
-                # Emtpy frames will be created when we instantiate a DGLHeteroGraph.
-                node_frames.append(None)
-            else:
-                # NOTE: following code will materialize the columns of the input graphs.
-                cols = {key: F.cat([gr._node_frames[tid][key] for gr in graph_list
-                                    if gr.number_of_nodes(typ) > 0], dim=0)
-                        for key in node_attrs[typ]}
-                node_frames.append(FrameRef(Frame(cols)))
-
-        edge_frames = []
-        for tid, typ in enumerate(ref_canonical_etypes):
-            if len(edge_attrs[typ]) == 0:
-                # Emtpy frames will be created when we instantiate a DGLHeteroGraph.
-                edge_frames.append(None)
-            else:
-                # NOTE: following code will materialize the columns of the input graphs.
-                cols = {key: F.cat([gr._edge_frames[tid][key] for gr in graph_list
-                                    if gr.number_of_edges(typ) > 0], dim=0)
-                        for key in edge_attrs[typ]}
-                edge_frames.append(FrameRef(Frame(cols)))
+        # NOTE: following code will materialize the columns of the input graphs.
+        # The columns of all types are concatenated in a single parallel pass.
+        all_cols = concat_frame_columns(
+            [([gr._node_frames[tid] for gr in graph_list], node_attrs[typ])
+             for tid, typ in enumerate(ref_ntypes)] +
+            [([gr._edge_frames[tid] for gr in graph_list], edge_attrs[typ])
+             for tid, typ in enumerate(ref_canonical_etypes)])
+        # Emtpy frames will be created when we instantiate a DGLHeteroGraph.
+        node_frames = [FrameRef(Frame(cols)) if len(cols) > 0 else None
+                       for cols in all_cols[:len(ref_ntypes)]]
+        edge_frames = [FrameRef(Frame(cols)) if len(cols) > 0 else None
+                       for cols in all_cols[len(ref_ntypes):]]
 
         # Create graph index for the batched graph
         metagraph = graph_list[0]._graph.metagraph
@@ -349,7 +337,9 @@ def unbatch_hetero(graph):
     Notes
     -----
     Unbatching will break each field tensor of the batched graph into smaller
-    partitions.
+    partitions. The partitions are views of the field tensors rather than
+    copies, so in-place writes to the features of the unbatched graphs are
+    visible in the batched graph.
 
     For simpler tasks such as node/edge state aggregation, try to slice graphs along
     edge types and use readout functions.
@@ -365,27 +355,19 @@ def unbatch_hetero(graph):
     bne_all_types = graph._batch_num_edges
     ntypes = graph._ntypes
     etypes = graph._etypes
-    node_frames = [[FrameRef(Frame(num_rows=bnn_all_types[tid][i])) for tid in range(len(ntypes))]
-                   for i in range(bsize)]
-    edge_frames = [[FrameRef(Frame(num_rows=bne_all_types[tid][i])) for tid in range(len(etypes))]
-                   for i in range(bsize)]
-    for tid in range(len(ntypes)):
-        for attr, col in graph._node_frames[tid].items():
-            col_splits = F.split(col, bnn_all_types[tid], dim=0)
-            for i in range(bsize):
-                node_frames[i][tid][attr] = col_splits[i]
-    for tid in range(len(etypes)):
-        for attr, col in graph._edge_frames[tid].items():
-            col_splits = F.split(col, bne_all_types[tid], dim=0)
-            for i in range(bsize):
-                edge_frames[i][tid][attr] = col_splits[i]
+    # split frames of each type
+    node_frames = [split_frame(graph._node_frames[tid], bnn_all_types[tid])
+                   for tid in range(len(ntypes))]
+    edge_frames = [split_frame(graph._edge_frames[tid], bne_all_types[tid])
+                   for tid in range(len(etypes))]
     unbatched_graph_indices = heterograph_index.disjoint_partition(
         graph._graph, bnn_all_types, bne_all_types)
     return [DGLHeteroGraph(gidx=unbatched_graph_indices[i],
                            ntypes=ntypes,
                            etypes=etypes,
-                           node_frames=node_frames[i],
-                           edge_frames=edge_frames[i]) for i in range(bsize)]
+                           node_frames=[frames[i] for frames in node_frames],
+                           edge_frames=[frames[i] for frames in edge_frames])
+            for i in range(bsize)]
 
 def batch_hetero(graph_list, node_attrs=ALL, edge_attrs=ALL):
     """Batch a collection of :class:`~dgl.DGLHeteroGraph` and return a
@@ -6,6 +6,7 @@ from ..network import _receiver_wait, _sender_connect
 from ..network import _send_kv_msg, _recv_kv_msg
 from ..network import _clear_kv_msg
 from ..network import KVMsgType, KVStoreMsg
+from ..network import set_kv_codec, get_kv_codec, flush_kv_residuals
 
 from .. import backend as F
 from .._ffi.ndarray import empty_shared_mem
@@ -13,6 +14,8 @@ from .._ffi.ndarray import empty_shared_mem
 import os
 import time
 import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import socket
 
@@ -77,6 +80,160 @@ def read_ip_config(filename):
     return server_namebook
 
 
+# Number of row stripes locked independently by the pushes to a shared tensor
+_NUM_LOCK_STRIPES = 64
+
+
+class StripedLock(object):
+    """Row locks of a shared-memory tensor for all threads and processes of a machine.
+
+    Rows are grouped into stripes of consecutive local IDs. Locking a stripe takes a
+    threading lock, which excludes the other threads of the process, and a POSIX record
+    lock on one byte of a lock file, which excludes the other processes (not on Windows).
+
+    Parameters
+    ----------
+    filename : str
+        lock file shared by all processes, created if it does not exist.
+    num_rows : int
+        number of rows of the tensor.
+    num_stripes : int
+        number of stripes, which must be the same in all processes.
+    """
+    def __init__(self, filename, num_rows, num_stripes=_NUM_LOCK_STRIPES):
+        self._file = open(filename, 'a+')
+        self._num_rows = max(num_rows, 1)
+        self._num_stripes = num_stripes
+        self._thread_locks = [threading.Lock() for _ in range(num_stripes)]
+
+    def __del__(self):
+        self._file.close()
+
+    def apply(self, handler, name, ID, data, target):
+        """Call handler(name, ID, data, target) on the rows of each stripe while holding
+        its lock, one stripe at a time.
+
+        Parameters
+        ----------
+        handler : callable
+            function updating target[name] at the rows of ID, e.g., _push_handler()
+        name : str
+            data name
+        ID : tensor (mx.ndarray or torch.tensor)
+            local IDs
+        data : tensor (mx.ndarray or torch.tensor)
+            a tensor with the same row size of ID
+        target : dict of data
+            the data store
+        """
+        stripe = F.asnumpy(ID).astype(np.int64) * self._num_stripes // self._num_rows
+        stripe_ids = np.unique(stripe)
+        for stripe_id in stripe_ids:
+            if len(stripe_ids) == 1:
+                part_id, part_data = ID, data
+            else:
+                index = F.zerocopy_from_numpy(np.nonzero(stripe == stripe_id)[0])
+                part_id, part_data = F.gather_row(ID, index), F.gather_row(data, index)
+            self._acquire(int(stripe_id))
+            try:
+                handler(name, part_id, part_data, target)
+                F.sync()
+            finally:
+                self._release(int(stripe_id))
+
+    def _acquire(self, stripe):
+        self._thread_locks[stripe].acquire()
+        if os.name != 'nt':
+            fcntl.lockf(self._file, fcntl.LOCK_EX, 1, stripe)
+
+    def _release(self, stripe):
+        if os.name != 'nt':
+            fcntl.lockf(self._file, fcntl.LOCK_UN, 1, stripe)
+        self._thread_locks[stripe].release()
+
+
+class LatencyHistogram(object):
+    """Thread-safe histogram of latencies.
+
+    Latencies are counted in buckets of power-of-two microseconds, i.e., bucket i
+    holds the latencies in [2^(i-1), 2^i) us, so percentiles are accurate within
+    a factor of two.
+
+    Parameters
+    ----------
+    num_buckets : int
+        Number of buckets. The last bucket holds all larger latencies.
+    """
+    def __init__(self, num_buckets=32):
+        self._counts = [0] * num_buckets
+        self._total = 0.
+        self._max = 0.
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        """Record a latency.
+
+        Parameters
+        ----------
+        seconds : float
+            latency in seconds
+        """
+        bucket = min(int(seconds * 1e6).bit_length(), len(self._counts) - 1)
+        with self._lock:
+            self._counts[bucket] += 1
+            self._total += seconds
+            self._max = max(self._max, seconds)
+
+    def count(self):
+        """Get the number of recorded latencies
+
+        Return
+        ------
+        int
+            count of latencies
+        """
+        return sum(self._counts)
+
+    def percentile(self, q):
+        """Get the upper bound of the q-th percentile
+
+        Parameters
+        ----------
+        q : float
+            percentile in [0, 100]
+
+        Return
+        ------
+        float
+            latency in seconds
+        """
+        with self._lock:
+            counts = list(self._counts)
+            max_latency = self._max
+        target = q / 100. * sum(counts)
+        seen = 0
+        for bucket, count in enumerate(counts):
+            seen += count
+            if count > 0 and seen >= target:
+                return min((1 << bucket) * 1e-6, max_latency)
+        return max_latency
+
+    def summary(self):
+        """Get the count, mean, median, 99th percentile and max latency
+
+        Return
+        ------
+        dict
+            statistics, where latencies are in seconds
+        """
+        count = self.count()
+        return {'count' : count,
+                'mean' : self._total / count if count > 0 else 0.,
+                'p50' : self.percentile(50),
+                'p99' : self.percentile(99),
+                'max' : self._max}
+
+
 class KVServer(object):
     """KVServer is a lightweight key-value store service for DGL distributed training.
 
@@ -87,7 +244,16 @@ class KVServer(object):
     DGL kvstore supports multiple-servers on single-machine. That means we can lunach many servers on the same machine and all of 
     these servers will share the same shared-memory tensor for load-balance.
 
+    With lock_shared_data, PUSH requests are applied under the StripedLock of the data, shared by
+    the servers and the clients of the same machine, which update the shared-memory tensors directly.
+
     Note that, DO NOT use KVServer in multiple threads on Python because this behavior is not defined.
+    To serve requests concurrently, set num_threads instead: the service loop then receives messages
+    in the calling thread and dispatches them to a thread pool. PULL requests are processed in parallel.
+    PUSH requests are split by ranges of local IDs into num_push_shards shards, and the pushes of one
+    shard are applied one at a time in arrival order, so user-defined _push_handler() must only update
+    the rows of the given IDs. A PULL waits for the PUSH requests of the same data received before it,
+    and of the data set by set_pull_after(), and BARRIER waits for all requests received before it.
 
     For now, KVServer can only run in CPU. We will support GPU KVServer in the future.
 
@@ -115,13 +281,27 @@ class KVServer(object):
         Note that the 20 GB is just an upper-bound number and DGL will not allocate 20GB memory.
     net_type : str
         networking type, e.g., 'socket' (default) or 'mpi' (do not support yet).
+    num_threads : int
+        Number of threads processing requests. 1 (default) processes them in the service loop.
+    num_push_shards : int
+        Number of ID-range shards of PUSH requests (num_threads on default).
+    lock_shared_data : bool
+        Whether PUSH requests lock the rows they update (False on default). Locking is only needed
+        if several servers or clients of a machine update the same rows of a shared tensor with a
+        read-modify-write _push_handler(). It must be set the same on all the servers and clients
+        of a machine.
     """
-    def __init__(self, server_id, server_namebook, num_client, queue_size=20*1024*1024*1024, net_type='socket'):
+    def __init__(self, server_id, server_namebook, num_client, queue_size=20*1024*1024*1024, net_type='socket',
+                 num_threads=1, num_push_shards=None, lock_shared_data=False):
         assert server_id >= 0, 'server_id (%d) cannot be a negative number.' % server_id
         assert len(server_namebook) > 0, 'server_namebook cannot be empty.'
         assert num_client >= 0, 'num_client (%d) cannot be a negative number.' % num_client
         assert queue_size > 0, 'queue_size (%d) cannot be a negative number.' % queue_size
         assert net_type == 'socket' or net_type == 'mpi', 'net_type (%s) can only be \'socket\' or \'mpi\'.' % net_type
+        assert num_threads > 0, 'num_threads (%d) must be a positive number.' % num_threads
+        if num_push_shards is None:
+            num_push_shards = num_threads
+        assert num_push_shards > 0, 'num_push_shards (%d) must be a positive number.' % num_push_shards
 
         # check if target data has been initialized
         self._has_data = set()
@@ -146,6 +326,21 @@ class KVServer(object):
         self._open_file_list = []
         # record for total message count
         self._msg_count = 0
+        # Data names with transport encodings
+        self._codec_names = set()
+        # Row locks of shared data, by data name
+        self._lock_shared_data = lock_shared_data
+        self._locks = {}
+        # Data names whose pushes a pull of the data waits for, by data name
+        self._pull_after = {}
+        # Thread pool configuration
+        self._num_threads = num_threads
+        self._num_push_shards = num_push_shards
+        # C sender is shared by the threads of the pool
+        self._send_lock = threading.Lock()
+        # Latency histograms of each message type, from receiving to finishing a message
+        self._latency = {msg_type : LatencyHistogram() for msg_type in
+                         (KVMsgType.PUSH, KVMsgType.PULL, KVMsgType.BARRIER)}
 
 
     def __del__(self):
@@ -234,6 +429,48 @@ class KVServer(object):
             self._data_store[name+'-data-'] = F.zerocopy_from_dlpack(dlpack)
 
         self._has_data.add(name+'-data-')
+        if self._lock_shared_data:
+            self._locks[name] = StripedLock(name+'-lock', F.shape(self._data_store[name+'-data-'])[0])
+            if data_tensor is not None:
+                self._open_file_list.append(name+'-lock')
+
+
+    def set_codec(self, name, ids=None, data=None):
+        """Set the transport encodings of the messages of data.
+
+        KVServer 0 sends the encodings to all clients when they connect, so all servers
+        must set the same encodings before start().
+
+        Parameters
+        ----------
+        name : str
+            data name
+        ids : str
+            encoding of IDs, None (default) or 'delta' (lossless)
+        data : str
+            encoding of data, None (default), 'fp16' or 'int8' (with a scale per row)
+        """
+        assert len(name) > 0, 'name cannot be empty.'
+        set_kv_codec(name, ids, data)
+        self._codec_names.add(name)
+
+
+    def set_pull_after(self, name, push_name):
+        """Order the pulls of data after the pushes of other data.
+
+        A user-defined _push_handler() may update other data than the pushed one, e.g., the
+        optimizer state of the pushed rows. The threaded service loop then has to wait for the
+        pushes of push_name received before a pull of name.
+
+        Parameters
+        ----------
+        name : str
+            data name of the pulls
+        push_name : str
+            data name of the pushes
+        """
+        assert len(name) > 0 and len(push_name) > 0, 'name cannot be empty.'
+        self._pull_after.setdefault(name, set()).add(push_name)
 
 
     def get_id(self):
@@ -291,6 +528,26 @@ class KVServer(object):
         return self._msg_count
 
 
+    def get_latency_stats(self):
+        """Get latency statistics of each message type
+
+        Return
+        ------
+        dict
+            statistics of PUSH, PULL and BARRIER messages (see LatencyHistogram.summary())
+        """
+        return {msg_type.name : hist.summary() for msg_type, hist in self._latency.items()}
+
+
+    def print_latency_stats(self):
+        """Print latency statistics of each message type
+        """
+        for name, stats in self.get_latency_stats().items():
+            print('%s: count %d, mean %.3f ms, p50 %.3f ms, p99 %.3f ms, max %.3f ms' % (
+                name, stats['count'], stats['mean'] * 1e3, stats['p50'] * 1e3,
+                stats['p99'] * 1e3, stats['max'] * 1e3))
+
+
     def print(self):
         """Print server information (Used by debug)
         """
@@ -356,6 +613,9 @@ class KVServer(object):
                 shared_tensor += self._serialize_shared_tensor(
                     name, F.dtype(self._data_store[name]))
                 shared_tensor += '|'
+            for name in self._codec_names:
+                ids, data, _ = get_kv_codec(name)
+                shared_tensor += 'codec:%s/%s/%s|' % (name, ids, data)
 
             msg = KVStoreMsg(
                 type=KVMsgType.IP_ID,
@@ -370,57 +630,253 @@ class KVServer(object):
 
         print('KVStore service %d start successfully! Listen for request ...' % self.get_id())
 
-        # Service loop
+        if self._num_threads > 1:
+            self._threaded_service_loop()
+        else:
+            self._service_loop()
+
+        print("Exit KVStore service %d, solved message count: %d" % (self.get_id(), self.get_message_count()))
+        self.print_latency_stats()
+
+
+    def _service_loop(self):
+        """Service loop processing requests one at a time.
+        """
         while True:
             msg = _recv_kv_msg(self._receiver)
+            start = time.time()
             # Push message
             if msg.type == KVMsgType.PUSH:
-                if (msg.name+'-g2l-' in self._has_data) == True:
-                    local_id = self._data_store[msg.name+'-g2l-'][msg.id]
-                else:
-                    local_id = msg.id
-                self._push_handler(msg.name+'-data-', local_id, msg.data, self._data_store)
+                local_id = self._get_local_id(msg.name, msg.id)
+                self._apply_push(msg.name, local_id, msg.data)
             # Pull message
             elif msg.type == KVMsgType.PULL:
-                if (msg.name+'-g2l-' in self._has_data) == True:
-                    local_id = self._data_store[msg.name+'-g2l-'][msg.id]
-                else:
-                    local_id = msg.id
-                res_tensor = self._pull_handler(msg.name+'-data-', local_id, self._data_store)
-                back_msg = KVStoreMsg(
-                    type=KVMsgType.PULL_BACK,
-                    rank=self._server_id,
-                    name=msg.name,
-                    id=msg.id,
-                    data=res_tensor,
-                    c_ptr=None)
-                _send_kv_msg(self._sender, back_msg, msg.rank)
+                self._serve_pull(msg)
             # Barrier message
             elif msg.type == KVMsgType.BARRIER:
-                self._barrier_count += 1
-                if self._barrier_count == self._client_count:
-                    back_msg = KVStoreMsg(
-                        type=KVMsgType.BARRIER,
-                        rank=self._server_id,
-                        name=None,
-                        id=None,
-                        data=None,
-                        c_ptr=None)
-                    for client_id in range(self._client_count):
-                        _send_kv_msg(self._sender, back_msg, client_id)
-                    self._barrier_count = 0  
-            # Final message              
+                self._serve_barrier()
+            # Final message
             elif msg.type == KVMsgType.FINAL:
-                print("Exit KVStore service %d, solved message count: %d" % (self.get_id(), self.get_message_count()))
                 break # exit loop
             else:
                 raise RuntimeError('Unknown type of kvstore message: %d' % msg.type.value)
 
             _clear_kv_msg(msg)
 
+            self._latency[msg.type].record(time.time() - start)
             self._msg_count += 1
 
 
+    def _threaded_service_loop(self):
+        """Service loop dispatching requests to a thread pool.
+        """
+        pool = ThreadPoolExecutor(max_workers=self._num_threads)
+        # A single thread per shard applies the pushes of the shard in order
+        shards = [ThreadPoolExecutor(max_workers=1) for _ in range(self._num_push_shards)]
+        # Unfinished requests
+        pending = []
+        # The latest push of each data name and shard
+        last_push = {}
+        try:
+            while True:
+                # The receive releases the GIL while it blocks, so the pool keeps serving
+                msg = _recv_kv_msg(self._receiver)
+                start = time.time()
+                # Push message
+                if msg.type == KVMsgType.PUSH:
+                    local_id = self._get_local_id(msg.name, msg.id)
+                    futures = []
+                    shard_push = last_push.setdefault(msg.name, {})
+                    for shard, ID, data in self._split_push(msg.name, local_id, msg.data):
+                        future = shards[shard].submit(self._apply_push, msg.name, ID, data)
+                        shard_push[shard] = future
+                        futures.append(future)
+                    self._when_all_done(futures, self._finish_msg, msg, start)
+                    pending.extend(futures)
+                # Pull message
+                elif msg.type == KVMsgType.PULL:
+                    name = msg.name.partition('|')[0]
+                    pushes = []
+                    for push_name in self._pull_after.get(name, set()) | {name}:
+                        pushes.extend(last_push.get(push_name, {}).values())
+                    future = pool.submit(self._threaded_pull, msg, start, pushes)
+                    pending.append(future)
+                # Barrier message
+                elif msg.type == KVMsgType.BARRIER:
+                    self._wait_all(pending)
+                    pending = []
+                    last_push = {}
+                    self._serve_barrier()
+                    self._finish_msg(msg, start)
+                # Final message
+                elif msg.type == KVMsgType.FINAL:
+                    self._wait_all(pending)
+                    break # exit loop
+                else:
+                    raise RuntimeError('Unknown type of kvstore message: %d' % msg.type.value)
+
+                self._msg_count += 1
+                if len(pending) > 4 * self._num_threads:
+                    # Raise errors of finished requests early and release them
+                    pending = self._reap(pending)
+        finally:
+            pool.shutdown(wait=True)
+            for shard in shards:
+                shard.shutdown(wait=True)
+
+
+    def _threaded_pull(self, msg, start, pushes):
+        """Process a PULL message after the pushes it depends on.
+        """
+        for future in pushes:
+            future.result()
+        self._serve_pull(msg)
+        self._finish_msg(msg, start)
+
+
+    def _finish_msg(self, msg, start):
+        """Release a processed message and record its latency.
+        """
+        _clear_kv_msg(msg)
+        self._latency[msg.type].record(time.time() - start)
+
+
+    def _when_all_done(self, futures, callback, *args):
+        """Call callback(*args) once all the futures are done.
+        """
+        if len(futures) == 0:
+            callback(*args)
+            return
+        remaining = [len(futures)]
+        lock = threading.Lock()
+        def _done(_):
+            with lock:
+                remaining[0] -= 1
+                finished = remaining[0] == 0
+            if finished:
+                callback(*args)
+        for future in futures:
+            future.add_done_callback(_done)
+
+
+    def _reap(self, futures):
+        """Raise the error of any finished future and return the unfinished ones.
+        """
+        unfinished = []
+        for future in futures:
+            if future.done():
+                future.result()
+            else:
+                unfinished.append(future)
+        return unfinished
+
+
+    def _wait_all(self, futures):
+        """Wait until all the futures are done.
+        """
+        for future in futures:
+            future.result()
+
+
+    def _apply_push(self, name, local_id, data):
+        """Apply _push_handler() under the row locks of the data.
+        """
+        lock = self._locks.get(name)
+        if lock is None:
+            self._push_handler(name+'-data-', local_id, data, self._data_store)
+        else:
+            lock.apply(self._push_handler, name+'-data-', local_id, data, self._data_store)
+
+
+    def _get_local_id(self, name, ID):
+        """Translate global IDs of data to local IDs.
+
+        Parameters
+        ----------
+        name : str
+            data name
+        ID : tensor (mx.ndarray or torch.tensor)
+            global IDs
+
+        Return
+        ------
+        tensor
+            local IDs
+        """
+        if (name+'-g2l-' in self._has_data) == True:
+            return self._data_store[name+'-g2l-'][ID]
+        else:
+            return ID
+
+
+    def _split_push(self, name, local_id, data):
+        """Split a PUSH request by the ID-range shards.
+
+        Parameters
+        ----------
+        name : str
+            data name
+        local_id : tensor (mx.ndarray or torch.tensor)
+            local IDs
+        data : tensor (mx.ndarray or torch.tensor)
+            a tensor with the same row size of local_id
+
+        Return
+        ------
+        list of (int, tensor, tensor)
+            the shard, local IDs and data of each part
+        """
+        num_rows = F.shape(self._data_store[name+'-data-'])[0]
+        shard = F.asnumpy(local_id).astype(np.int64) * self._num_push_shards // max(num_rows, 1)
+        shard = np.minimum(shard, self._num_push_shards - 1)
+        shard_ids = np.unique(shard)
+        if len(shard_ids) == 1:
+            return [(int(shard_ids[0]), local_id, data)]
+        parts = []
+        for shard_id in shard_ids:
+            index = F.zerocopy_from_numpy(np.nonzero(shard == shard_id)[0])
+            parts.append((int(shard_id), F.gather_row(local_id, index), F.gather_row(data, index)))
+        return parts
+
+
+    def _serve_pull(self, msg):
+        """Process a PULL message and send the data back.
+
+        The name of the message may carry the request tag of the client after a '|',
+        which is sent back unchanged.
+        """
+        name = msg.name.partition('|')[0]
+        local_id = self._get_local_id(name, msg.id)
+        res_tensor = self._pull_handler(name+'-data-', local_id, self._data_store)
+        back_msg = KVStoreMsg(
+            type=KVMsgType.PULL_BACK,
+            rank=self._server_id,
+            name=msg.name,
+            id=msg.id,
+            data=res_tensor,
+            c_ptr=None)
+        with self._send_lock:
+            _send_kv_msg(self._sender, back_msg, msg.rank)
+
+
+    def _serve_barrier(self):
+        """Process a BARRIER message, replying to all clients once all of them arrived.
+        """
+        self._barrier_count += 1
+        if self._barrier_count == self._client_count:
+            back_msg = KVStoreMsg(
+                type=KVMsgType.BARRIER,
+                rank=self._server_id,
+                name=None,
+                id=None,
+                data=None,
+                c_ptr=None)
+            with self._send_lock:
+                for client_id in range(self._client_count):
+                    _send_kv_msg(self._sender, back_msg, client_id)
+            self._barrier_count = 0
+
+
     def _serialize_shared_tensor(self, name, dtype):
         """Serialize shared tensor information.
 
@@ -542,9 +998,75 @@ class KVServer(object):
         return target[name][ID]
 
 
+class PullHandle(object):
+    """Handle of a pull request returned by KVClient.pull_async().
+
+    The responses of servers are assembled into the data tensor as soon as the last one is
+    received, so the messages can be released before wait() is called.
+
+    Parameters
+    ----------
+    client : KVClient
+        the client sending the request
+    name : str
+        data name
+    num_remote : int
+        number of responses expected from remote servers
+    back_sorted_id : tensor (mx.ndarray or torch.tensor)
+        the row of the received data of each requested ID
+    num_rows : int
+        number of requested IDs
+    """
+    def __init__(self, client, name, num_remote, back_sorted_id, num_rows):
+        self._client = client
+        self._name = name
+        self._back_sorted_id = back_sorted_id
+        self._num_rows = num_rows
+        self._msg_list = []
+        # the local response is added when the request is sent
+        self._num_pending = num_remote
+        self._data = None
+
+    def done(self):
+        """Whether the data has been received
+
+        Return
+        ------
+        bool
+            True if wait() returns without blocking
+        """
+        return self._data is not None
+
+    def wait(self):
+        """Wait for the data
+
+        Return
+        ------
+        tensor
+            a data tensor with the same row size of the requested IDs.
+        """
+        while self._data is None:
+            self._client._recv_pull_back()
+        return self._data
+
+    def _finish(self):
+        """Assemble the data of all responses.
+        """
+        # sort msg by server id and merge tensor together
+        self._msg_list.sort(key=self._client._takeId)
+        data_tensor = F.cat(seq=[msg.data for msg in self._msg_list], dim=0)
+        self._client._update_coalesce_stats('pull', self._num_rows, F.shape(data_tensor)[0], data_tensor)
+        # return data with original index order
+        self._data = F.gather_row(data_tensor, self._back_sorted_id)
+        self._client._garbage_msg.extend(self._msg_list)
+        self._msg_list = None
+
+
 class KVClient(object):
     """KVClient is used to push/pull tensors to/from KVServer. If the server node and client node are on the 
     same machine, they can commuincate with each other using local shared-memory tensor, instead of TCP/IP connections.
+    Local pulls read the shared tensor directly, and local pushes apply _push_handler() to it (under the same
+    StripedLock as the local servers with lock_shared_data), so only requests of remote machines go through sockets.
 
     Note that, DO NOT use KVClient in multiple threads on Python because this behavior is not defined.
 
@@ -569,11 +1091,27 @@ class KVClient(object):
         Sise (bytes) of kvstore message queue buffer (~20 GB on default).
     net_type : str
         networking type, e.g., 'socket' (default) or 'mpi'.
+    coalesce_pull : bool
+        Whether pull() requests each distinct ID only once (True on default).
+    coalesce_push : bool
+        Whether push() sums the data of duplicate IDs and sends each distinct ID only once
+        (False on default). This suits pushing gradients, but not user-defined _push_handler()
+        that must see every duplicate row.
+    max_inflight_pulls : int
+        Maximal number of pull requests waiting for servers (4 on default). pull_async() first
+        receives the responses of earlier requests if the limit is reached, which bounds the
+        memory of in-flight messages.
+    lock_shared_data : bool
+        Whether local pushes lock the rows they update (False on default), see KVServer. It must be
+        set the same on all the servers and clients of a machine.
     """
-    def __init__(self, server_namebook, queue_size=20*1024*1024*1024, net_type='socket'):
+    def __init__(self, server_namebook, queue_size=20*1024*1024*1024, net_type='socket',
+                 coalesce_pull=True, coalesce_push=False, max_inflight_pulls=4,
+                 lock_shared_data=False):
         assert len(server_namebook) > 0, 'server_namebook cannot be empty.'
         assert queue_size > 0, 'queue_size (%d) cannot be a negative number.' % queue_size
         assert net_type == 'socket' or net_type == 'mpi', 'net_type (%s) can only be \'socket\' or \'mpi\'.' % net_type
+        assert max_inflight_pulls > 0, 'max_inflight_pulls (%d) must be a positive number.' % max_inflight_pulls
 
         # check if target data has been initialized
         self._has_data = set()
@@ -594,6 +1132,24 @@ class KVClient(object):
         self._open_file_list = []
         # Gargage_collection
         self._garbage_msg = []
+        # Deduplication of IDs
+        self._coalesce_pull = coalesce_pull
+        self._coalesce_push = coalesce_push
+        # Data names whose pushes are sparsified, see set_push_topk()
+        self._push_topk_names = set()
+        self._coalesce_stats = {'pull_rows' : 0, 'pull_unique_rows' : 0,
+                                'push_rows' : 0, 'push_unique_rows' : 0,
+                                'bytes_saved' : 0}
+        # Row locks of local shared data, by data name
+        self._lock_shared_data = lock_shared_data
+        self._locks = {}
+        # Number of rows and messages of local and remote requests
+        self._traffic_stats = {'local_pull_rows' : 0, 'remote_pull_rows' : 0, 'remote_pull_msgs' : 0,
+                               'local_push_rows' : 0, 'remote_push_rows' : 0, 'remote_push_msgs' : 0}
+        # Pull requests waiting for servers, by request tag
+        self._inflight_pulls = {}
+        self._max_inflight_pulls = max_inflight_pulls
+        self._pull_tag = 0
         # Used load-balance
         random.seed(time.time())
 
@@ -693,7 +1249,13 @@ class KVClient(object):
         assert msg.rank == 0
         data_str = msg.name.split('|')
         for data in data_str:
-            if data != '':
+            if data.startswith('codec:'): # transport encodings of data
+                name, ids, data_codec = data[len('codec:'):].rsplit('/', 2)
+                set_kv_codec(name,
+                             None if ids == 'None' else ids,
+                             None if data_codec == 'None' else data_codec,
+                             get_kv_codec(name)[2])
+            elif data != '':
                 tensor_name, dtype = self._deserialize_shared_tensor(data)
                 while True:
                     if (os.path.exists(tensor_name+'shape')):
@@ -706,6 +1268,9 @@ class KVClient(object):
                 dlpack = shared_data.to_dlpack()
                 self._data_store[tensor_name] = F.zerocopy_from_dlpack(dlpack)
                 self._has_data.add(tensor_name)
+                if self._lock_shared_data and tensor_name.endswith('-data-'):
+                    name = tensor_name[:-len('-data-')]
+                    self._locks[name] = StripedLock(name+'-lock', shape[0])
 
         print("KVClient %d connect to kvstore successfully!" % self.get_id())
 
@@ -773,13 +1338,20 @@ class KVClient(object):
         assert F.ndim(id_tensor) == 1, 'ID must be a vector.'
         assert F.shape(id_tensor)[0] == F.shape(data_tensor)[0], 'The data must has the same row size with ID.'
 
+        num_rows = F.shape(id_tensor)[0]
+        inverse = None
+        if self._coalesce_push:
+            id_tensor, inverse = self._unique_id(id_tensor)
+        if inverse is not None: # sum the data of duplicate IDs
+            data_tensor = F.unsorted_1d_segment_sum(data_tensor, inverse, F.shape(id_tensor)[0], 0)
+        self._update_coalesce_stats('push', num_rows, F.shape(id_tensor)[0], data_tensor)
+        if self._sort_ids(name):
+            id_tensor, order = F.sort_1d(id_tensor)
+            data_tensor = F.gather_row(data_tensor, order)
         # partition data
-        machine_id = self._data_store[name+'-part-'][id_tensor]
-        # sort index by machine id
-        sorted_id = F.tensor(np.argsort(F.asnumpy(machine_id)))
-        id_tensor = id_tensor[sorted_id]
-        data_tensor = data_tensor[sorted_id]
-        machine, count = np.unique(F.asnumpy(machine_id), return_counts=True)
+        sorted_id, machine, count = self._partition_by_machine(name, id_tensor)
+        id_tensor = F.gather_row(id_tensor, sorted_id)
+        data_tensor = F.gather_row(data_tensor, sorted_id)
         # push data to server by order
         start = 0
         local_id = None
@@ -809,11 +1381,18 @@ class KVClient(object):
                 # randomly select a server node in target machine for load-balance
                 s_id = random.randint(machine[idx]*self._group_count, (machine[idx]+1)*self._group_count-1)
                 _send_kv_msg(self._sender, msg, s_id)
+                self._traffic_stats['remote_push_rows'] += end - start
+                self._traffic_stats['remote_push_msgs'] += 1
 
             start += count[idx]
 
         if local_id is not None: # local push
-            self._push_handler(name+'-data-', local_id, local_data, self._data_store)
+            self._traffic_stats['local_push_rows'] += F.shape(local_id)[0]
+            lock = self._locks.get(name)
+            if lock is None:
+                self._push_handler(name+'-data-', local_id, local_data, self._data_store)
+            else:
+                lock.apply(self._push_handler, name+'-data-', local_id, local_data, self._data_store)
     
 
     def pull(self, name, id_tensor):
@@ -831,20 +1410,60 @@ class KVClient(object):
         tensor
             a data tensor with the same row size of id_tensor.
         """
+        return self.pull_async(name, id_tensor).wait()
+
+
+    def pull_async(self, name, id_tensor):
+        """Send a pull request to KVServer without waiting for the data.
+
+        Many requests can be outstanding at the same time, e.g., to pull the data of the
+        next minibatch while computing the current one. The responses are received whenever
+        the client waits for a request, so they may complete in any order.
+
+        Parameters
+        ----------
+        name : str
+            data name
+        id_tensor : tensor (mx.ndarray or torch.tensor)
+            a vector storing the ID list
+
+        Returns
+        -------
+        PullHandle
+            handle whose wait() returns a data tensor with the same row size of id_tensor.
+        """
         assert len(name) > 0, 'name cannot be empty.'
+        assert '|' not in name, 'name cannot contain \'|\'.'
         assert F.ndim(id_tensor) == 1, 'ID must be a vector.'
 
         for msg in self._garbage_msg:
             _clear_kv_msg(msg)
         self._garbage_msg = []
 
+        # bound the number of requests in flight
+        while len(self._inflight_pulls) >= self._max_inflight_pulls:
+            self._recv_pull_back()
+
+        tag = self._pull_tag
+        self._pull_tag += 1
+        num_rows = F.shape(id_tensor)[0]
+        inverse = None
+        if self._coalesce_pull:
+            id_tensor, inverse = self._unique_id(id_tensor)
+        order = None
+        if self._sort_ids(name):
+            id_tensor, order = F.sort_1d(id_tensor)
         # partition data
-        machine_id = self._data_store[name+'-part-'][id_tensor]
-        # sort index by machine id
-        sorted_id = F.tensor(np.argsort(F.asnumpy(machine_id)))
-        back_sorted_id = F.tensor(np.argsort(F.asnumpy(sorted_id)))
-        id_tensor = id_tensor[sorted_id]
-        machine, count = np.unique(F.asnumpy(machine_id), return_counts=True)
+        sorted_id, machine, count = self._partition_by_machine(name, id_tensor)
+        back_sorted_id = F.zeros((F.shape(sorted_id)[0],), F.int64, F.cpu())
+        F.scatter_row_inplace(back_sorted_id, sorted_id, F.arange(0, F.shape(sorted_id)[0]))
+        if order is not None: # map the IDs before sorting to their rows
+            unsorted = F.zeros((F.shape(order)[0],), F.int64, F.cpu())
+            F.scatter_row_inplace(unsorted, order, back_sorted_id)
+            back_sorted_id = unsorted
+        if inverse is not None: # map the duplicate IDs to their unique ID
+            back_sorted_id = F.gather_row(back_sorted_id, inverse)
+        id_tensor = F.gather_row(id_tensor, sorted_id)
         # pull data from server by order
         start = 0
         pull_count = 0
@@ -865,7 +1484,7 @@ class KVClient(object):
                 msg = KVStoreMsg(
                     type=KVMsgType.PULL, 
                     rank=self._client_id, 
-                    name=name, 
+                    name=name+'|'+str(tag),
                     id=partial_id,
                     data=None,
                     c_ptr=None)
@@ -873,11 +1492,14 @@ class KVClient(object):
                 s_id = random.randint(machine[idx]*self._group_count, (machine[idx]+1)*self._group_count-1)
                 _send_kv_msg(self._sender, msg, s_id)
                 pull_count += 1
+                self._traffic_stats['remote_pull_rows'] += end - start
+                self._traffic_stats['remote_pull_msgs'] += 1
 
             start += count[idx]           
 
-        msg_list = []
+        handle = PullHandle(self, name, pull_count, back_sorted_id, num_rows)
         if local_id is not None: # local pull
+            self._traffic_stats['local_pull_rows'] += F.shape(local_id)[0]
             local_data = self._pull_handler(name+'-data-', local_id, self._data_store)
             s_id = random.randint(self._machine_id*self._group_count, (self._machine_id+1)*self._group_count-1)
             local_msg = KVStoreMsg(
@@ -887,27 +1509,179 @@ class KVClient(object):
                 id=None,
                 data=local_data,
                 c_ptr=None)
-            msg_list.append(local_msg)
-            self._garbage_msg.append(local_msg)
+            handle._msg_list.append(local_msg)
 
-        # wait message from server nodes
-        for idx in range(pull_count):
-            remote_msg = _recv_kv_msg(self._receiver)
-            msg_list.append(remote_msg)
-            self._garbage_msg.append(remote_msg)
+        if pull_count > 0:
+            self._inflight_pulls[tag] = handle
+        else:
+            handle._finish()
 
-        # sort msg by server id and merge tensor together
-        msg_list.sort(key=self._takeId)
-        data_tensor = F.cat(seq=[msg.data for msg in msg_list], dim=0)
+        return handle
+
+
+    def _recv_pull_back(self):
+        """Receive the response of a pull request and pass it to the request's handle.
+        """
+        msg = _recv_kv_msg(self._receiver)
+        assert msg.type == KVMsgType.PULL_BACK, 'Recv kv msg error.'
+        tag = int(msg.name.rpartition('|')[2])
+        handle = self._inflight_pulls[tag]
+        handle._msg_list.append(msg)
+        handle._num_pending -= 1
+        if handle._num_pending == 0:
+            del self._inflight_pulls[tag]
+            handle._finish()
+
+
+    def set_push_topk(self, name, ratio):
+        """Only push the rows of the largest gradients of data.
+
+        The gradient rows left out are accumulated and pushed together with later
+        gradients of the same IDs (error feedback). The rows still left out are pushed
+        by barrier() and shut_down(). The residual of an ID is added to a single row of
+        a push, so the client must be created with coalesce_push=True.
+
+        Parameters
+        ----------
+        name : str
+            data name
+        ratio : float
+            fraction of the rows to push in (0, 1], or None to push all rows.
+        """
+        assert ratio is None or self._coalesce_push, \
+            'set_push_topk() requires a KVClient created with coalesce_push=True.'
+        ids, data, _ = get_kv_codec(name)
+        set_kv_codec(name, ids, data, ratio)
+        if ratio is None:
+            self._push_topk_names.discard(name)
+        else:
+            self._push_topk_names.add(name)
+
+
+    def get_traffic_stats(self):
+        """Get statistics of local and remote requests
+
+        Return
+        ------
+        dict
+            number of rows pulled and pushed through local shared memory (local_pull_rows,
+            local_push_rows) and through sockets (remote_pull_rows, remote_push_rows), and
+            number of messages sent to remote servers (remote_pull_msgs, remote_push_msgs).
+        """
+        return dict(self._traffic_stats)
+
+
+    def get_coalesce_stats(self):
+        """Get statistics of the deduplication of pull() and push()
+
+        Return
+        ------
+        dict
+            number of requested rows (pull_rows, push_rows), number of rows actually
+            transferred (pull_unique_rows, push_unique_rows) and the ID and data bytes saved
+            by deduplication (bytes_saved).
+        """
+        return dict(self._coalesce_stats)
+
+
+    def _sort_ids(self, name):
+        """Whether to sort the IDs of requests of data before sending them.
+
+        The ID encodings store the differences of consecutive IDs, which are small
+        only if the IDs are sorted.
+        """
+        return get_kv_codec(name)[0] is not None
+
+
+    def _flush_push_residuals(self):
+        """Push the gradient rows left out by the top-k sparsification of set_push_topk().
+        """
+        for name in sorted(self._push_topk_names):
+            residuals = flush_kv_residuals(name)
+            if residuals is None:
+                continue
+            ids, data, ratio = get_kv_codec(name)
+            # send the residuals without sparsifying them again
+            set_kv_codec(name, ids, data)
+            try:
+                self.push(name, F.zerocopy_from_numpy(residuals[0]),
+                          F.zerocopy_from_numpy(residuals[1]))
+            finally:
+                set_kv_codec(name, ids, data, ratio)
+
+
+    def _unique_id(self, id_tensor):
+        """Deduplicate IDs.
+
+        The unique op returns the position of each ID in the unique IDs along with them, so
+        no buffer over the global ID space is needed.
+
+        Parameters
+        ----------
+        id_tensor : tensor (mx.ndarray or torch.tensor)
+            a vector storing the global data ID
+
+        Return
+        ------
+        tensor
+            the unique IDs, or id_tensor if there is no duplicate ID
+        tensor
+            the position of each ID in the unique IDs, or None if there is no duplicate ID
+        """
+        unique_id, inverse = F.unique(id_tensor, return_inverse=True)
+        if F.shape(unique_id)[0] == F.shape(id_tensor)[0]:
+            return id_tensor, None
+        return unique_id, inverse
+
+
+    def _partition_by_machine(self, name, id_tensor):
+        """Sort IDs by their machine.
+
+        Parameters
+        ----------
+        name : str
+            data name
+        id_tensor : tensor (mx.ndarray or torch.tensor)
+            a vector storing the global data ID
+
+        Return
+        ------
+        tensor
+            the order of IDs sorted by machine
+        numpy.ndarray
+            the machines
+        numpy.ndarray
+            the number of IDs of each machine
+        """
+        machine_id = F.gather_row(self._data_store[name+'-part-'], id_tensor)
+        # keep the order of IDs within each machine, so sorted IDs stay sorted
+        num_id = F.shape(machine_id)[0]
+        _, sorted_id = F.sort_1d(machine_id * num_id + F.arange(0, num_id))
+        num_machine = self._server_count // self._group_count
+        count = np.bincount(F.asnumpy(machine_id), minlength=num_machine).astype(np.int64)
+        return sorted_id, np.arange(num_machine), count
+
+
+    def _update_coalesce_stats(self, op, num_rows, num_unique, data_tensor):
+        """Accumulate the deduplication statistics of a request.
+        """
+        row_bytes = 8 + 4 * int(np.prod(F.shape(data_tensor)[1:]))
+        self._coalesce_stats[op+'_rows'] += num_rows
+        self._coalesce_stats[op+'_unique_rows'] += num_unique
+        self._coalesce_stats['bytes_saved'] += (num_rows - num_unique) * row_bytes
 
-        return data_tensor[back_sorted_id] # return data with original index order
 
-        
     def barrier(self):
         """Barrier for all client nodes
 
-        This API will be blocked untill all the clients call this API.
+        This API will be blocked untill all the clients call this API. The residuals of
+        the pushes sparsified by set_push_topk() are pushed before.
         """
+        self._flush_push_residuals()
+        # responses of pending pulls arrive before the barrier replies
+        while len(self._inflight_pulls) > 0:
+            self._recv_pull_back()
+
         msg = KVStoreMsg( 
             type=KVMsgType.BARRIER,
             rank=self._client_id,
@@ -927,8 +1701,10 @@ class KVClient(object):
     def shut_down(self):
         """Shut down all KVServer nodes.
 
-        We usually invoke this API by just one client (e.g., client_0).
+        We usually invoke this API by just one client (e.g., client_0). The residuals of
+        the pushes sparsified by set_push_topk() are pushed before.
         """
+        self._flush_push_residuals()
         for server_id in range(self._server_count):
             msg = KVStoreMsg(
                 type=KVMsgType.FINAL,
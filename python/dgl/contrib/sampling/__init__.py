@@ -1,4 +1,4 @@
-from .sampler import NeighborSampler, LayerSampler, EdgeSampler
+from .sampler import NeighborSampler, LayerSampler, EdgeSampler, NegativeIndexSampler
 from .randomwalk import *
 from .dis_sampler import SamplerSender, SamplerReceiver
 from .dis_sampler import SamplerPool
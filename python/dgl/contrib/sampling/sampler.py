@@ -13,14 +13,14 @@ from ... import utils
 from ...nodeflow import NodeFlow
 from ... import backend as F
 from ...graph import DGLGraph
-from ...base import NID, EID
+from ...base import NID, EID, DGLError
 
 try:
     import Queue as queue
 except ImportError:
     import queue
 
-__all__ = ['NeighborSampler', 'LayerSampler', 'EdgeSampler']
+__all__ = ['NeighborSampler', 'LayerSampler', 'EdgeSampler', 'NegativeIndexSampler']
 
 class SamplerIter(object):
     def __init__(self, sampler):
@@ -780,6 +780,168 @@ class EdgeSampler(object):
     def batch_size(self):
         return self._batch_size
 
+class NegativeIndexSampler(object):
+    '''Sampler of positive edges and the node IDs of their negative edges.
+
+    Unlike :class:`EdgeSampler`, no subgraph is constructed. Each batch is
+    returned as plain index tensors, which is all that embedding models, e.g.
+    of knowledge graphs, need to look up the embeddings of positive and
+    negative triples.
+
+    The positive edges of a batch are grouped into chunks of ``chunk_size``
+    edges, and all edges of a chunk are corrupted by the same
+    ``neg_sample_size`` nodes. The negative nodes are drawn with replacement,
+    uniformly or proportionally to ``node_weight``, by a multi-threaded C++
+    sampler. Every chunk uses its own random generator seeded from ``seed``,
+    ``rank``, the epoch and the batch, so the samples are reproducible
+    regardless of the number of threads, and different workers draw
+    different samples.
+
+    Currently, `negative_mode` supports:
+
+    * 'head': corrupt the head node of each edge with its own negative nodes,
+
+    * 'tail': corrupt the tail node of each edge with its own negative nodes,
+
+    * 'chunk-head': corrupt the head nodes of a chunk of edges with the same negative nodes,
+
+    * 'chunk-tail': corrupt the tail nodes of a chunk of edges with the same negative nodes.
+
+    Parameters
+    ----------
+    g : DGLGraph
+        The DGLGraph where we sample edges.
+    batch_size : int
+        The number of positive edges per batch. The edges left over after the
+        last full chunk of a batch are dropped.
+    neg_sample_size : int
+        The number of negative nodes per chunk.
+    negative_mode : str, optional
+        The method used to corrupt positive edges. Default: 'chunk-head'
+    chunk_size : int, optional
+        The number of positive edges sharing the same negative nodes. Default:
+        ``neg_sample_size`` for the chunked modes and 1 otherwise.
+    seed_edges : tensor, optional
+        The edges to sample from. Default: all edges.
+    relations : tensor, optional
+        Relations of the edges if this is a knowledge graph.
+    node_weight : tensor or str, optional
+        The sampling weight of each node. If 'degree', the sum of in-degree
+        and out-degree is used. If not provided, nodes are sampled uniformly.
+    shuffle : bool, optional
+        Whether to shuffle the seed edges at every epoch. Default: True
+    seed : int, optional
+        The random seed. Default: 0
+    rank : int, optional
+        The rank of the worker, to draw different samples in each worker.
+        Default: 0
+
+    Examples
+    --------
+    >>> sampler = NegativeIndexSampler(g, 1024, 256, relations=g.edata['id'])
+    >>> for heads, rels, tails, neg_nodes in sampler:
+    >>>     # neg_nodes is of shape (1024 // 256, 256)
+    >>>     print(heads.shape, neg_nodes.shape)
+    '''
+    def __init__(self, g, batch_size, neg_sample_size, negative_mode='chunk-head',
+                 chunk_size=None, seed_edges=None, relations=None, node_weight=None,
+                 shuffle=True, seed=0, rank=0):
+        if negative_mode not in ('head', 'tail', 'chunk-head', 'chunk-tail'):
+            raise DGLError('Invalid negative mode "{}".'.format(negative_mode))
+        if chunk_size is None:
+            chunk_size = neg_sample_size if negative_mode.startswith('chunk') else 1
+        if batch_size < chunk_size or chunk_size <= 0 or neg_sample_size <= 0:
+            raise DGLError('Expect 0 < chunk_size <= batch_size and neg_sample_size > 0.')
+        self._g = g
+        self._batch_size = int(batch_size)
+        self._neg_sample_size = int(neg_sample_size)
+        self._negative_mode = negative_mode
+        self._chunk_size = int(chunk_size)
+        if seed_edges is None:
+            seed_edges = F.arange(0, g.number_of_edges())
+        self._seed_edges = utils.toindex(seed_edges).tonumpy()
+        if relations is not None and len(relations) != g.number_of_edges():
+            raise DGLError('Expect one relation per edge.')
+        self._relations = relations
+        if isinstance(node_weight, str):
+            if node_weight != 'degree':
+                raise DGLError('Invalid node weight "{}".'.format(node_weight))
+            node_weight = F.astype(g.in_degrees() + g.out_degrees(), F.float32)
+        if node_weight is None:
+            node_weight = empty((0,), 'float32')
+        else:
+            node_weight = F.zerocopy_to_dgl_ndarray(F.astype(node_weight, F.float32))
+        self._sampler = _CAPI_CreateNegativeNodeSampler(g.number_of_nodes(), node_weight)
+        self._shuffle = shuffle
+        self._seed = seed
+        self._rank = rank
+        self._epoch = 0
+
+    def __len__(self):
+        # the last batch is dropped if it is shorter than one chunk
+        num_batches, rest = divmod(len(self._seed_edges), self._batch_size)
+        return num_batches + int(rest >= self._chunk_size)
+
+    def __iter__(self):
+        rng = np.random.RandomState([self._seed, self._rank, self._epoch])
+        self._epoch += 1
+        seed_edges = self._seed_edges
+        if self._shuffle:
+            seed_edges = seed_edges[rng.permutation(len(seed_edges))]
+        for start in range(0, len(seed_edges), self._batch_size):
+            batch = seed_edges[start:start + self._batch_size]
+            num_chunks = len(batch) // self._chunk_size
+            if num_chunks == 0:
+                break
+            batch = batch[:num_chunks * self._chunk_size]
+            yield self.sample(batch, int(rng.randint(np.iinfo(np.int64).max, dtype=np.int64)))
+
+    def sample(self, eids, seed):
+        '''Return the positive edges and negative nodes of one batch.
+
+        Parameters
+        ----------
+        eids : numpy.ndarray
+            The positive edge IDs, whose number must be a multiple of the chunk size.
+        seed : int
+            The random seed of the negative nodes.
+
+        Returns
+        -------
+        tensor
+            The head nodes of the positive edges.
+        tensor or None
+            The relations of the positive edges, or None if no relation is given.
+        tensor
+            The tail nodes of the positive edges.
+        tensor
+            The negative nodes of shape (num_chunks, neg_sample_size).
+        '''
+        num_chunks = len(eids) // self._chunk_size
+        if num_chunks * self._chunk_size != len(eids):
+            raise DGLError('Expect a multiple of {} edges, got {}.'.format(
+                self._chunk_size, len(eids)))
+        eids = utils.toindex(eids).tousertensor()
+        heads, tails = self._g.find_edges(eids)
+        rels = None if self._relations is None else F.gather_row(self._relations, eids)
+        neg_nodes = _CAPI_SampleNegativeNodes(self._sampler, num_chunks,
+                                              self._neg_sample_size, seed)
+        neg_nodes = F.reshape(utils.toindex(neg_nodes).tousertensor(),
+                              (num_chunks, self._neg_sample_size))
+        return heads, rels, tails, neg_nodes
+
+    @property
+    def g(self):
+        return self._g
+
+    @property
+    def negative_mode(self):
+        return self._negative_mode
+
+    @property
+    def chunk_size(self):
+        return self._chunk_size
+
 def create_full_nodeflow(g, num_layers, add_self_loop=False):
     """Convert a full graph to NodeFlow to run a L-layer GNN model.
 
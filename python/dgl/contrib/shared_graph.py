@@ -0,0 +1,304 @@
+"""Publish graphs into shared memory for local worker processes.
+
+Unlike the graph store, no server process or RPC is involved. The publisher
+copies the graph structure and all node and edge features into files of the
+shared memory file system once. Any local process, e.g. a forked sampler or
+DataLoader worker, can then attach the graph by name. The features are
+memory-mapped, so they are zero-copy views of the same physical pages in every
+process.
+
+The graph index of each process is created on the mapped structure without
+copying it. The structure of a heterograph is shared as the CSR of outgoing
+edges (with edge IDs) of every relation. The structure of a DGLGraph is shared
+as its COO edge lists, because an immutable GraphIndex cannot be created on a
+CSR with given edge IDs. Other sparse formats a query needs, e.g. the CSR of
+incoming edges for message passing, are still built privately by each process
+on first use.
+
+Each published graph keeps a reference count of the open handles. A graph
+obtained from a handle keeps the handle alive. The shared memory is removed
+when the last handle is closed, either explicitly or when its process exits.
+"""
+import fcntl
+import os
+import pickle
+from multiprocessing import util as mp_util
+
+import numpy as np
+
+from ..base import DGLError
+from .. import backend as F
+from .. import utils
+from ..graph import DGLGraph
+from ..heterograph import DGLHeteroGraph
+from .. import graph_index
+from .. import heterograph_index
+
+__all__ = ['share_graph', 'attach_graph', 'SharedGraph']
+
+# Directory of the shared memory file system.
+_SHM_DIR = '/dev/shm'
+
+def _path(name, suffix):
+    return os.path.join(_SHM_DIR, 'dgl_graph_{}.{}'.format(name, suffix))
+
+def _update_refcount(name, delta):
+    """Atomically add delta to the reference count of the shared graph and
+    remove all its files if the count drops to zero.
+
+    Returns
+    -------
+    int
+        The new reference count.
+    """
+    try:
+        f = open(_path(name, 'lock'), 'r+')
+    except FileNotFoundError:
+        raise DGLError('No shared graph named "{}".'.format(name))
+    with f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        content = f.read()
+        count = int(content) if content else 0
+        if count == 0 and delta > 0:
+            # the graph has been released while we were opening it
+            raise DGLError('No shared graph named "{}".'.format(name))
+        count += delta
+        f.seek(0)
+        f.truncate()
+        f.write(str(count))
+        f.flush()
+        if count == 0:
+            with open(_path(name, 'meta'), 'rb') as meta_file:
+                meta = pickle.load(meta_file)
+            for fname in meta['files'] + [_path(name, 'meta'), _path(name, 'lock')]:
+                try:
+                    os.unlink(fname)
+                except FileNotFoundError:
+                    pass
+    return count
+
+class _ArrayWriter(object):
+    """Write arrays into shared memory files of a shared graph."""
+    def __init__(self, name):
+        self.name = name
+        self.files = []
+
+    def write(self, tensor):
+        """Copy the tensor into a new shared memory file and return its descriptor."""
+        arr = F.asnumpy(tensor)
+        desc = {'dtype' : arr.dtype.str, 'shape' : arr.shape, 'file' : None}
+        if arr.size == 0:
+            # empty files cannot be memory-mapped
+            return desc
+        desc['file'] = _path(self.name, len(self.files))
+        self.files.append(desc['file'])
+        out = np.memmap(desc['file'], dtype=arr.dtype, mode='w+', shape=arr.shape)
+        out[...] = arr
+        out.flush()
+        return desc
+
+    def cleanup(self):
+        """Remove the files written so far."""
+        for fname in self.files:
+            try:
+                os.unlink(fname)
+            except FileNotFoundError:
+                pass
+        self.files = []
+
+def _read(desc):
+    """Map the array described by the descriptor as a tensor."""
+    if desc['file'] is None:
+        arr = np.empty(desc['shape'], dtype=np.dtype(desc['dtype']))
+    else:
+        arr = np.memmap(desc['file'], dtype=np.dtype(desc['dtype']), mode='r+',
+                        shape=desc['shape'])
+    return F.zerocopy_from_numpy(arr)
+
+def _to_csr(src, dst, num_src):
+    """Return the indptr, indices and edge IDs of the CSR of outgoing edges."""
+    src = src.astype(np.int64)
+    eids = np.argsort(src, kind='stable').astype(np.int64)
+    indptr = np.zeros((num_src + 1,), dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=num_src), out=indptr[1:])
+    return indptr, dst.astype(np.int64)[eids], eids
+
+def share_graph(graph, name):
+    """Publish a graph into shared memory.
+
+    Parameters
+    ----------
+    graph : DGLGraph or DGLHeteroGraph
+        The graph to publish. Its structure and all node and edge features are
+        copied into shared memory.
+    name : str
+        The name under which other processes can attach the graph.
+
+    Returns
+    -------
+    SharedGraph
+        The handle of the publisher, whose graph is already backed by shared
+        memory.
+
+    Examples
+    --------
+    >>> from dgl.contrib.shared_graph import share_graph, attach_graph
+    >>> handle = share_graph(g, 'train_graph')
+    >>> # in a worker process
+    >>> g = attach_graph('train_graph').graph
+    >>> # in the publisher, once the workers are done
+    >>> handle.close()
+    """
+    if '/' in name:
+        raise DGLError('Invalid shared graph name "{}".'.format(name))
+    try:
+        lock = open(_path(name, 'lock'), 'x')
+    except FileExistsError:
+        raise DGLError('A shared graph named "{}" already exists.'.format(name))
+    writer = _ArrayWriter(name)
+    try:
+        with lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if isinstance(graph, DGLGraph):
+                src, dst, _ = graph._graph.edges('eid')
+                meta = {
+                    'hetero' : False,
+                    'multigraph' : graph.is_multigraph,
+                    'num_nodes' : graph.number_of_nodes(),
+                    'edges' : [(writer.write(src.tousertensor()),
+                                writer.write(dst.tousertensor()))],
+                    'ndata' : {k : writer.write(v) for k, v in graph.ndata.items()},
+                    'edata' : {k : writer.write(v) for k, v in graph.edata.items()},
+                }
+            elif isinstance(graph, DGLHeteroGraph):
+                csrs = []
+                for etype in graph.canonical_etypes:
+                    src, dst = graph.all_edges(order='eid', etype=etype)
+                    csrs.append(tuple(writer.write(F.zerocopy_from_numpy(arr)) for arr in
+                                      _to_csr(F.asnumpy(src), F.asnumpy(dst),
+                                              graph.number_of_nodes(etype[0]))))
+                meta = {
+                    'hetero' : True,
+                    'ntypes' : graph.ntypes,
+                    'canonical_etypes' : graph.canonical_etypes,
+                    'num_nodes' : [graph.number_of_nodes(ntype) for ntype in graph.ntypes],
+                    'csrs' : csrs,
+                    'ndata' : [{k : writer.write(v) for k, v in graph.nodes[ntype].data.items()}
+                               for ntype in graph.ntypes],
+                    'edata' : [{k : writer.write(v) for k, v in graph.edges[etype].data.items()}
+                               for etype in graph.canonical_etypes],
+                }
+            else:
+                raise DGLError('Expect a DGLGraph or DGLHeteroGraph, got {}.'.format(type(graph)))
+            meta['files'] = writer.files
+            with open(_path(name, 'meta'), 'wb') as meta_file:
+                pickle.dump(meta, meta_file)
+            lock.write('0')
+    except BaseException:
+        # release the name of a graph that could not be published
+        writer.cleanup()
+        for fname in (_path(name, 'meta'), _path(name, 'lock')):
+            try:
+                os.unlink(fname)
+            except FileNotFoundError:
+                pass
+        raise
+    return attach_graph(name)
+
+def attach_graph(name):
+    """Attach a graph published by :func:`share_graph`.
+
+    Parameters
+    ----------
+    name : str
+        The name of the shared graph.
+
+    Returns
+    -------
+    SharedGraph
+        The handle.
+    """
+    return SharedGraph(name)
+
+class SharedGraph(object):
+    """Handle of a graph in shared memory.
+
+    The handle holds one reference to the shared graph until :meth:`close`
+    is called or the process exits. Its graph refers back to the handle, so
+    the reference is not released while the graph is in use.
+
+    Parameters
+    ----------
+    name : str
+        The name of the shared graph.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._graph = None
+        _update_refcount(name, 1)
+        # multiprocessing runs the finalizer at the exit of worker processes
+        # as well, and does not inherit it into forked children.
+        self._finalizer = mp_util.Finalize(self, _update_refcount, args=(name, -1),
+                                           exitpriority=0)
+        with open(_path(name, 'meta'), 'rb') as meta_file:
+            meta = pickle.load(meta_file)
+        if meta['hetero']:
+            self._graph = self._build_heterograph(meta)
+        else:
+            self._graph = self._build_graph(meta)
+        self._graph._shared_handle = self
+
+    @staticmethod
+    def _build_graph(meta):
+        src, dst = meta['edges'][0]
+        gidx = graph_index.from_coo(meta['num_nodes'], _read(src), _read(dst),
+                                    meta['multigraph'], True)
+        g = DGLGraph(gidx, readonly=True)
+        for k, desc in meta['ndata'].items():
+            g.ndata[k] = _read(desc)
+        for k, desc in meta['edata'].items():
+            g.edata[k] = _read(desc)
+        return g
+
+    @staticmethod
+    def _build_heterograph(meta):
+        ntypes = meta['ntypes']
+        ntype_ids = {ntype : i for i, ntype in enumerate(ntypes)}
+        meta_edges = []
+        rel_graphs = []
+        for (stype, _, dtype), csr in zip(meta['canonical_etypes'], meta['csrs']):
+            stid, dtid = ntype_ids[stype], ntype_ids[dtype]
+            meta_edges.append((stid, dtid))
+            indptr, indices, eids = [utils.toindex(_read(desc)) for desc in csr]
+            rel_graphs.append(heterograph_index.create_unitgraph_from_csr(
+                1 if stid == dtid else 2,
+                meta['num_nodes'][stid], meta['num_nodes'][dtid],
+                indptr, indices, eids, 'any'))
+        metagraph = graph_index.from_edge_list(meta_edges, True, True)
+        gidx = heterograph_index.create_heterograph_from_relations(metagraph, rel_graphs)
+        g = DGLHeteroGraph(gidx, ntypes, [etype for _, etype, _ in meta['canonical_etypes']])
+        for ntype, data in zip(ntypes, meta['ndata']):
+            for k, desc in data.items():
+                g.nodes[ntype].data[k] = _read(desc)
+        for etype, data in zip(meta['canonical_etypes'], meta['edata']):
+            for k, desc in data.items():
+                g.edges[etype].data[k] = _read(desc)
+        return g
+
+    @property
+    def graph(self):
+        """The graph whose features are views of the shared memory.
+
+        Features written in place are visible to all processes. Features added
+        afterwards are private to the process.
+        """
+        if self._graph is None:
+            raise DGLError('The shared graph handle has been closed.')
+        return self._graph
+
+    def close(self):
+        """Release the reference to the shared graph. The shared memory is
+        removed when the last reference is released. Graphs obtained from the
+        handle stay valid, since their memory mappings outlive the files."""
+        self._graph = None
+        self._finalizer()
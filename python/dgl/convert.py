@@ -823,9 +823,12 @@ def create_from_edge_list(elist, utype, etype, vtype, urange=None, vrange=None,
     if len(elist) == 0:
         u, v = [], []
     else:
-        u, v = zip(*elist)
-        u = list(u)
-        v = list(v)
+        # convert in bulk rather than unzipping into per-edge Python objects
+        elist = np.asarray(elist, dtype=np.int64)
+        if elist.ndim != 2 or elist.shape[1] != 2:
+            raise DGLError('Invalid edge list. Expect a list of (src, dst) pairs,'
+                           ' but got an array of shape %s.' % str(elist.shape))
+        u, v = elist[:, 0], elist[:, 1]
     return create_from_edges(
         u, v, utype, etype, vtype, urange, vrange, validate, restrict_format)
 
@@ -6,6 +6,7 @@ from .citation_graph import CoraBinary, CitationGraphDataset, CoraDataset
 from .minigc import *
 from .tree import *
 from .utils import *
+from .edge_list import IdMap, read_text_chunks, load_edge_list, graph_from_edge_list
 from .sbm import SBMMixture
 from .reddit import RedditDataset
 from .ppi import PPIDataset, LegacyPPIDataset
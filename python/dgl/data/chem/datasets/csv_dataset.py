@@ -1,9 +1,15 @@
 from __future__ import absolute_import
 
+import hashlib
 import numpy as np
 import os
+import pickle
+import shutil
 import sys
 
+from functools import partial
+from multiprocessing import Pool
+
 from ...utils import save_graphs, load_graphs
 from .... import backend as F
 from ....contrib.deprecation import deprecated
@@ -44,10 +50,22 @@ class MoleculeCSVDataset(object):
         Whether to load the previously pre-processed dataset or pre-process from scratch.
         ``load`` should be False when we want to try different graph construction and
         featurization methods and need to preprocess from scratch. Default to True.
+    num_processes : int or None
+        Number of worker processes for constructing DGLGraphs. If None, then we will use
+        the number of CPUs in the system. Default to 1.
+    chunk_size : int
+        Number of molecules processed per chunk. Each processed chunk is saved to a shard
+        file in the directory ``cache_file_path + '.shards'``, so an interrupted
+        pre-processing resumes from the finished chunks when ``load`` is True. Shards are
+        only reused if the SMILES, ``chunk_size`` and the pickled ``smiles_to_graph``
+        and featurizers are unchanged. Functions are pickled by name, so a rerun after
+        editing their code must pass ``load=False``. The shards are merged into
+        ``cache_file_path`` and removed at the end. Default to 1000.
     """
     @deprecated('Import MoleculeCSVDataset from dgllife.data instead.', 'class')
     def __init__(self, df, smiles_to_graph, node_featurizer, edge_featurizer,
-                 smiles_column, cache_file_path, task_names=None, load=True):
+                 smiles_column, cache_file_path, task_names=None, load=True,
+                 num_processes=1, chunk_size=1000):
         if 'rdkit' not in sys.modules:
             from ....base import dgl_warning
             dgl_warning(
@@ -60,6 +78,8 @@ class MoleculeCSVDataset(object):
             self.task_names = task_names
         self.n_tasks = len(self.task_names)
         self.cache_file_path = cache_file_path
+        self.num_processes = num_processes
+        self.chunk_size = chunk_size
         self._pre_process(smiles_to_graph, node_featurizer, edge_featurizer, load)
 
     def _pre_process(self, smiles_to_graph, node_featurizer, edge_featurizer, load):
@@ -93,11 +113,9 @@ class MoleculeCSVDataset(object):
             self.mask = label_dict['mask']
         else:
             print('Processing dgl graphs from scratch...')
-            self.graphs = []
-            for i, s in enumerate(self.smiles):
-                print('Processing molecule {:d}/{:d}'.format(i+1, len(self)))
-                self.graphs.append(smiles_to_graph(s, node_featurizer=node_featurizer,
-                                                   edge_featurizer=edge_featurizer))
+            self.graphs = self._construct_graphs(
+                partial(smiles_to_graph, node_featurizer=node_featurizer,
+                        edge_featurizer=edge_featurizer), load)
             _label_values = self.df[self.task_names].values
             # np.nan_to_num will also turn inf into a very large number
             self.labels = F.zerocopy_from_numpy(np.nan_to_num(_label_values).astype(np.float32))
@@ -105,6 +123,85 @@ class MoleculeCSVDataset(object):
             save_graphs(self.cache_file_path, self.graphs,
                         labels={'labels': self.labels, 'mask': self.mask})
 
+    def _construct_graphs(self, smiles_to_graph, resume):
+        """Construct DGLGraphs chunk by chunk, possibly in parallel
+
+        Parameters
+        ----------
+        smiles_to_graph : callable, SMILES -> DGLGraph
+            Function for converting a SMILES (str) into a featurized DGLGraph.
+        resume : bool
+            Whether to reuse the shards of chunks finished in a previous run.
+
+        Returns
+        -------
+        list of DGLGraph
+            DGLGraphs for all molecules.
+        """
+        shard_root = self.cache_file_path + '.shards'
+        key = self._shard_key(smiles_to_graph)
+        if key is None:
+            print('Cannot pickle smiles_to_graph and the featurizers, '
+                  'previously processed chunks will not be reused')
+            resume = False
+            key = 'unkeyed'
+        if os.path.exists(shard_root):
+            for name in os.listdir(shard_root):
+                # shards of other inputs are stale
+                if not resume or name != key:
+                    shutil.rmtree(os.path.join(shard_root, name))
+        shard_dir = os.path.join(shard_root, key)
+        os.makedirs(shard_dir, exist_ok=True)
+
+        shard_paths = []
+        todo = []
+        for start in range(0, len(self), self.chunk_size):
+            end = min(start + self.chunk_size, len(self))
+            path = os.path.join(shard_dir, 'shard_{:d}_{:d}.bin'.format(start, end))
+            shard_paths.append(path)
+            if not os.path.exists(path):
+                todo.append((path, self.smiles[start:end]))
+
+        num_done = len(self) - sum(len(chunk) for _, chunk in todo)
+        if num_done > 0:
+            print('Resuming from {:d} previously processed molecules'.format(num_done))
+        process = partial(_process_chunk, smiles_to_graph)
+        if self.num_processes == 1:
+            for num_mols in map(process, todo):
+                num_done += num_mols
+                print('Processed {:d}/{:d} molecules'.format(num_done, len(self)))
+        else:
+            with Pool(processes=self.num_processes) as pool:
+                for num_mols in pool.imap_unordered(process, todo):
+                    num_done += num_mols
+                    print('Processed {:d}/{:d} molecules'.format(num_done, len(self)))
+
+        graphs = []
+        for path in shard_paths:
+            graphs.extend(load_graphs(path)[0])
+        shutil.rmtree(shard_root)
+        return graphs
+
+    def _shard_key(self, smiles_to_graph):
+        """Hash the inputs determining the content of the shards
+
+        Parameters
+        ----------
+        smiles_to_graph : callable, SMILES -> DGLGraph
+            Function for converting a SMILES (str) into a featurized DGLGraph.
+
+        Returns
+        -------
+        str or None
+            Hex digest of the SMILES, the chunk size and the pickled
+            ``smiles_to_graph``, or None if ``smiles_to_graph`` cannot be pickled.
+        """
+        try:
+            data = pickle.dumps((self.smiles, self.chunk_size, smiles_to_graph))
+        except (pickle.PicklingError, AttributeError, TypeError):
+            return None
+        return hashlib.sha1(data).hexdigest()
+
     def __getitem__(self, item):
         """Get datapoint with index
 
@@ -135,3 +232,29 @@ class MoleculeCSVDataset(object):
             Length of Dataset
         """
         return len(self.smiles)
+
+
+def _process_chunk(smiles_to_graph, chunk):
+    """Construct DGLGraphs for a chunk of SMILES and save them to a shard file
+
+    The shard is first written to a temporary file and then renamed so that
+    an interrupted run never leaves a partial shard behind.
+
+    Parameters
+    ----------
+    smiles_to_graph : callable, SMILES -> DGLGraph
+        Function for converting a SMILES (str) into a featurized DGLGraph.
+    chunk : tuple of (str, list of str)
+        Path of the shard file and the SMILES of the chunk.
+
+    Returns
+    -------
+    int
+        Number of molecules processed.
+    """
+    path, smiles = chunk
+    graphs = [smiles_to_graph(s) for s in smiles]
+    tmp_path = path + '.tmp'
+    save_graphs(tmp_path, graphs)
+    os.replace(tmp_path, path)
+    return len(graphs)
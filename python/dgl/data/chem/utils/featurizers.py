@@ -1,7 +1,8 @@
 import itertools
 import numpy as np
 
-from collections import defaultdict
+from functools import partial
+from operator import methodcaller
 
 from .... import backend as F
 from ....contrib.deprecation import deprecated
@@ -532,6 +533,104 @@ class ConcatFeaturizer(object):
         return list(itertools.chain.from_iterable(
             [func(x) for func in self.func_list]))
 
+# Functions whose output only depends on a single atom/bond property. During
+# batch featurization, they are evaluated once per distinct property value and
+# the results are looked up for all atoms/bonds sharing that value. The getters
+# are picklable, so are the featurizers holding them.
+_VALUE_GETTERS = {
+    atom_type_one_hot: methodcaller('GetSymbol'),
+    atomic_number_one_hot: methodcaller('GetAtomicNum'),
+    atomic_number: methodcaller('GetAtomicNum'),
+    atom_degree_one_hot: methodcaller('GetDegree'),
+    atom_degree: methodcaller('GetDegree'),
+    atom_total_degree_one_hot: methodcaller('GetTotalDegree'),
+    atom_total_degree: methodcaller('GetTotalDegree'),
+    atom_implicit_valence_one_hot: methodcaller('GetImplicitValence'),
+    atom_implicit_valence: methodcaller('GetImplicitValence'),
+    atom_hybridization_one_hot: methodcaller('GetHybridization'),
+    atom_total_num_H_one_hot: methodcaller('GetTotalNumHs'),
+    atom_total_num_H: methodcaller('GetTotalNumHs'),
+    atom_formal_charge_one_hot: methodcaller('GetFormalCharge'),
+    atom_formal_charge: methodcaller('GetFormalCharge'),
+    atom_num_radical_electrons_one_hot: methodcaller('GetNumRadicalElectrons'),
+    atom_num_radical_electrons: methodcaller('GetNumRadicalElectrons'),
+    atom_is_aromatic_one_hot: methodcaller('GetIsAromatic'),
+    atom_is_aromatic: methodcaller('GetIsAromatic'),
+    atom_chiral_tag_one_hot: methodcaller('GetChiralTag'),
+    atom_mass: methodcaller('GetMass'),
+}
+
+def _value_getter(func):
+    """Return the property getter of a featurization function, or None if
+    the function is not known to depend on a single property."""
+    if isinstance(func, partial):
+        func = func.func
+    return _VALUE_GETTERS.get(func, None)
+
+class _FeaturizerPlan(object):
+    """Featurization plan for a batch of atoms or bonds.
+
+    A featurizer is split into columns, one per function of a
+    :class:`ConcatFeaturizer` or a single one for other callables. Columns
+    with a known property getter are filled from lookup tables mapping each
+    property value to its feature row. The tables are kept across calls.
+
+    Parameters
+    ----------
+    featurizer : callable
+        The featurization function.
+    """
+    def __init__(self, featurizer):
+        if isinstance(featurizer, ConcatFeaturizer):
+            funcs = featurizer.func_list
+        else:
+            funcs = [featurizer]
+        self.columns = [(func, _value_getter(func)) for func in funcs]
+        self.tables = [dict() for _ in funcs]
+
+    def __call__(self, items, feat_size):
+        """Featurize a list of atoms or bonds.
+
+        Parameters
+        ----------
+        items : list
+            Atoms or bonds.
+        feat_size : callable
+            Function returning the total feature size, used if items is empty.
+
+        Returns
+        -------
+        numpy.ndarray of dtype float32 and shape (len(items), M)
+        """
+        if len(items) == 0:
+            return np.zeros((0, feat_size()), dtype=np.float32)
+        blocks = []
+        for (func, getter), table in zip(self.columns, self.tables):
+            if getter is None:
+                blocks.append(np.stack([np.asarray(func(x), dtype=np.float32)
+                                        for x in items]))
+                continue
+            codes = {}
+            code_list = []
+            keys = []
+            for x in items:
+                key = getter(x)
+                code = codes.get(key)
+                if code is None:
+                    code = codes[key] = len(keys)
+                    keys.append(key)
+                    if key not in table:
+                        table[key] = np.asarray(func(x), dtype=np.float32)
+                code_list.append(code)
+            lookup = np.stack([table[key] for key in keys])
+            blocks.append(lookup[np.asarray(code_list, dtype=np.int64)])
+        out = np.empty((len(items), sum(b.shape[1] for b in blocks)), dtype=np.float32)
+        offset = 0
+        for b in blocks:
+            out[:, offset:offset + b.shape[1]] = b
+            offset += b.shape[1]
+        return out
+
 class BaseAtomFeaturizer(object):
     """An abstract class for atom featurizers.
 
@@ -570,6 +669,8 @@ class BaseAtomFeaturizer(object):
         if feat_sizes is None:
             feat_sizes = dict()
         self._feat_sizes = feat_sizes
+        # Featurization plans by feature name, created on first use
+        self._plans = dict()
 
     def feat_size(self, feat_name):
         """Get the feature size for ``feat_name``.
@@ -589,6 +690,13 @@ class BaseAtomFeaturizer(object):
 
         return self._feat_sizes[feat_name]
 
+    def __getstate__(self):
+        """Drop the featurization plans when pickled, e.g. to send the
+        featurizer to worker processes. They are created again on first use."""
+        state = self.__dict__.copy()
+        state['_plans'] = dict()
+        return state
+
     def __call__(self, mol):
         """Featurize all atoms in a molecule.
 
@@ -604,22 +712,47 @@ class BaseAtomFeaturizer(object):
             feature under the key ``k``. Each feature is a tensor of dtype float32 and shape
             (N, M), where N is the number of atoms in the molecule.
         """
-        num_atoms = mol.GetNumAtoms()
-        atom_features = defaultdict(list)
+        return self.featurize_batch([mol])[0]
+
+    def featurize_batch(self, mols):
+        """Featurize all atoms in a list of molecules in one pass.
 
-        # Compute features for each atom
-        for i in range(num_atoms):
-            atom = mol.GetAtomWithIdx(i)
-            for feat_name, feat_func in self.featurizer_funcs.items():
-                atom_features[feat_name].append(feat_func(atom))
+        Parameters
+        ----------
+        mols : list of rdkit.Chem.rdchem.Mol
+            RDKit molecule instances.
+
+        Returns
+        -------
+        dict
+            For each function in self.featurizer_funcs with the key ``k``, store the computed
+            feature under the key ``k``. Each feature is a tensor of dtype float32 and shape
+            (N, M), where N is the total number of atoms in the molecules.
+        Tensor of dtype int64 and shape (len(mols) + 1,)
+            Offsets of the molecules. Features of the i-th molecule are in rows
+            ``offsets[i]`` to ``offsets[i + 1]``.
+        """
+        atoms = []
+        offsets = [0]
+        for mol in mols:
+            atoms.extend(mol.GetAtoms())
+            offsets.append(len(atoms))
 
-        # Stack the features and convert them to float arrays
         processed_features = dict()
-        for feat_name, feat_list in atom_features.items():
-            feat = np.stack(feat_list)
-            processed_features[feat_name] = F.zerocopy_from_numpy(feat.astype(np.float32))
+        for feat_name, feat in self._featurize(atoms).items():
+            processed_features[feat_name] = F.zerocopy_from_numpy(feat)
 
-        return processed_features
+        return processed_features, F.tensor(offsets, dtype=F.int64)
+
+    def _featurize(self, atoms):
+        """Featurize atoms into float32 numpy arrays."""
+        features = dict()
+        for feat_name, feat_func in self.featurizer_funcs.items():
+            if feat_name not in self._plans:
+                self._plans[feat_name] = _FeaturizerPlan(feat_func)
+            features[feat_name] = self._plans[feat_name](
+                atoms, partial(self.feat_size, feat_name))
+        return features
 
 class CanonicalAtomFeaturizer(BaseAtomFeaturizer):
     """A default featurizer for atoms.
@@ -792,6 +925,15 @@ def bond_stereo_one_hot(bond, allowable_set=None, encode_unknown=False):
                          Chem.rdchem.BondStereo.STEREOTRANS]
     return one_hot_encoding(bond.GetStereo(), allowable_set, encode_unknown)
 
+_VALUE_GETTERS.update({
+    bond_type_one_hot: methodcaller('GetBondType'),
+    bond_is_conjugated_one_hot: methodcaller('GetIsConjugated'),
+    bond_is_conjugated: methodcaller('GetIsConjugated'),
+    bond_is_in_ring_one_hot: methodcaller('IsInRing'),
+    bond_is_in_ring: methodcaller('IsInRing'),
+    bond_stereo_one_hot: methodcaller('GetStereo'),
+})
+
 class BaseBondFeaturizer(object):
     """An abstract class for bond featurizers.
     Loop over all bonds in a molecule and featurize them with the ``featurizer_funcs``.
@@ -832,6 +974,8 @@ class BaseBondFeaturizer(object):
         if feat_sizes is None:
             feat_sizes = dict()
         self._feat_sizes = feat_sizes
+        # Featurization plans by feature name, created on first use
+        self._plans = dict()
 
     def feat_size(self, feat_name):
         """Get the feature size for ``feat_name``.
@@ -851,6 +995,13 @@ class BaseBondFeaturizer(object):
 
         return self._feat_sizes[feat_name]
 
+    def __getstate__(self):
+        """Drop the featurization plans when pickled, e.g. to send the
+        featurizer to worker processes. They are created again on first use."""
+        state = self.__dict__.copy()
+        state['_plans'] = dict()
+        return state
+
     def __call__(self, mol):
         """Featurize all bonds in a molecule.
 
@@ -866,23 +1017,48 @@ class BaseBondFeaturizer(object):
             feature under the key ``k``. Each feature is a tensor of dtype float32 and shape
             (N, M), where N is the number of atoms in the molecule.
         """
-        num_bonds = mol.GetNumBonds()
-        bond_features = defaultdict(list)
+        return self.featurize_batch([mol])[0]
 
-        # Compute features for each bond
-        for i in range(num_bonds):
-            bond = mol.GetBondWithIdx(i)
-            for feat_name, feat_func in self.featurizer_funcs.items():
-                feat = feat_func(bond)
-                bond_features[feat_name].extend([feat, feat.copy()])
+    def featurize_batch(self, mols):
+        """Featurize all bonds in a list of molecules in one pass.
 
-        # Stack the features and convert them to float arrays
-        processed_features = dict()
-        for feat_name, feat_list in bond_features.items():
-            feat = np.stack(feat_list)
-            processed_features[feat_name] = F.zerocopy_from_numpy(feat.astype(np.float32))
+        Parameters
+        ----------
+        mols : list of rdkit.Chem.rdchem.Mol
+            RDKit molecule instances.
 
-        return processed_features
+        Returns
+        -------
+        dict
+            For each function in self.featurizer_funcs with the key ``k``, store the computed
+            feature under the key ``k``. Each feature is a tensor of dtype float32 and shape
+            (N, M), where N is twice the total number of bonds in the molecules.
+        Tensor of dtype int64 and shape (len(mols) + 1,)
+            Offsets of the molecules. Features of the i-th molecule are in rows
+            ``offsets[i]`` to ``offsets[i + 1]``.
+        """
+        bonds = []
+        offsets = [0]
+        for mol in mols:
+            bonds.extend(mol.GetBonds())
+            offsets.append(2 * len(bonds))
+
+        processed_features = dict()
+        for feat_name, feat in self._featurize(bonds).items():
+            # Each bond corresponds to two edges in opposite directions
+            processed_features[feat_name] = F.zerocopy_from_numpy(np.repeat(feat, 2, axis=0))
+
+        return processed_features, F.tensor(offsets, dtype=F.int64)
+
+    def _featurize(self, bonds):
+        """Featurize bonds into float32 numpy arrays."""
+        features = dict()
+        for feat_name, feat_func in self.featurizer_funcs.items():
+            if feat_name not in self._plans:
+                self._plans[feat_name] = _FeaturizerPlan(feat_func)
+            features[feat_name] = self._plans[feat_name](
+                bonds, partial(self.feat_size, feat_name))
+        return features
 
 class CanonicalBondFeaturizer(BaseBondFeaturizer):
     """A default featurizer for bonds.
@@ -0,0 +1,392 @@
+"""Streaming construction of graphs from edge list files.
+
+Edge list files are read in fixed-size chunks. The lines of each chunk are
+split into tokens by numpy operations on the chunk buffer and one bytes.split,
+and the node IDs are converted to int64 with vectorized numpy operations, or
+mapped from strings by an :class:`IdMap`, and appended to growable COO
+buffers. No Python object is kept per edge or per node, so the peak memory is
+bounded by the COO arrays, the ID map and one chunk.
+"""
+from __future__ import absolute_import
+
+import numpy as np
+
+from ..base import DGLError
+from .. import convert
+
+__all__ = ['IdMap', 'read_text_chunks', 'load_edge_list', 'graph_from_edge_list']
+
+class IdMap(object):
+    """Map node keys, e.g. strings, to consecutive integer IDs.
+
+    Keys are given ID in the order of their first appearance. The map is
+    stored as a few runs of sorted keys with the arrays of their IDs, and
+    lookups are vectorized with binary search, so no Python object is created
+    per key. New keys form a new run, and runs of similar sizes are merged, so
+    adding n keys in many chunks takes O(n log n) time in total.
+
+    Parameters
+    ----------
+    keys : numpy.ndarray, optional
+        Keys to map to ID 0, 1, ... in order.
+
+    Examples
+    --------
+    >>> id_map = IdMap()
+    >>> id_map.map(np.array(['b', 'a', 'b']))
+    array([0, 1, 0])
+    >>> id_map.map(np.array(['c', 'a']))
+    array([2, 1])
+    >>> id_map.keys()
+    array(['b', 'a', 'c'], dtype='<U1')
+    """
+    def __init__(self, keys=None):
+        # list of (sorted keys, their IDs), from the largest to the smallest run
+        self._runs = []
+        self._size = 0
+        if keys is not None:
+            self.map(keys)
+
+    def __len__(self):
+        return self._size
+
+    def _find(self, uniq):
+        """Return the IDs of the sorted unique keys, -1 for unknown keys."""
+        ids = np.full((len(uniq),), -1, dtype=np.int64)
+        for run_keys, run_ids in self._runs:
+            pos = np.searchsorted(run_keys, uniq)
+            inside = np.nonzero(pos < len(run_keys))[0]
+            found = inside[run_keys[pos[inside]] == uniq[inside]]
+            ids[found] = run_ids[pos[found]]
+        return ids
+
+    def _add_run(self, run_keys, run_ids):
+        """Add a run of sorted new keys and merge the runs of similar sizes."""
+        self._runs.append((run_keys, run_ids))
+        while len(self._runs) > 1 and len(self._runs[-2][0]) <= 2 * len(self._runs[-1][0]):
+            (keys1, ids1), (keys2, ids2) = self._runs[-2:]
+            # concatenate widens the key dtype, e.g. for longer strings
+            keys = np.concatenate([keys1, keys2])
+            order = np.argsort(keys, kind='stable')
+            self._runs[-2:] = [(keys[order], np.concatenate([ids1, ids2])[order])]
+
+    def map(self, keys, add=True):
+        """Map keys to IDs.
+
+        Parameters
+        ----------
+        keys : numpy.ndarray
+            The keys.
+        add : bool, optional
+            If True, unknown keys are given new IDs. Otherwise, they are
+            mapped to -1. (Default: True)
+
+        Returns
+        -------
+        numpy.ndarray
+            The int64 IDs of the keys.
+        """
+        keys = np.asarray(keys).reshape(-1)
+        if len(keys) == 0:
+            return np.empty((0,), dtype=np.int64)
+        uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        uniq_ids = self._find(uniq)
+        new = np.nonzero(uniq_ids < 0)[0]
+        if add and len(new) > 0:
+            # number the new keys by their first appearance
+            order = new[np.argsort(first[new], kind='stable')]
+            uniq_ids[order] = np.arange(self._size, self._size + len(new), dtype=np.int64)
+            self._size += len(new)
+            # uniq is sorted, so the new keys form a sorted run
+            self._add_run(uniq[new], uniq_ids[new])
+        return uniq_ids[inverse.reshape(-1)]
+
+    def keys(self):
+        """Return the keys ordered by their IDs.
+
+        Returns
+        -------
+        numpy.ndarray
+            The keys.
+        """
+        if not self._runs:
+            return np.empty((0,))
+        keys = np.concatenate([run_keys for run_keys, _ in self._runs])
+        ids = np.concatenate([run_ids for _, run_ids in self._runs])
+        out = np.empty_like(keys)
+        out[ids] = keys
+        return out
+
+class _GrowableArray(object):
+    """An int64 array with amortized constant-time appends."""
+    def __init__(self, capacity=1024):
+        self._data = np.empty((capacity,), dtype=np.int64)
+        self._size = 0
+
+    def append(self, values):
+        """Append an array of values."""
+        end = self._size + len(values)
+        if end > len(self._data):
+            data = np.empty((max(end, 2 * len(self._data)),), dtype=np.int64)
+            data[:self._size] = self._data[:self._size]
+            self._data = data
+        self._data[self._size:end] = values
+        self._size = end
+
+    def finalize(self):
+        """Return the appended values, releasing the unused capacity."""
+        data = self._data[:self._size].copy() if self._size < len(self._data) else self._data
+        self._data = np.empty((0,), dtype=np.int64)
+        self._size = 0
+        return data
+
+# bytes that split() treats as whitespace
+_SPACES = np.zeros((256,), dtype=bool)
+_SPACES[list(b' \t\n\r\x0b\x0c')] = True
+
+def _count_tokens(data, line_ends, delim):
+    """Count the tokens of each line of a chunk, given the positions of the
+    line ends."""
+    if delim is None:
+        # a token begins at a non-space byte after a space byte
+        space = _SPACES[data]
+        begins = np.flatnonzero(~space[1:] & space[:-1]) + 1
+        if len(data) > 0 and not space[0]:
+            begins = np.concatenate([[0], begins])
+    else:
+        # the tokens of a line are one more than its delimiters
+        match = data[:len(data) - len(delim) + 1] == delim[0]
+        for k in range(1, len(delim)):
+            match &= data[k:len(data) - len(delim) + 1 + k] == delim[k]
+        begins = np.flatnonzero(match)
+    counts = np.bincount(np.searchsorted(line_ends, begins), minlength=len(line_ends))
+    return counts if delim is None else counts + 1
+
+def _split_chunk(buf, delim, prefix):
+    """Split a chunk of complete lines into tokens.
+
+    Blank lines and comment lines are dropped, and the surrounding whitespace
+    of the other lines is stripped. All the work is done by numpy and a single
+    bytes.split, without a Python loop over the lines.
+
+    Returns
+    -------
+    list of bytes
+        The tokens of all the kept lines.
+    numpy.ndarray
+        The number of tokens of each kept line.
+    numpy.ndarray
+        The index of each kept line in the chunk.
+    """
+    data = np.frombuffer(buf, dtype=np.uint8)
+    ends = np.flatnonzero(data == ord('\n'))
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    # first and last non-space bytes of each line, if any
+    content = np.flatnonzero(~_SPACES[data])
+    pos = np.searchsorted(content, starts)
+    first = content[np.minimum(pos, len(content) - 1)] if len(content) > 0 else ends
+    keep = (pos < len(content)) & (first < ends)
+    if prefix is not None:
+        comment = keep.copy()
+        for k, byte in enumerate(prefix):
+            index = first + k
+            comment &= (index < ends) & (data[np.minimum(index, len(data) - 1)] == byte)
+        keep &= ~comment
+    lines = np.flatnonzero(keep)
+    first = first[lines]
+    last = content[np.searchsorted(content, ends[lines]) - 1]
+    # keep the bytes from the first to the last non-space byte of the kept
+    # lines, and their line ends
+    inside = np.zeros((len(data) + 1,), dtype=np.int64)
+    inside[first] += 1
+    inside[last + 1] -= 1
+    mask = np.cumsum(inside[:-1]) > 0
+    mask[ends[lines]] = True
+    if not mask.all():
+        data = data[mask]
+        buf = data.tobytes()
+    counts = _count_tokens(data, np.flatnonzero(data == ord('\n')), delim)
+    if delim is None:
+        tokens = buf.split()
+    elif len(buf) > 0:
+        tokens = buf[:-1].replace(b'\n', delim).split(delim)
+    else:
+        tokens = []
+    return tokens, counts, lines
+
+def read_text_chunks(path, delimiter=None, comments='#', skip_rows=0, min_cols=1,
+                     chunk_size=1 << 26):
+    """Read the tokens of a delimited text file in chunks of lines.
+
+    Blank lines are skipped, and the surrounding whitespace of the other
+    lines is stripped. They must all have the same number of columns, and at
+    least ``min_cols`` of them.
+
+    Parameters
+    ----------
+    path : str
+        The text file.
+    delimiter : str, optional
+        The column delimiter. (Default: any whitespace)
+    comments : str, optional
+        Lines starting with it are skipped. If None, no line is a comment.
+        (Default: '#')
+    skip_rows : int, optional
+        The number of header lines to skip. (Default: 0)
+    min_cols : int, optional
+        The minimal number of columns. (Default: 1)
+    chunk_size : int, optional
+        The approximate number of bytes read per chunk. (Default: 64MB)
+
+    Yields
+    ------
+    numpy.ndarray
+        The bytes tokens of the lines of a chunk, with one row per line.
+    """
+    prefix = comments.encode() if comments is not None else None
+    delim = delimiter.encode() if delimiter is not None else None
+    width = None
+    line_no = skip_rows
+    with open(path, 'rb') as f:
+        for _ in range(skip_rows):
+            f.readline()
+        while True:
+            # complete the last line of the chunk
+            buf = f.read(chunk_size) + f.readline()
+            if not buf:
+                break
+            if not buf.endswith(b'\n'):
+                buf += b'\n'
+            tokens, counts, lines = _split_chunk(buf, delim, prefix)
+            if len(lines) > 0:
+                if width is None:
+                    width = int(counts[0])
+                    if width < min_cols:
+                        raise DGLError('Expect at least %d columns in %s, got %d at line %d.'
+                                       % (min_cols, path, width, line_no + lines[0] + 1))
+                bad = np.flatnonzero(counts != width)
+                if len(bad) > 0:
+                    raise DGLError('Expect %d columns in %s, got %d at line %d.'
+                                   % (width, path, counts[bad[0]], line_no + lines[bad[0]] + 1))
+                if len(tokens) != len(lines) * width:
+                    raise DGLError('Invalid delimiter %r in %s.' % (delimiter, path))
+                yield np.array(tokens).reshape(len(lines), width)
+            line_no += buf.count(b'\n')
+
+def _npy_chunks(path, chunk_size):
+    """Yield chunks of rows of a 2D .npy file without loading it into memory."""
+    arr = np.load(path, mmap_mode='r')
+    if arr.ndim != 2:
+        raise DGLError('Expect a 2D array of edges in %s, got shape %s.' % (path, arr.shape))
+    rows = max(chunk_size // max(arr.itemsize * arr.shape[1], 1), 1)
+    for start in range(0, arr.shape[0], rows):
+        yield np.asarray(arr[start:start + rows])
+
+def load_edge_list(path, columns=(0, 1), delimiter=None, comments='#', skip_rows=0,
+                   string_ids=False, id_map=None, chunk_size=1 << 26):
+    """Read the edges of a delimited text file or a ``.npy`` file in chunks.
+
+    Parameters
+    ----------
+    path : str
+        The file. Files ending with ``.npy`` must hold a 2D array with one
+        row per edge. Other files are read as delimited text with one edge
+        per line.
+    columns : tuple of int, optional
+        The columns of the source and destination node IDs. All the lines of
+        a text file must have the same number of columns, and more than
+        ``max(columns)``; other columns, e.g. edge weights, are ignored.
+        (Default: (0, 1))
+    delimiter : str, optional
+        The column delimiter of text files. (Default: any whitespace)
+    comments : str, optional
+        Text lines starting with it are skipped. (Default: '#')
+    skip_rows : int, optional
+        The number of header lines of text files to skip. (Default: 0)
+    string_ids : bool, optional
+        If True, the node IDs are arbitrary strings, mapped to consecutive
+        integers by ``id_map``. Otherwise, they must be integers. String IDs
+        read from text files are kept as bytes. (Default: False)
+    id_map : IdMap, optional
+        The map of string IDs, e.g. shared by several files. A new one is
+        created if not given.
+    chunk_size : int, optional
+        The approximate number of bytes read per chunk. (Default: 64MB)
+
+    Returns
+    -------
+    numpy.ndarray
+        The int64 source node IDs.
+    numpy.ndarray
+        The int64 destination node IDs.
+    IdMap or None
+        The map of string IDs, or None if ``string_ids`` is False.
+    """
+    src_col, dst_col = columns
+    if string_ids and id_map is None:
+        id_map = IdMap()
+    if path.endswith('.npy'):
+        chunks = _npy_chunks(path, chunk_size)
+    else:
+        chunks = read_text_chunks(path, delimiter, comments, skip_rows, max(columns) + 1,
+                                  chunk_size)
+    src = _GrowableArray()
+    dst = _GrowableArray()
+    for chunk in chunks:
+        if string_ids:
+            # map the two columns together to number nodes by appearance
+            ids = id_map.map(chunk[:, [src_col, dst_col]])
+            src.append(ids[0::2])
+            dst.append(ids[1::2])
+        else:
+            src.append(chunk[:, src_col].astype(np.int64))
+            dst.append(chunk[:, dst_col].astype(np.int64))
+    return src.finalize(), dst.finalize(), id_map if string_ids else None
+
+def graph_from_edge_list(path, ntype='_N', etype='_E', card=None, restrict_format='any',
+                         **kwargs):
+    """Create a graph with one type of nodes and edges from an edge list file.
+
+    The file is streamed in chunks by :func:`load_edge_list`, which accepts
+    the keyword arguments.
+
+    Parameters
+    ----------
+    path : str
+        The edge list file.
+    ntype : str, optional
+        The node type name. (Default: _N)
+    etype : str, optional
+        The edge type name. (Default: _E)
+    card : int, optional
+        The number of nodes. (Default: the largest node ID plus one)
+    restrict_format : 'any', 'coo', 'csr', 'csc', optional
+        Force the storage format. (Default: 'any')
+    kwargs : key-word arguments, optional
+        Arguments of :func:`load_edge_list`.
+
+    Returns
+    -------
+    DGLHeteroGraph
+        The graph.
+    IdMap or None
+        The map of string IDs, or None if ``string_ids`` is False.
+
+    Examples
+    --------
+    >>> g, id_map = dgl.data.graph_from_edge_list('edges.tsv', delimiter='\\t',
+    ...                                          string_ids=True)
+    >>> id_map.keys()[:3]  # the original IDs of nodes 0, 1 and 2
+    """
+    src, dst, id_map = load_edge_list(path, **kwargs)
+    num_nodes = len(id_map) if id_map is not None else \
+        (int(max(src.max(), dst.max())) + 1 if len(src) > 0 else 0)
+    if card is None:
+        card = num_nodes
+    elif card < num_nodes:
+        raise DGLError('Expect card no smaller than %d, got %d.' % (num_nodes, card))
+    if len(src) > 0 and min(src.min(), dst.min()) < 0:
+        raise DGLError('Invalid edge list. Node IDs must be non-negative.')
+    g = convert.graph((src, dst), ntype, etype, card=card, validate=False,
+                      restrict_format=restrict_format)
+    return g, id_map
@@ -1,13 +1,30 @@
 """For Graph Serialization"""
 from __future__ import absolute_import
+import json
+import struct
+import numpy as np
+from ..base import DGLError
 from ..graph import DGLGraph
+from .. import graph_index
 from .._ffi.object import ObjectBase, register_object
 from .._ffi.function import _init_api
 from .. import backend as F
 
 _init_api("dgl.data.graph_serialize")
 
-__all__ = ['save_graphs', "load_graphs", "load_labels"]
+__all__ = ['save_graphs', "load_graphs", "load_labels", "open_graphs", "GraphFile"]
+
+# Layout of the version 2 (memory-mappable) format:
+#
+#   header    : magic (8 bytes), version (uint64), index offset (uint64),
+#               index length (uint64)
+#   blobs     : raw little-endian arrays, each starting at a page boundary
+#   index     : utf-8 json describing every graph and label as blobs
+#
+# A blob is described by its byte offset, numpy dtype string and shape.
+_V2_MAGIC = b'DGLGRPH2'
+_V2_HEADER = struct.Struct('<8sQQQ')
+_V2_ALIGN = 4096
 
 @register_object("graph_serialize.StorageMetaData")
 class StorageMetaData(ObjectBase):
@@ -60,7 +77,7 @@ class GraphData(ObjectBase):
         return g
 
 
-def save_graphs(filename, g_list, labels=None):
+def save_graphs(filename, g_list, labels=None, version=1):
     r"""
     Save DGLGraphs and graph labels to file
 
@@ -72,6 +89,11 @@ def save_graphs(filename, g_list, labels=None):
         DGLGraph or list of DGLGraph
     labels: dict (Default: None)
         labels should be dict of tensors/ndarray, with str as keys
+    version: int (Default: 1)
+        File format version. Version 2 stores every tensor page-aligned
+        behind an offset index, so that the file can be memory-mapped and
+        graphs can be loaded individually without reading the whole file.
+        See :func:`open_graphs`.
 
     Examples
     ----------
@@ -95,9 +117,18 @@ def save_graphs(filename, g_list, labels=None):
     >>> graph_labels = {"glabel": th.tensor([0, 1])}
     >>> save_graphs("./data.bin", [g1, g2], graph_labels)
 
+    Save Graphs into a memory-mappable file
+
+    >>> save_graphs("./data_v2.bin", [g1, g2], graph_labels, version=2)
+
     """
     if isinstance(g_list, DGLGraph):
         g_list = [g_list]
+    if version == 2:
+        _save_graphs_v2(filename, g_list, labels)
+        return
+    elif version != 1:
+        raise DGLError('Unsupported graph file version: {}.'.format(version))
     if (labels is not None) and (len(labels) != 0):
         label_dict = dict()
         for key, value in labels.items():
@@ -112,6 +143,9 @@ def load_graphs(filename, idx_list=None):
     """
     Load DGLGraphs from file
 
+    Files saved with ``version=2`` are memory-mapped: only the requested
+    graphs are read, and their features are zero-copy views into the file.
+
     Parameters
     ----------
     filename: str
@@ -135,6 +169,11 @@ def load_graphs(filename, idx_list=None):
     >>> glist, label_dict = load_graphs("./data.bin", [0]) # glist will be [g1]
 
     """
+    if _is_v2_file(filename):
+        gfile = GraphFile(filename)
+        if idx_list is None:
+            idx_list = range(len(gfile))
+        return [gfile[i] for i in idx_list], gfile.labels
     if idx_list is None:
         idx_list = []
     assert isinstance(idx_list, list)
@@ -169,8 +208,151 @@ def load_labels(filename):
     >>> label_dict = load_graphs("./data.bin")
 
     """
+    if _is_v2_file(filename):
+        return GraphFile(filename).labels
     metadata = _CAPI_DGLLoadGraphs(filename, [], True)
     label_dict = {}
     for k, v in metadata.labels.items():
         label_dict[k] = F.zerocopy_from_dgl_ndarray(v.data)
     return label_dict
+
+
+def open_graphs(filename):
+    """
+    Open a graph file saved with ``version=2`` for lazy access.
+
+    The file is memory-mapped in copy-on-write mode. Indexing the returned
+    object builds one graph at a time, whose node and edge features are
+    zero-copy views into the mapping, so processes that open the same file
+    (e.g. DataLoader workers) share the OS page cache instead of holding
+    private copies.
+
+    Parameters
+    ----------
+    filename: str
+        filename to load DGLGraphs
+
+    Returns
+    ----------
+    GraphFile
+        The opened file.
+
+    Examples
+    ----------
+    Following the example in save_graphs.
+
+    >>> from dgl.data.utils import open_graphs
+    >>> gfile = open_graphs("./data_v2.bin")
+    >>> len(gfile)
+    2
+    >>> g2 = gfile[1]
+    >>> gfile.labels
+    {'glabel': tensor([0, 1])}
+
+    """
+    return GraphFile(filename)
+
+
+class GraphFile(object):
+    """A memory-mapped graph file of format version 2.
+
+    Parameters
+    ----------
+    filename : str
+        The file name.
+    """
+    def __init__(self, filename):
+        if not _is_v2_file(filename):
+            raise DGLError('{} is not a graph file of version 2.'.format(filename))
+        self.filename = filename
+        self._mmap = np.memmap(filename, dtype=np.uint8, mode='c')
+        _, _, index_offset, index_len = _V2_HEADER.unpack(
+            self._mmap[:_V2_HEADER.size].tobytes())
+        index = json.loads(
+            self._mmap[index_offset:index_offset + index_len].tobytes().decode('utf-8'))
+        self._graphs = index['graphs']
+        self._labels = index['labels']
+
+    def __len__(self):
+        return len(self._graphs)
+
+    def __getitem__(self, idx):
+        """Build the idx-th graph.
+
+        The graph structure is constructed from the mapped edge arrays, and
+        ``ndata``/``edata`` are views into the mapping.
+        """
+        meta = self._graphs[idx]
+        src = self._view(meta['src'])
+        dst = self._view(meta['dst'])
+        gidx = graph_index.from_coo(meta['num_nodes'], src, dst,
+                                    meta['is_multigraph'], True)
+        g = DGLGraph(graph_data=gidx, readonly=True)
+        for k, blob in meta['ndata'].items():
+            g.ndata[k] = F.zerocopy_from_numpy(self._view(blob))
+        for k, blob in meta['edata'].items():
+            g.edata[k] = F.zerocopy_from_numpy(self._view(blob))
+        return g
+
+    @property
+    def labels(self):
+        """Return the dict of graph labels stored in the file."""
+        return {k : F.zerocopy_from_numpy(self._view(blob))
+                for k, blob in self._labels.items()}
+
+    def num_nodes(self, idx):
+        """Return the number of nodes of the idx-th graph without building it."""
+        return self._graphs[idx]['num_nodes']
+
+    def num_edges(self, idx):
+        """Return the number of edges of the idx-th graph without building it."""
+        return self._graphs[idx]['src']['shape'][0]
+
+    def _view(self, blob):
+        """Return the array described by the blob as a view of the mapping."""
+        dtype = np.dtype(blob['dtype'])
+        count = int(np.prod(blob['shape'], dtype=np.int64))
+        arr = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=blob['offset'])
+        return arr.reshape(blob['shape'])
+
+
+def _is_v2_file(filename):
+    """Check whether the file is of format version 2."""
+    with open(filename, 'rb') as f:
+        return f.read(len(_V2_MAGIC)) == _V2_MAGIC
+
+def _save_graphs_v2(filename, g_list, labels):
+    """Save graphs in the memory-mappable format."""
+    with open(filename, 'wb') as f:
+        f.write(b'\0' * _V2_HEADER.size)
+
+        def write_blob(arr):
+            arr = np.ascontiguousarray(arr)
+            arr = arr.astype(arr.dtype.newbyteorder('<'), copy=False)
+            offset = -(-f.tell() // _V2_ALIGN) * _V2_ALIGN
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(arr.tobytes())
+            return {'offset' : offset, 'dtype' : arr.dtype.str, 'shape' : list(arr.shape)}
+
+        graphs = []
+        for g in g_list:
+            # TODO(zihao): support serialize batched graph in the future.
+            assert g.batch_size == 1, "Batched DGLGraph is not supported for serialization"
+            src, dst, _ = g._graph.edges('eid')
+            graphs.append({
+                'num_nodes' : g.number_of_nodes(),
+                'is_multigraph' : g.is_multigraph,
+                'src' : write_blob(src.tonumpy().astype(np.int64)),
+                'dst' : write_blob(dst.tonumpy().astype(np.int64)),
+                'ndata' : {k : write_blob(F.asnumpy(v)) for k, v in g.ndata.items()},
+                'edata' : {k : write_blob(F.asnumpy(v)) for k, v in g.edata.items()},
+            })
+        labels = labels or {}
+        index = json.dumps({
+            'graphs' : graphs,
+            'labels' : {k : write_blob(F.asnumpy(v)) for k, v in labels.items()},
+        }).encode('utf-8')
+        index_offset = f.tell()
+        f.write(index)
+        f.seek(0)
+        f.write(_V2_HEADER.pack(_V2_MAGIC, 2, index_offset, len(index)))
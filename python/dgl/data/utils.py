@@ -11,11 +11,11 @@ import numpy as np
 import warnings
 import requests
 
-from .graph_serialize import save_graphs, load_graphs, load_labels
+from .graph_serialize import save_graphs, load_graphs, load_labels, open_graphs
 
 __all__ = ['loadtxt','download', 'check_sha1', 'extract_archive',
            'get_download_dir', 'Subset', 'split_dataset',
-           'save_graphs', "load_graphs", "load_labels"]
+           'save_graphs', "load_graphs", "load_labels", "open_graphs"]
 
 def loadtxt(path, delimiter, dtype=None):
     try:
@@ -3,6 +3,8 @@ from __future__ import absolute_import
 
 from collections import namedtuple
 from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+import os
 
 import numpy as np
 
@@ -920,3 +922,82 @@ def sync_frame_initializer(new_frame, reference_frame):
     # TODO(minjie): hack; cannot rely on keys as the _initializers
     #   now supports non-exist columns.
     new_frame._initializers = reference_frame._initializers
+
+# Thread pool concatenating the columns of batched frames.
+_CONCAT_POOL = None
+
+def _get_concat_pool():
+    """Return the thread pool of concat_frame_columns, creating it on first use."""
+    global _CONCAT_POOL
+    if _CONCAT_POOL is None:
+        _CONCAT_POOL = ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, 8))
+    return _CONCAT_POOL
+
+def _can_concat_in_pool(jobs):
+    """Return whether the columns can be concatenated in other threads.
+
+    MXNet and TensorFlow only record the operators of the calling thread for
+    autograd, and PyTorch does not apply the grad mode of the caller in other
+    threads. So only PyTorch tensors that do not require grad are
+    concatenated in the pool.
+    """
+    if F.backend_name != 'pytorch':
+        return False
+    return not any(col.requires_grad for cols in jobs for col in cols)
+
+def concat_frame_columns(tasks):
+    """Concatenate the columns of lists of frames along the rows.
+
+    Each column is concatenated by one call into the framework, which
+    allocates the output once and copies all the inputs into it. Different
+    columns are concatenated concurrently in a thread pool, since the
+    frameworks release the GIL while copying. Columns that autograd may
+    record are concatenated in the calling thread.
+
+    Parameters
+    ----------
+    tasks : list of (list[FrameRef], iterable of str)
+        Each task gives the frames to concatenate and the names of the columns
+        to concatenate. Frames with no rows are skipped.
+
+    Returns
+    -------
+    list[dict[str, Tensor]]
+        The concatenated columns of each task.
+    """
+    tasks = [([fr for fr in frames if fr.num_rows > 0], list(keys)) for frames, keys in tasks]
+    jobs = []
+    for frames, keys in tasks:
+        for key in keys:
+            jobs.append([fr.select_column(key) for fr in frames])
+    if len(jobs) > 1 and _can_concat_in_pool(jobs):
+        results = iter(list(_get_concat_pool().map(lambda cols: F.cat(cols, dim=0), jobs)))
+    else:
+        results = iter([F.cat(cols, dim=0) for cols in jobs])
+    return [{key : next(results) for key in keys} for _, keys in tasks]
+
+def split_frame(frame, lengths):
+    """Split a frame along the rows into frames of the given lengths.
+
+    The columns of the new frames are views of the columns of the given frame,
+    so no feature data is copied. Out-place updates on a new frame replace its
+    own column only, while in-place writes are visible in the given frame.
+
+    Parameters
+    ----------
+    frame : FrameRef
+        The frame to split.
+    lengths : list of int
+        The number of rows of each new frame, which sum up to the number of
+        rows of the frame.
+
+    Returns
+    -------
+    list[FrameRef]
+        The new frames.
+    """
+    offsets = np.cumsum([0] + list(lengths)).tolist()
+    cols = {key : frame.select_column(key) for key in frame.keys()}
+    return [FrameRef(Frame({key : F.narrow_row(col, offsets[i], offsets[i + 1])
+                            for key, col in cols.items()}, num_rows=length))
+            for i, length in enumerate(lengths)]
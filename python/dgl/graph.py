@@ -11,8 +11,9 @@ from .base import ALL, NID, EID, is_all, DGLError, dgl_warning
 from . import backend as F
 from . import init
 from .frame import FrameRef, Frame, Scheme, sync_frame_initializer
+from .frame import concat_frame_columns, split_frame
 from . import graph_index
-from .runtime import ir, scheduler, Runtime, GraphAdapter
+from .runtime import ir, scheduler, Runtime, GraphAdapter, cache
 from . import utils
 from .view import NodeView, EdgeView
 from .udf import NodeBatch, EdgeBatch
@@ -2698,7 +2699,8 @@ class DGLGraph(DGLBaseGraph):
              message_func="default",
              reduce_func="default",
              apply_node_func="default",
-             inplace=False):
+             inplace=False,
+             bucketing="degree"):
         """Pull messages from the node(s)' predecessors and then update their features.
 
         Optionally, apply a function to update the node features after receive.
@@ -2724,6 +2726,14 @@ class DGLGraph(DGLBaseGraph):
             a :mod:`Node UDF <dgl.udf>`.
         inplace: bool, optional
             If True, update will be done in place, but autograd will break.
+        bucketing : str, optional
+            How nodes are bucketed when ``reduce_func`` is a UDF. With
+            ``"degree"``, the UDF is called once per distinct in-degree. With
+            ``"padded"``, in-degrees are grouped into power-of-two size classes
+            and the mailboxes padded within each class, so the UDF is called
+            only ``O(log(max_degree))`` times; it must then honor
+            :attr:`~dgl.udf.NodeBatch.mailbox_mask` unless it is insensitive to
+            duplicate messages (e.g. max, min). (Default: "degree")
 
         Examples
         --------
@@ -2787,14 +2797,16 @@ class DGLGraph(DGLBaseGraph):
         v = utils.toindex(v)
         if len(v) == 0:
             return
-        with ir.prog() as prog:
-            scheduler.schedule_pull(graph=AdaptedDGLGraph(self),
-                                    pull_nodes=v,
-                                    message_func=message_func,
-                                    reduce_func=reduce_func,
-                                    apply_func=apply_node_func,
-                                    inplace=inplace)
-            Runtime.run(prog)
+        key = cache.schedule_key('pull', v, message_func, reduce_func,
+                                 apply_node_func, inplace, bucketing)
+        cache.run_cached(AdaptedDGLGraph(self), key,
+                         lambda graph: scheduler.schedule_pull(graph=graph,
+                                                               pull_nodes=v,
+                                                               message_func=message_func,
+                                                               reduce_func=reduce_func,
+                                                               apply_func=apply_node_func,
+                                                               inplace=inplace,
+                                                               bucketing=bucketing))
 
     def push(self,
              u,
@@ -2896,7 +2908,8 @@ class DGLGraph(DGLBaseGraph):
     def update_all(self,
                    message_func="default",
                    reduce_func="default",
-                   apply_node_func="default"):
+                   apply_node_func="default",
+                   bucketing="degree"):
         """Send messages through all edges and update all nodes.
 
         Optionally, apply a function to update the node features after receive.
@@ -2916,6 +2929,14 @@ class DGLGraph(DGLBaseGraph):
         apply_node_func : callable, optional
             Apply function on the nodes. The function should be
             a :mod:`Node UDF <dgl.udf>`.
+        bucketing : str, optional
+            How nodes are bucketed when ``reduce_func`` is a UDF. With
+            ``"degree"``, the UDF is called once per distinct in-degree. With
+            ``"padded"``, in-degrees are grouped into power-of-two size classes
+            and the mailboxes padded within each class, so the UDF is called
+            only ``O(log(max_degree))`` times; it must then honor
+            :attr:`~dgl.udf.NodeBatch.mailbox_mask` unless it is insensitive to
+            duplicate messages (e.g. max, min). (Default: "degree")
 
         See Also
         --------
@@ -2931,12 +2952,14 @@ class DGLGraph(DGLBaseGraph):
         assert message_func is not None
         assert reduce_func is not None
 
-        with ir.prog() as prog:
-            scheduler.schedule_update_all(graph=AdaptedDGLGraph(self),
-                                          message_func=message_func,
-                                          reduce_func=reduce_func,
-                                          apply_func=apply_node_func)
-            Runtime.run(prog)
+        key = cache.schedule_key('update_all', message_func, reduce_func,
+                                 apply_node_func, bucketing)
+        cache.run_cached(AdaptedDGLGraph(self), key,
+                         lambda graph: scheduler.schedule_update_all(graph=graph,
+                                                                     message_func=message_func,
+                                                                     reduce_func=reduce_func,
+                                                                     apply_func=apply_node_func,
+                                                                     bucketing=bucketing))
 
     def prop_nodes(self,
                    nodes_generator,
@@ -3770,22 +3793,12 @@ def batch(graph_list, node_attrs=ALL, edge_attrs=ALL):
     # create batched graph index
     batched_index = graph_index.disjoint_union([g._graph for g in graph_list])
     # create batched node and edge frames
-    if len(node_attrs) == 0:
-        batched_node_frame = FrameRef(Frame(num_rows=batched_index.number_of_nodes()))
-    else:
-        # NOTE: following code will materialize the columns of the input graphs.
-        cols = {key: F.cat([gr._node_frame[key] for gr in graph_list
-                            if gr.number_of_nodes() > 0], dim=0)
-                for key in node_attrs}
-        batched_node_frame = FrameRef(Frame(cols))
-
-    if len(edge_attrs) == 0:
-        batched_edge_frame = FrameRef(Frame(num_rows=batched_index.number_of_edges()))
-    else:
-        cols = {key: F.cat([gr._edge_frame[key] for gr in graph_list
-                            if gr.number_of_edges() > 0], dim=0)
-                for key in edge_attrs}
-        batched_edge_frame = FrameRef(Frame(cols))
+    # NOTE: following code will materialize the columns of the input graphs.
+    node_cols, edge_cols = concat_frame_columns(
+        [([gr._node_frame for gr in graph_list], node_attrs),
+         ([gr._edge_frame for gr in graph_list], edge_attrs)])
+    batched_node_frame = FrameRef(Frame(node_cols, num_rows=batched_index.number_of_nodes()))
+    batched_edge_frame = FrameRef(Frame(edge_cols, num_rows=batched_index.number_of_edges()))
 
     batch_size = 0
     batch_num_nodes = []
@@ -3820,7 +3833,9 @@ def unbatch(graph):
     Notes
     -----
     Unbatching will break each field tensor of the batched graph into smaller
-    partitions.
+    partitions. The partitions are views of the field tensors rather than
+    copies, so in-place writes to the features of the unbatched graphs are
+    visible in the batched graph.
 
     For simpler tasks such as node/edge state aggregation, try to use
     readout functions.
@@ -3837,16 +3852,8 @@ def unbatch(graph):
     bne = graph.batch_num_edges
     pttns = graph_index.disjoint_partition(graph._graph, utils.toindex(bnn))
     # split the frames
-    node_frames = [FrameRef(Frame(num_rows=n)) for n in bnn]
-    edge_frames = [FrameRef(Frame(num_rows=n)) for n in bne]
-    for attr, col in graph._node_frame.items():
-        col_splits = F.split(col, bnn, dim=0)
-        for i in range(bsize):
-            node_frames[i][attr] = col_splits[i]
-    for attr, col in graph._edge_frame.items():
-        col_splits = F.split(col, bne, dim=0)
-        for i in range(bsize):
-            edge_frames[i][attr] = col_splits[i]
+    node_frames = split_frame(graph._node_frame, bnn)
+    edge_frames = split_frame(graph._edge_frame, bne)
     return [DGLGraph(graph_data=pttns[i],
                      node_frame=node_frames[i],
                      edge_frame=edge_frames[i]) for i in range(bsize)]
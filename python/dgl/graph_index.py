@@ -1170,10 +1170,14 @@ def from_edge_list(elist, is_multigraph, readonly):
     """
     if isinstance(elist, tuple):
         src, dst = elist
+        src = np.asarray(src)
+        dst = np.asarray(dst)
     else:
-        src, dst = zip(*elist)
-    src = np.asarray(src)
-    dst = np.asarray(dst)
+        elist = np.asarray(elist)
+        if elist.ndim != 2 or elist.shape[1] != 2:
+            raise DGLError('Invalid edge list. Expect a list of (u, v) tuples,'
+                           ' but got an array of shape %s.' % str(elist.shape))
+        src, dst = elist[:, 0], elist[:, 1]
     src_ids = utils.toindex(src)
     dst_ids = utils.toindex(dst)
     num_nodes = max(src.max(), dst.max()) + 1
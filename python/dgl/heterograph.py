@@ -10,7 +10,7 @@ from . import heterograph_index
 from . import utils
 from . import backend as F
 from . import init
-from .runtime import ir, scheduler, Runtime, GraphAdapter
+from .runtime import ir, scheduler, Runtime, GraphAdapter, cache
 from .frame import Frame, FrameRef, frame_like, sync_frame_initializer
 from .view import HeteroNodeView, HeteroNodeDataView, HeteroEdgeView, HeteroEdgeDataView
 from .base import ALL, SLICE_FULL, NTYPE, NID, ETYPE, EID, is_all, DGLError, dgl_warning
@@ -2903,7 +2903,8 @@ class DGLHeteroGraph(object):
              reduce_func,
              apply_node_func=None,
              etype=None,
-             inplace=False):
+             inplace=False,
+             bucketing="degree"):
         """Pull messages from the node(s)' predecessors and then update their features.
 
         Optionally, apply a function to update the node features after receive.
@@ -2944,6 +2945,14 @@ class DGLHeteroGraph(object):
         inplace: bool, optional
             If True, update will be done in place, but autograd will break.
             (Default: False)
+        bucketing : str, optional
+            How nodes are bucketed when ``reduce_func`` is a UDF. With
+            ``"degree"``, the UDF is called once per distinct in-degree. With
+            ``"padded"``, in-degrees are grouped into power-of-two size classes
+            and the mailboxes padded within each class, so the UDF is called
+            only ``O(log(max_degree))`` times; it must then honor
+            :attr:`~dgl.udf.NodeBatch.mailbox_mask` unless it is insensitive to
+            duplicate messages (e.g. max, min). (Default: "degree")
 
         Examples
         --------
@@ -2974,12 +2983,14 @@ class DGLHeteroGraph(object):
         v = utils.toindex(v)
         if len(v) == 0:
             return
-        with ir.prog() as prog:
-            scheduler.schedule_pull(AdaptedHeteroGraph(self, stid, dtid, etid),
-                                    v,
-                                    message_func, reduce_func, apply_node_func,
-                                    inplace=inplace)
-            Runtime.run(prog)
+        key = cache.schedule_key('pull', v, message_func, reduce_func,
+                                 apply_node_func, inplace, bucketing)
+        cache.run_cached(AdaptedHeteroGraph(self, stid, dtid, etid), key,
+                         lambda graph: scheduler.schedule_pull(graph, v,
+                                                               message_func, reduce_func,
+                                                               apply_node_func,
+                                                               inplace=inplace,
+                                                               bucketing=bucketing))
 
     def multi_pull(self, v, etype_dict, cross_reducer, apply_node_func=None, inplace=False):
         r"""Pull and receive messages of the given nodes along multiple edge types
@@ -3150,7 +3161,8 @@ class DGLHeteroGraph(object):
                    message_func,
                    reduce_func,
                    apply_node_func=None,
-                   etype=None):
+                   etype=None,
+                   bucketing="degree"):
         """Send messages through all edges and update all nodes.
 
         Optionally, apply a function to update the node features after receive.
@@ -3179,6 +3191,14 @@ class DGLHeteroGraph(object):
         etype : str, optional
             The edge type. Can be omitted if there is only one edge type
             in the graph. (Default: None)
+        bucketing : str, optional
+            How nodes are bucketed when ``reduce_func`` is a UDF. With
+            ``"degree"``, the UDF is called once per distinct in-degree. With
+            ``"padded"``, in-degrees are grouped into power-of-two size classes
+            and the mailboxes padded within each class, so the UDF is called
+            only ``O(log(max_degree))`` times; it must then honor
+            :attr:`~dgl.udf.NodeBatch.mailbox_mask` unless it is insensitive to
+            duplicate messages (e.g. max, min). (Default: "degree")
 
         Examples
         --------
@@ -3203,11 +3223,13 @@ class DGLHeteroGraph(object):
         etid = self.get_etype_id(etype)
         stid, dtid = self._graph.metagraph.find_edge(etid)
 
-        with ir.prog() as prog:
-            scheduler.schedule_update_all(AdaptedHeteroGraph(self, stid, dtid, etid),
-                                          message_func, reduce_func,
-                                          apply_node_func)
-            Runtime.run(prog)
+        key = cache.schedule_key('update_all', message_func, reduce_func,
+                                 apply_node_func, bucketing)
+        cache.run_cached(AdaptedHeteroGraph(self, stid, dtid, etid), key,
+                         lambda graph: scheduler.schedule_update_all(graph,
+                                                                     message_func, reduce_func,
+                                                                     apply_node_func,
+                                                                     bucketing=bucketing))
 
     def multi_update_all(self, etype_dict, cross_reducer, apply_node_func=None):
         r"""Send and receive messages along all edges.
@@ -2,6 +2,7 @@
 from __future__ import absolute_import
 
 import itertools
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import scipy
 
@@ -11,6 +12,14 @@ from .base import DGLError, dgl_warning
 from . import backend as F
 from . import utils
 
+# Sparse formats in the bit order of _CAPI_DGLHeteroGetCreatedFormats.
+_SPARSE_FORMATS = ('coo', 'csr', 'csc')
+
+def _check_sparse_format(fmt):
+    if fmt not in _SPARSE_FORMATS:
+        raise DGLError('Invalid sparse format "%s". Must be one of "coo", "csr" '
+                       'and "csc".' % str(fmt))
+
 @register_object('graph.HeteroGraph')
 class HeteroGraphIndex(ObjectBase):
     """HeteroGraph index object.
@@ -592,6 +601,10 @@ class HeteroGraphIndex(ObjectBase):
         int
             The in degree array.
         """
+        _, dtype = self.metagraph.find_edge(etype)
+        if v.is_slice(0, self.number_of_nodes(dtype)):
+            # a fresh copy so that callers may modify the result in place
+            return utils.toindex(self._all_degrees(etype, 'in').copy())
         v_array = v.todgltensor()
         return utils.toindex(_CAPI_DGLHeteroInDegrees(self, int(etype), v_array))
 
@@ -631,9 +644,25 @@ class HeteroGraphIndex(ObjectBase):
         int
             The out degree array.
         """
+        stype, _ = self.metagraph.find_edge(etype)
+        if v.is_slice(0, self.number_of_nodes(stype)):
+            # a fresh copy so that callers may modify the result in place
+            return utils.toindex(self._all_degrees(etype, 'out').copy())
         v_array = v.todgltensor()
         return utils.toindex(_CAPI_DGLHeteroOutDegrees(self, int(etype), v_array))
 
+    @utils.cached_member(cache='_cache', prefix='degrees')
+    def _all_degrees(self, etype, direction):
+        """Return the in or out degrees of all the nodes as a numpy array,
+        cached until the graph is mutated. The array must not be modified."""
+        stype, dtype = self.metagraph.find_edge(etype)
+        if direction == 'in':
+            v = utils.toindex(slice(0, self.number_of_nodes(dtype))).todgltensor()
+            return _CAPI_DGLHeteroInDegrees(self, int(etype), v).asnumpy()
+        else:
+            v = utils.toindex(slice(0, self.number_of_nodes(stype))).todgltensor()
+            return _CAPI_DGLHeteroOutDegrees(self, int(etype), v).asnumpy()
+
     def adjacency_matrix(self, etype, transpose, ctx):
         """Return the adjacency matrix representation of this graph.
 
@@ -887,6 +916,163 @@ class HeteroGraphIndex(ObjectBase):
         g = self.get_relation_graph(etype)
         return g.asbits(self.bits_needed(etype or 0)).copy_to(ctx)
 
+    def formats(self, etype):
+        """Return the sparse formats materialized for the relation graph.
+
+        Parameters
+        ----------
+        etype : int
+            The edge type.
+
+        Returns
+        -------
+        list of str
+            The materialized formats among ``'coo'``, ``'csr'`` and ``'csc'``.
+        """
+        created = _CAPI_DGLHeteroGetCreatedFormats(self, int(etype))
+        return [fmt for i, fmt in enumerate(_SPARSE_FORMATS) if created & (1 << i)]
+
+    def format_nbytes(self, etype, fmt):
+        """Return the estimated memory footprint of a sparse format of the
+        relation graph, whether it is materialized or not.
+
+        Parameters
+        ----------
+        etype : int
+            The edge type.
+        fmt : str
+            ``'coo'``, ``'csr'`` or ``'csc'``.
+
+        Returns
+        -------
+        int
+            The number of bytes.
+        """
+        _check_sparse_format(fmt)
+        stype, dtype = self.metagraph.find_edge(etype)
+        num_edges = self.number_of_edges(etype)
+        if fmt == 'coo':
+            num_ids = 2 * num_edges
+        elif fmt == 'csr':
+            # indptr, indices and edge ids
+            num_ids = self.number_of_nodes(stype) + 1 + 2 * num_edges
+        else:
+            num_ids = self.number_of_nodes(dtype) + 1 + 2 * num_edges
+        return num_ids * self.nbits() // 8
+
+    def create_formats(self, formats, etypes=None, num_threads=None):
+        """Materialize sparse formats of relation graphs ahead of the queries
+        that need them.
+
+        The relation graphs are converted in parallel. The formats of one
+        relation graph are created one after another by the same thread, since
+        a unit graph caches its formats without locking.
+
+        Parameters
+        ----------
+        formats : str or list of str
+            The formats among ``'coo'``, ``'csr'`` and ``'csc'``.
+        etypes : list of int, optional
+            The edge types. (Default: all edge types)
+        num_threads : int, optional
+            The number of threads. (Default: the number of CPUs)
+        """
+        formats = [formats] if isinstance(formats, str) else list(formats)
+        for fmt in formats:
+            _check_sparse_format(fmt)
+        if etypes is None:
+            etypes = range(self.number_of_etypes())
+        etypes = [int(etype) for etype in etypes]
+
+        def _create(etype):
+            for fmt in formats:
+                _CAPI_DGLHeteroCreateFormat(self, etype, fmt)
+
+        if len(etypes) <= 1 or num_threads == 1:
+            for etype in etypes:
+                _create(etype)
+            return
+        # Both the ctypes and the cython FFI release the GIL for the duration of a
+        # C API call, so the conversions of the relation graphs run in parallel.
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            list(executor.map(_create, etypes))
+
+    def evict_formats(self, formats, etypes=None):
+        """Release sparse formats of relation graphs to save memory.
+
+        A format is kept if it is the only materialized format of the relation
+        graph, or the format the graph is restricted to. Released formats are
+        re-created on demand by later queries. The unit graphs converted for
+        message passing from the relation graphs are dropped as well.
+
+        This must not run concurrently with other operations on the graph.
+
+        Parameters
+        ----------
+        formats : str or list of str
+            The formats among ``'coo'``, ``'csr'`` and ``'csc'``.
+        etypes : list of int, optional
+            The edge types. (Default: all edge types)
+
+        Returns
+        -------
+        int
+            The estimated number of bytes released.
+        """
+        formats = [formats] if isinstance(formats, str) else list(formats)
+        for fmt in formats:
+            _check_sparse_format(fmt)
+        if etypes is None:
+            etypes = range(self.number_of_etypes())
+        nbytes = 0
+        for etype in etypes:
+            etype = int(etype)
+            for fmt in formats:
+                if _CAPI_DGLHeteroDropFormat(self, etype, fmt):
+                    nbytes += self.format_nbytes(etype, fmt)
+            # the key of get_unitgraph(etype, ctx); a unit graph index may use None
+            prefixes = ('unitgraph-%d-' % etype,) + (('unitgraph-None-',) if etype == 0 else ())
+            for key in [key for key in self._cache if key.startswith(prefixes)]:
+                del self._cache[key]
+        return nbytes
+
+    def enforce_format_budget(self, budget, hot_etypes=None):
+        """Release sparse formats until the materialized formats of all relation
+        graphs fit in a memory budget.
+
+        Formats are released from the relation graphs not listed in
+        ``hot_etypes`` first, largest first, and then from the hot ones. The
+        last materialized format of each relation graph is never released, so
+        the budget may not be met.
+
+        Parameters
+        ----------
+        budget : int
+            The memory budget in bytes.
+        hot_etypes : list of int, optional
+            The edge types whose formats should be kept as long as possible.
+
+        Returns
+        -------
+        int
+            The estimated number of bytes in use afterwards.
+        """
+        hot = set(int(etype) for etype in hot_etypes) if hot_etypes is not None else set()
+        used = 0
+        candidates = []
+        for etype in range(self.number_of_etypes()):
+            formats = self.formats(etype)
+            for fmt in formats:
+                nbytes = self.format_nbytes(etype, fmt)
+                used += nbytes
+                if len(formats) > 1:
+                    candidates.append((etype in hot, -nbytes, etype, fmt))
+        for _, _, etype, fmt in sorted(candidates):
+            if used <= budget:
+                break
+            used -= self.evict_formats(fmt, [etype])
+        return used
+
     def get_csr_shuffle_order(self, etype):
         """Return the edge shuffling order when a coo graph is converted to csr format
 
@@ -2,9 +2,12 @@
 from __future__ import absolute_import
 
 import time
+import threading
 from enum import Enum
 from collections import namedtuple
 
+import numpy as np
+
 import dgl.backend as F
 from ._ffi.function import _init_api
 from .nodeflow import NodeFlow
@@ -213,6 +216,322 @@ c_ptr : void*
     c pointer of message
 """
 
+
+############################## KVStore Transport Encodings ##############################
+
+# The C communicator ships the ID and data tensors of kvstore messages as raw int64 and
+# float32 buffers. Encoded tensors are byte strings packed into such buffers, and are
+# decoded by the receiver according to the encodings set for the data name.
+
+def _pack(dtype, parts):
+    """Concatenate the bytes of numpy arrays into a new array of dtype, zero-padded."""
+    itemsize = np.dtype(dtype).itemsize
+    nbytes = sum(part.nbytes for part in parts)
+    out = np.zeros(((nbytes + itemsize - 1) // itemsize,), dtype=dtype)
+    raw = out.view(np.uint8)
+    offset = 0
+    for part in parts:
+        raw[offset:offset + part.nbytes] = np.ascontiguousarray(part).reshape(-1).view(np.uint8)
+        offset += part.nbytes
+    return out
+
+_UINT_TYPES = {1 : np.uint8, 2 : np.uint16, 4 : np.uint32, 8 : np.uint64}
+
+class DeltaIdCodec(object):
+    """Lossless encoding of int64 IDs as zigzag deltas of the narrowest width.
+
+    The differences of consecutive IDs are zigzag-encoded and stored with the
+    smallest of 1, 2, 4 or 8 bytes that fits all of them, so IDs sorted within a
+    message are typically 4-8x smaller. KVClient sorts the IDs of the requests of
+    data with an ID encoding. The encoded buffer starts with the number of IDs
+    and the width.
+    """
+    name = 'delta'
+
+    def encode(self, ids):
+        """Encode a numpy int64 vector into a numpy int64 buffer."""
+        delta = np.diff(ids, prepend=np.int64(0)) if len(ids) > 0 else ids
+        zigzag = ((delta << 1) ^ (delta >> 63)).view(np.uint64)
+        max_value = int(zigzag.max()) if len(ids) > 0 else 0
+        width = 8
+        for nbytes in (1, 2, 4):
+            if max_value < (1 << (8 * nbytes)):
+                width = nbytes
+                break
+        header = np.array([len(ids), width], dtype=np.int64)
+        return _pack(np.int64, [header, zigzag.astype(_UINT_TYPES[width])])
+
+    def decode(self, buf):
+        """Decode a numpy int64 buffer into a numpy int64 vector."""
+        num_ids, width = int(buf[0]), int(buf[1])
+        zigzag = buf[2:].view(_UINT_TYPES[width])[:num_ids].astype(np.uint64)
+        delta = (zigzag >> np.uint64(1)).astype(np.int64) ^ -(zigzag & np.uint64(1)).astype(np.int64)
+        return np.cumsum(delta)
+
+class _DataCodec(object):
+    """Base of the lossy encodings of float32 data.
+
+    The encoded buffer starts with the number of dimensions and the shape of the data.
+    """
+    name = None
+
+    def encode(self, data):
+        """Encode a numpy float32 array into a numpy float32 buffer."""
+        header = np.array([data.ndim] + list(data.shape), dtype=np.int32)
+        return _pack(np.float32, [header] + self._encode(data))
+
+    def decode(self, buf):
+        """Decode a numpy float32 buffer into a numpy float32 array."""
+        raw = buf.view(np.uint8)
+        ndim = int(raw[:4].view(np.int32)[0])
+        shape = tuple(int(x) for x in raw[4:4 + 4 * ndim].view(np.int32))
+        return self._decode(raw[4 + 4 * ndim:], shape)
+
+    def _encode(self, data):
+        raise NotImplementedError
+
+    def _decode(self, raw, shape):
+        raise NotImplementedError
+
+class Float16Codec(_DataCodec):
+    """Encoding of float32 data as float16."""
+    name = 'fp16'
+
+    def _encode(self, data):
+        return [data.astype(np.float16)]
+
+    def _decode(self, raw, shape):
+        size = int(np.prod(shape))
+        return raw[:2 * size].view(np.float16).astype(np.float32).reshape(shape)
+
+class Int8RowCodec(_DataCodec):
+    """Encoding of float32 data as int8 with a float32 scale per row."""
+    name = 'int8'
+
+    def _encode(self, data):
+        rows = data.reshape(data.shape[0], int(np.prod(data.shape[1:]))) if data.ndim > 0 \
+            else data.reshape(1, 1)
+        scale = np.abs(rows).max(1) / 127. if rows.shape[1] > 0 else np.zeros((rows.shape[0],))
+        scale = np.where(scale > 0, scale, 1).astype(np.float32)
+        quantized = np.rint(rows / scale[:, None]).astype(np.int8)
+        return [scale, quantized]
+
+    def _decode(self, raw, shape):
+        num_rows = shape[0] if len(shape) > 0 else 1
+        size = int(np.prod(shape))
+        scale = raw[:4 * num_rows].view(np.float32)
+        quantized = raw[4 * num_rows:4 * num_rows + size].view(np.int8)
+        rows = quantized.reshape(num_rows, size // max(num_rows, 1)).astype(np.float32)
+        return (rows * scale[:, None]).reshape(shape)
+
+class TopKSparsifier(object):
+    """Top-k row sparsification of pushed gradients with error feedback.
+
+    Only the rows of the largest L2 norms are sent. The rows left out are kept as
+    residuals and added to the gradients of the same IDs in later pushes, or sent
+    as they are by flush(), so no update is lost. The IDs of a push should be unique.
+
+    The residuals are stored sparsely, as rows sorted by ID, so the memory is
+    proportional to the number of rows left out rather than to the largest ID.
+
+    Parameters
+    ----------
+    ratio : float
+        The fraction of rows to send, in (0, 1].
+    """
+    def __init__(self, ratio):
+        assert 0 < ratio <= 1, 'ratio (%f) must be in (0, 1].' % ratio
+        self.ratio = ratio
+        self._residual_ids = np.empty((0,), dtype=np.int64)
+        self._residual_rows = None
+
+    def num_residuals(self):
+        """Return the number of rows kept as residuals."""
+        return len(self._residual_ids)
+
+    def sparsify(self, ids, data):
+        """Return the IDs and data of the rows to send.
+
+        Parameters
+        ----------
+        ids : numpy.ndarray
+            int64 IDs
+        data : numpy.ndarray
+            float32 gradients with the same row size of ids
+
+        Returns
+        -------
+        numpy.ndarray
+            the IDs to send
+        numpy.ndarray
+            the gradients to send, including the residuals of the IDs
+        """
+        num_rows = len(ids)
+        if num_rows == 0:
+            return ids, data
+        rows = data.reshape(num_rows, int(np.prod(data.shape[1:]))).astype(np.float32)
+        if self._residual_rows is None or self._residual_rows.shape[1] != rows.shape[1]:
+            self._residual_ids = np.empty((0,), dtype=np.int64)
+            self._residual_rows = np.empty((0, rows.shape[1]), dtype=np.float32)
+        # add and consume the residuals of the pushed IDs
+        pos = np.searchsorted(self._residual_ids, ids)
+        found = pos < len(self._residual_ids)
+        found[found] = self._residual_ids[pos[found]] == ids[found]
+        rows[found] += self._residual_rows[pos[found]]
+        remain = np.ones((len(self._residual_ids),), dtype=bool)
+        remain[pos[found]] = False
+
+        num_keep = max(int(np.ceil(self.ratio * num_rows)), 1)
+        if num_keep < num_rows:
+            order = np.argpartition(-(rows * rows).sum(1), num_keep - 1)
+            keep, drop = order[:num_keep], order[num_keep:]
+        else:
+            keep, drop = np.arange(num_rows), np.empty((0,), dtype=np.int64)
+
+        residual_ids = np.concatenate([self._residual_ids[remain], ids[drop]])
+        residual_rows = np.concatenate([self._residual_rows[remain], rows[drop]])
+        order = np.argsort(residual_ids, kind='stable')
+        self._residual_ids = residual_ids[order]
+        self._residual_rows = residual_rows[order]
+        return ids[keep], rows[keep].reshape((num_keep,) + data.shape[1:])
+
+    def flush(self):
+        """Remove and return all the residuals.
+
+        Returns
+        -------
+        numpy.ndarray
+            the int64 IDs of the residuals, sorted
+        numpy.ndarray
+            the float32 residual rows, flattened to two dimensions
+        """
+        ids, rows = self._residual_ids, self._residual_rows
+        self._residual_ids = np.empty((0,), dtype=np.int64)
+        self._residual_rows = None
+        if rows is None:
+            rows = np.empty((0, 0), dtype=np.float32)
+        return ids, rows
+
+_ID_CODECS = {'delta' : DeltaIdCodec}
+_DATA_CODECS = {'fp16' : Float16Codec, 'int8' : Int8RowCodec}
+
+# Encodings of each data name: (id codec, data codec, sparsifier)
+_KV_CODECS = {}
+# Bytes before and after encoding of each data name
+_KV_CODEC_STATS = {}
+_KV_CODEC_LOCK = threading.Lock()
+
+def set_kv_codec(name, ids=None, data=None, topk_ratio=None):
+    """Set the transport encodings of the kvstore messages of a data name.
+
+    The encodings of IDs and data must be the same in all the processes exchanging
+    messages of the data name. KVServer sends its encodings to KVClient on connection.
+
+    Parameters
+    ----------
+    name : str
+        data name
+    ids : str
+        encoding of IDs, None or 'delta'
+    data : str
+        encoding of float32 data, None, 'fp16' or 'int8'
+    topk_ratio : float
+        If given, only send this fraction of the rows of pushed gradients, and keep
+        the others as residuals for later pushes. It only affects the sender.
+    """
+    if ids is not None and ids not in _ID_CODECS:
+        raise ValueError('Unknown ID encoding: %s' % ids)
+    if data is not None and data not in _DATA_CODECS:
+        raise ValueError('Unknown data encoding: %s' % data)
+    if ids is None and data is None and topk_ratio is None:
+        _KV_CODECS.pop(name, None)
+        return
+    _KV_CODECS[name] = (_ID_CODECS[ids]() if ids is not None else None,
+                        _DATA_CODECS[data]() if data is not None else None,
+                        TopKSparsifier(topk_ratio) if topk_ratio is not None else None)
+
+def get_kv_codec(name):
+    """Get the transport encodings of a data name.
+
+    Returns
+    -------
+    tuple of (str, str, float)
+        encoding of IDs, encoding of data and top-k ratio, which are None if not set.
+    """
+    id_codec, data_codec, sparsifier = _KV_CODECS.get(name, (None, None, None))
+    return (id_codec.name if id_codec is not None else None,
+            data_codec.name if data_codec is not None else None,
+            sparsifier.ratio if sparsifier is not None else None)
+
+def flush_kv_residuals(name):
+    """Remove and return the residuals of the top-k sparsification of a data name.
+
+    Parameters
+    ----------
+    name : str
+        data name
+
+    Returns
+    -------
+    tuple of numpy.ndarray, or None
+        the IDs and rows of the residuals, or None if there is no residual.
+    """
+    _, _, sparsifier = _KV_CODECS.get(name, (None, None, None))
+    if sparsifier is None or sparsifier.num_residuals() == 0:
+        return None
+    return sparsifier.flush()
+
+def kv_codec_stats():
+    """Get the number of bytes of sent IDs and data before and after encoding.
+
+    Returns
+    -------
+    dict
+        {name : {'raw_bytes' : int, 'wire_bytes' : int}}
+    """
+    with _KV_CODEC_LOCK:
+        return {name : dict(stats) for name, stats in _KV_CODEC_STATS.items()}
+
+def _encode_kv_msg(msg):
+    """Apply the encodings of the data name to a PUSH, PULL or PULL_BACK message."""
+    codec = _KV_CODECS.get(msg.name.partition('|')[0])
+    if codec is None:
+        return msg
+    id_codec, data_codec, sparsifier = codec
+    tensor_id = F.asnumpy(msg.id).astype(np.int64)
+    raw_bytes = tensor_id.nbytes
+    data = None
+    if msg.data is not None:
+        data = F.asnumpy(msg.data)
+        raw_bytes += data.nbytes
+        if sparsifier is not None and msg.type == KVMsgType.PUSH and data.dtype == np.float32:
+            tensor_id, data = sparsifier.sparsify(tensor_id, data)
+        if data_codec is not None and data.dtype == np.float32:
+            data = data_codec.encode(data)
+    if id_codec is not None:
+        tensor_id = id_codec.encode(tensor_id)
+    wire_bytes = tensor_id.nbytes + (data.nbytes if data is not None else 0)
+    with _KV_CODEC_LOCK:
+        stats = _KV_CODEC_STATS.setdefault(msg.name.partition('|')[0],
+                                           {'raw_bytes' : 0, 'wire_bytes' : 0})
+        stats['raw_bytes'] += raw_bytes
+        stats['wire_bytes'] += wire_bytes
+    return msg._replace(id=F.zerocopy_from_numpy(tensor_id),
+                        data=F.zerocopy_from_numpy(data) if data is not None else None)
+
+def _decode_kv_msg(msg):
+    """Decode the IDs and data of a received PUSH, PULL or PULL_BACK message."""
+    codec = _KV_CODECS.get(msg.name.partition('|')[0])
+    if codec is None:
+        return msg
+    id_codec, data_codec, _ = codec
+    tensor_id, data = msg.id, msg.data
+    if id_codec is not None:
+        tensor_id = F.zerocopy_from_numpy(id_codec.decode(F.asnumpy(tensor_id)))
+    if data_codec is not None and data is not None:
+        data = F.zerocopy_from_numpy(data_codec.decode(F.asnumpy(data)))
+    return msg._replace(id=tensor_id, data=data)
+
 def _send_kv_msg(sender, msg, recv_id):
     """Send kvstore message.
 
@@ -225,6 +544,8 @@ def _send_kv_msg(sender, msg, recv_id):
     recv_id : int
         receiver's ID
     """
+    if msg.type in (KVMsgType.PUSH, KVMsgType.PULL, KVMsgType.PULL_BACK):
+        msg = _encode_kv_msg(msg)
     if msg.type == KVMsgType.PULL:
         tensor_id = F.zerocopy_to_dgl_ndarray(msg.id)
         _CAPI_SenderSendKVMsg(
@@ -285,7 +606,7 @@ def _recv_kv_msg(receiver):
             id=tensor_id,
             data=None,
             c_ptr=msg_ptr)
-        return msg
+        return _decode_kv_msg(msg)
     elif msg_type == KVMsgType.IP_ID:
         name = _CAPI_ReceiverGetKVMsgName(msg_ptr)
         msg = KVStoreMsg(
@@ -316,7 +637,7 @@ def _recv_kv_msg(receiver):
             id=tensor_id,
             data=data,
             c_ptr=msg_ptr)
-        return msg
+        return _decode_kv_msg(msg)
 
     raise RuntimeError('Unknown message type: %d' % msg_type.value)
 
@@ -5,6 +5,7 @@ import numpy as np
 
 from .base import DGLError
 from . import backend as F
+from .segment import segment_reduce, segment_softmax, segment_topk
 
 __all__ = ['sum_nodes', 'sum_edges', 'mean_nodes', 'mean_edges',
            'max_nodes', 'max_edges', 'softmax_nodes', 'softmax_edges',
@@ -43,12 +44,8 @@ def _sum_on(graph, typestr, feat, weight):
         weight = F.reshape(weight, (-1,) + (1,) * (F.ndim(feat) - 1))
         feat = weight * feat
 
-    n_graphs = graph.batch_size
     batch_num_objs = getattr(graph, batch_num_objs_attr)
-    seg_id = F.zerocopy_from_numpy(np.arange(n_graphs, dtype='int64').repeat(batch_num_objs))
-    seg_id = F.copy_to(seg_id, F.context(feat))
-    y = F.unsorted_1d_segment_sum(feat, seg_id, n_graphs, 0)
-    return y
+    return segment_reduce(batch_num_objs, feat, 'sum')
 
 def sum_nodes(graph, feat, weight=None):
     """Sums all the values of node field :attr:`feat` in :attr:`graph`, optionally
@@ -219,16 +216,13 @@ def _mean_on(graph, typestr, feat, weight):
         weight = F.reshape(weight, (-1,) + (1,) * (F.ndim(feat) - 1))
         feat = weight * feat
 
-    n_graphs = graph.batch_size
     batch_num_objs = getattr(graph, batch_num_objs_attr)
-    seg_id = F.zerocopy_from_numpy(np.arange(n_graphs, dtype='int64').repeat(batch_num_objs))
-    seg_id = F.copy_to(seg_id, F.context(feat))
     if weight is not None:
-        w = F.unsorted_1d_segment_sum(weight, seg_id, n_graphs, 0)
-        y = F.unsorted_1d_segment_sum(feat, seg_id, n_graphs, 0)
+        w = segment_reduce(batch_num_objs, weight, 'sum')
+        y = segment_reduce(batch_num_objs, feat, 'sum')
         y = y / w
     else:
-        y = F.unsorted_1d_segment_mean(feat, seg_id, n_graphs, 0)
+        y = segment_reduce(batch_num_objs, feat, 'mean')
     return y
 
 def mean_nodes(graph, feat, weight=None):
@@ -393,12 +387,8 @@ def _max_on(graph, typestr, feat):
     data = getattr(graph, data_attr)
     feat = data[feat]
 
-    # TODO: the current solution pads the different graph sizes to the same,
-    #  a more efficient way is to use segment max, we need to implement it in
-    #  the future.
     batch_num_objs = getattr(graph, batch_num_objs_attr)
-    feat = F.pad_packed_tensor(feat, batch_num_objs, -float('inf'))
-    return F.max(feat, 1)
+    return segment_reduce(batch_num_objs, feat, 'max')
 
 
 def _softmax_on(graph, typestr, feat):
@@ -423,13 +413,8 @@ def _softmax_on(graph, typestr, feat):
     data = getattr(graph, data_attr)
     feat = data[feat]
 
-    # TODO: the current solution pads the different graph sizes to the same,
-    #  a more efficient way is to use segment sum/max, we need to implement
-    #  it in the future.
     batch_num_objs = getattr(graph, batch_num_objs_attr)
-    feat = F.pad_packed_tensor(feat, batch_num_objs, -float('inf'))
-    feat = F.softmax(feat, 1)
-    return F.pack_padded_tensor(feat, batch_num_objs)
+    return segment_softmax(batch_num_objs, feat)
 
 def _broadcast_on(graph, typestr, feat_data):
     """Internal function of broadcasting features to all nodes/edges.
@@ -452,11 +437,8 @@ def _broadcast_on(graph, typestr, feat_data):
     _, batch_num_objs_attr, _ = READOUT_ON_ATTRS[typestr]
 
     batch_num_objs = getattr(graph, batch_num_objs_attr)
-    index = []
-    for i, num_obj in enumerate(batch_num_objs):
-        index.extend([i] * num_obj)
-    ctx = F.context(feat_data)
-    index = F.copy_to(F.tensor(index), ctx)
+    index = np.arange(len(batch_num_objs), dtype='int64').repeat(batch_num_objs)
+    index = F.copy_to(F.zerocopy_from_numpy(index), F.context(feat_data))
     return F.gather_row(feat_data, index)
 
 def _topk_on(graph, typestr, feat, k, descending=True, idx=None):
@@ -503,8 +485,8 @@ def _topk_on(graph, typestr, feat, k, descending=True, idx=None):
     -----
     If an example has :math:`n` nodes/edges and :math:`n<k`, in the first
     returned tensor the :math:`n+1` to :math:`k`th rows would be padded
-    with all zero; in the second returned tensor, the behavior of :math:`n+1`
-    to :math:`k`th elements is not defined.
+    with all zero; in the second returned tensor, the :math:`n+1` to
+    :math:`k`th elements are zero.
     """
     data_attr, batch_num_objs_attr, _ = READOUT_ON_ATTRS[typestr]
     data = getattr(graph, data_attr)
@@ -513,39 +495,8 @@ def _topk_on(graph, typestr, feat, k, descending=True, idx=None):
                        ' equal to 2'.format(typestr, feat))
 
     feat = data[feat]
-    hidden_size = F.shape(feat)[-1]
     batch_num_objs = getattr(graph, batch_num_objs_attr)
-    batch_size = len(batch_num_objs)
-
-    length = max(max(batch_num_objs), k)
-    fill_val = -float('inf') if descending else float('inf')
-    feat_ = F.pad_packed_tensor(feat, batch_num_objs, fill_val, l_min=k)
-
-    if idx is not None:
-        keys = F.squeeze(F.slice_axis(feat_, -1, idx, idx+1), -1)
-        order = F.argsort(keys, -1, descending=descending)
-    else:
-        order = F.argsort(feat_, 1, descending=descending)
-
-    topk_indices = F.slice_axis(order, 1, 0, k)
-
-    # zero padding
-    feat_ = F.pad_packed_tensor(feat, batch_num_objs, 0, l_min=k)
-
-    if idx is not None:
-        feat_ = F.reshape(feat_, (batch_size * length, -1))
-        shift = F.repeat(F.arange(0, batch_size) * length, k, -1)
-        shift = F.copy_to(shift, F.context(feat))
-        topk_indices_ = F.reshape(topk_indices, (-1,)) + shift
-    else:
-        feat_ = F.reshape(feat_, (-1,))
-        shift = F.repeat(F.arange(0, batch_size), k * hidden_size, -1) * length * hidden_size +\
-                F.cat([F.arange(0, hidden_size)] * batch_size * k, -1)
-        shift = F.copy_to(shift, F.context(feat))
-        topk_indices_ = F.reshape(topk_indices, (-1,)) * hidden_size + shift
-
-    return F.reshape(F.gather_row(feat_, topk_indices_), (batch_size, k, -1)),\
-           topk_indices
+    return segment_topk(batch_num_objs, feat, k, descending=descending, idx=idx)
 
 
 def max_nodes(graph, feat):
@@ -1008,8 +959,8 @@ def topk_nodes(graph, feat, k, descending=True, idx=None):
     -----
     If an example has :math:`n` nodes and :math:`n<k`, in the first
     returned tensor the :math:`n+1` to :math:`k`th rows would be padded
-    with all zero; in the second returned tensor, the behavior of :math:`n+1`
-    to :math:`k`th elements is not defined.
+    with all zero; in the second returned tensor, the :math:`n+1` to
+    :math:`k`th elements are zero.
     """
     return _topk_on(graph, 'nodes', feat, k, descending=descending, idx=idx)
 
@@ -1125,7 +1076,7 @@ def topk_edges(graph, feat, k, descending=True, idx=None):
     -----
     If an example has :math:`n` edges and :math:`n<k`, in the first
     returned tensor the :math:`n+1` to :math:`k`th rows would be padded
-    with all zero; in the second returned tensor, the behavior of :math:`n+1`
-    to :math:`k`th elements is not defined.
+    with all zero; in the second returned tensor, the :math:`n+1` to
+    :math:`k`th elements are zero.
     """
     return _topk_on(graph, 'edges', feat, k, descending=descending, idx=idx)
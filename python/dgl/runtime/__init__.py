@@ -2,5 +2,6 @@
 from __future__ import absolute_import
 
 from . import scheduler
+from . import cache
 from .runtime import Runtime
 from .adapter import GraphAdapter
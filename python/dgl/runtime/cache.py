@@ -0,0 +1,283 @@
+"""Module for caching compiled schedules.
+
+Scheduling ``update_all`` or ``pull`` builds an IR program whose executors
+capture index data (edge lists, degree buckets, id mappings) derived from the
+graph structure. When the same structure, functions and node selection are
+seen again, the compiled program can be reused and only the feature frames
+need to be re-bound.
+
+The cache of each graph lives in the ``_cache`` dictionary of its graph index,
+so it is dropped automatically whenever the graph structure is mutated (all
+mutations call ``clear_cache``), and it is shared by graph objects that share
+the same structure, e.g. those created by ``local_var`` or ``local_scope``.
+Since a cached program binds the frames of the graph it runs on, concurrent
+runs of the same program from different threads are serialized.
+
+The cache keys hold the UDFs by reference, so a cached program keeps its UDFs
+and everything their closures capture alive until it is evicted (at most
+``get_schedule_cache_capacity()`` programs per graph structure) or the graph
+structure is mutated.
+"""
+from __future__ import absolute_import
+
+from collections import OrderedDict
+import threading
+
+from ..frame import FrameRef, sync_frame_initializer
+from ..function.base import BuiltinFunction
+from .. import utils
+from . import ir
+from .ir.var import VarType
+from .runtime import Runtime
+
+__all__ = [
+    'set_schedule_cache_capacity',
+    'get_schedule_cache_capacity',
+    'schedule_cache_info',
+    'reset_schedule_cache_info',
+]
+
+# Maximum number of compiled programs cached per graph structure.
+_CAPACITY = 8
+# Global hit/miss counters.
+_GLOBAL_INFO = {'hits' : 0, 'misses' : 0}
+# Key of the schedule cache in graph index's cache dictionary.
+_CACHE_KEY = 'schedule_cache'
+# Frame roles of a GraphAdapter that are re-bound before each run.
+_FRAME_ROLES = ('srcframe', 'dstframe', 'edgeframe', 'msgframe')
+
+def set_schedule_cache_capacity(capacity):
+    """Set the maximum number of compiled programs cached per graph.
+
+    Parameters
+    ----------
+    capacity : int
+        The capacity. Zero disables the schedule cache.
+    """
+    global _CAPACITY
+    _CAPACITY = max(int(capacity), 0)
+
+def get_schedule_cache_capacity():
+    """Get the maximum number of compiled programs cached per graph.
+
+    Returns
+    -------
+    int
+        The capacity.
+    """
+    return _CAPACITY
+
+def schedule_cache_info(graph=None):
+    """Return the schedule cache statistics.
+
+    Parameters
+    ----------
+    graph : DGLGraph or DGLHeteroGraph, optional
+        If given, return the statistics of the cache of this graph. Otherwise,
+        return the statistics accumulated over all graphs.
+
+    Returns
+    -------
+    dict
+        The number of ``hits`` and ``misses``. For a single graph, also the
+        number of cached programs (``size``).
+    """
+    if graph is None:
+        return dict(_GLOBAL_INFO)
+    cache = graph._graph._cache.get(_CACHE_KEY)
+    if cache is None:
+        return {'hits' : 0, 'misses' : 0, 'size' : 0}
+    return {'hits' : cache.hits, 'misses' : cache.misses, 'size' : len(cache)}
+
+def reset_schedule_cache_info():
+    """Reset the global hit/miss counters."""
+    _GLOBAL_INFO['hits'] = 0
+    _GLOBAL_INFO['misses'] = 0
+
+class ScheduleCache(object):
+    """LRU cache of compiled programs of one graph structure.
+
+    Parameters
+    ----------
+    capacity : int
+        Maximum number of programs to keep.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._progs = OrderedDict()
+
+    def __len__(self):
+        return len(self._progs)
+
+    def get(self, key):
+        """Look up a compiled program. Return None on miss."""
+        cprog = self._progs.get(key)
+        if cprog is None:
+            self.misses += 1
+            _GLOBAL_INFO['misses'] += 1
+        else:
+            self._progs.move_to_end(key)
+            self.hits += 1
+            _GLOBAL_INFO['hits'] += 1
+        return cprog
+
+    def put(self, key, cprog):
+        """Insert a compiled program, evicting the least recently used one."""
+        self._progs[key] = cprog
+        while len(self._progs) > self.capacity:
+            self._progs.popitem(last=False)
+
+class CachedProgram(object):
+    """A compiled program whose graph frames can be re-bound.
+
+    Parameters
+    ----------
+    prog : Prog
+        The compiled program.
+    graph : GraphAdapter
+        The graph the program is compiled against.
+    """
+    def __init__(self, prog, graph):
+        self.prog = prog
+        # The variables and temporary frames of the program are shared by all
+        # runs, so only one run may bind them at a time.
+        self._lock = threading.Lock()
+        frames = _role_frames(graph)
+        ret_ids = set(id(exe.ret_var()) for exe in prog.execs
+                      if exe.ret_var() is not None)
+        # (var, role) of variables bound to graph frames
+        self.bindings = []
+        # variables holding intermediate results
+        self.ret_vars = []
+        # (frame, role) of temporary frames and the graph frame whose
+        # initializers they borrow
+        self.tmp_frames = []
+        seen = set()
+        for exe in prog.execs:
+            for v in list(exe.arg_vars()) + [exe.ret_var()]:
+                if v is None or id(v) in seen:
+                    continue
+                seen.add(id(v))
+                if v.typecode not in (VarType.FEAT, VarType.FEAT_DICT):
+                    continue
+                role = _find_role(frames, lambda frm, data=v.data: frm is data)
+                if role is not None:
+                    self.bindings.append((v, role))
+                elif id(v) in ret_ids:
+                    self.ret_vars.append(v)
+                elif isinstance(v.data, FrameRef):
+                    init_role = _find_role(
+                        frames,
+                        lambda frm, data=v.data: frm._frame._initializers is \
+                            data._frame._initializers)
+                    self.tmp_frames.append((v.data, init_role))
+
+    def run(self, graph):
+        """Bind the frames of the given graph and run the program.
+
+        Parameters
+        ----------
+        graph : GraphAdapter
+            The graph to run on. Must have the same structure as the one the
+            program is compiled against.
+
+        Concurrent calls from several threads are serialized by a lock, since
+        they would otherwise overwrite each other's frame bindings.
+        """
+        frames = _role_frames(graph)
+        with self._lock:
+            for v, role in self.bindings:
+                v.data = frames[role]
+            for frame, role in self.tmp_frames:
+                if role is not None:
+                    sync_frame_initializer(frame._frame, frames[role]._frame)
+            try:
+                Runtime.run(self.prog)
+            finally:
+                self._release()
+
+    def _release(self):
+        """Drop references to feature data so that a cached program does not
+        keep tensors (and their autograd history) alive between runs."""
+        for v, _ in self.bindings:
+            v.data = None
+        for v in self.ret_vars:
+            v.data = None
+        for frame, _ in self.tmp_frames:
+            num_rows = frame.num_rows
+            frame.clear()
+            frame.add_rows(num_rows)
+
+def _role_frames(graph):
+    """Return the frames of the graph adapter by role."""
+    return {role : getattr(graph, role) for role in _FRAME_ROLES}
+
+def _find_role(frames, pred):
+    """Return the first role whose frame satisfies the predicate."""
+    for role in _FRAME_ROLES:
+        if pred(frames[role]):
+            return role
+    return None
+
+def _key_item(item):
+    """Convert one schedule argument to a hashable key item."""
+    if isinstance(item, utils.Index):
+        return (len(item), item.tonumpy().tobytes())
+    elif isinstance(item, BuiltinFunction):
+        return (type(item).__name__,) + tuple(sorted(vars(item).items()))
+    elif isinstance(item, (list, tuple)):
+        return tuple(_key_item(it) for it in item)
+    else:
+        hash(item)
+        return item
+
+def schedule_key(*args):
+    """Build the cache key of a schedule from its arguments.
+
+    Builtin functions are compared by value, UDFs by identity and
+    ``utils.Index`` by content.
+
+    Returns
+    -------
+    tuple or None
+        The key. None if some argument cannot be used as a key.
+    """
+    try:
+        return tuple(_key_item(arg) for arg in args)
+    except TypeError:
+        return None
+
+def run_cached(graph, key, schedule_func):
+    """Run a schedule, reusing the compiled program if cached.
+
+    Parameters
+    ----------
+    graph : GraphAdapter
+        The graph.
+    key : tuple or None
+        The schedule key returned by :func:`schedule_key`. If None, the
+        program is compiled and run without caching.
+    schedule_func : callable
+        Function that takes the graph adapter and issues the schedule into
+        the current program.
+    """
+    if key is None or _CAPACITY == 0:
+        with ir.prog() as prog:
+            schedule_func(graph)
+            Runtime.run(prog)
+        return
+    gcache = graph.gidx._cache
+    cache = gcache.get(_CACHE_KEY)
+    if cache is None:
+        cache = gcache[_CACHE_KEY] = ScheduleCache(_CAPACITY)
+    cache.capacity = _CAPACITY
+    key = (graph.canonical_etype,) + key
+    cprog = cache.get(key)
+    if cprog is None:
+        with ir.prog() as prog:
+            schedule_func(graph)
+        cprog = CachedProgram(prog, graph)
+        cache.put(key, cprog)
+    cprog.run(graph)
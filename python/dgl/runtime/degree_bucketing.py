@@ -1,8 +1,11 @@
 """Module for degree bucketing schedulers."""
 from __future__ import absolute_import
 
+import numpy as np
+
 from .._ffi.function import _init_api
 from .. import backend as F
+from ..base import DGLError
 from ..udf import NodeBatch, EdgeBatch
 from .. import utils
 
@@ -52,12 +55,89 @@ def gen_degree_bucketing_schedule(
     buckets = _degree_bucketing_schedule(message_ids, dst_nodes, recv_nodes)
     # generate schedule
     _, degs, buckets, msg_ids, zero_deg_nodes = buckets
+    bkt_list = [(deg, vbkt, mid, None) for deg, vbkt, mid in zip(degs, buckets, msg_ids)]
+    _gen_bucket_reduce(reduce_udf, bkt_list, zero_deg_nodes,
+                       var_nf, var_mf, var_out, ntype=ntype)
+    _annotate_prog('degree', [deg for deg, _, _, _ in bkt_list])
+
+def gen_padded_bucketing_schedule(
+        reduce_udf,
+        message_ids,
+        dst_nodes,
+        recv_nodes,
+        var_nf,
+        var_mf,
+        var_out,
+        ntype=None):
+    """Create padded degree bucketing schedule.
+
+    Similar to :func:`gen_degree_bucketing_schedule`, but the degree buckets
+    are further grouped into size classes: all in-degrees within
+    ``(2^(k-1), 2^k]`` fall into the same class. Within a class, the mailbox
+    of each node is padded to the largest degree of the class by repeating
+    its last real message, and a mask marking the real messages is passed to
+    the UDF via :attr:`NodeBatch.mailbox_mask <dgl.udf.NodeBatch.mailbox_mask>`.
+    The reduce UDF is thus invoked ``O(log(max_degree))`` times instead of once
+    per distinct in-degree, at the cost of at most 2x message reads.
+
+    Parameters
+    ----------
+    reduce_udf : callable
+        The UDF to reduce messages.
+    message_ids : utils.Index
+        The variable for message ids.
+        Invariant: len(message_ids) == len(dst_nodes)
+    dst_nodes : utils.Index
+        The variable for dst node of each message.
+        Invariant: len(message_ids) == len(dst_nodes)
+    recv_nodes : utils.Index
+        The unique nodes that perform recv.
+        Invariant: recv_nodes = sort(unique(dst_nodes))
+    var_nf : var.FEAT_DICT
+        The variable for node feature frame.
+    var_mf : var.FEAT_DICT
+        The variable for message frame.
+    var_out : var.FEAT_DICT
+        The variable for output feature dicts.
+    ntype : str, optional
+        The node type, if running on a heterograph.
+        If None, assuming it's running on a homogeneous graph.
+    """
+    buckets = _degree_bucketing_schedule(message_ids, dst_nodes, recv_nodes)
+    _, degs, buckets, msg_ids, zero_deg_nodes = buckets
+    bkt_list = _pad_buckets_by_size_class(degs, buckets, msg_ids)
+    _gen_bucket_reduce(reduce_udf, bkt_list, zero_deg_nodes,
+                       var_nf, var_mf, var_out, ntype=ntype)
+    _annotate_prog('padded', [deg for deg, _, _, _ in bkt_list])
+
+def _gen_bucket_reduce(reduce_udf, bkt_list, zero_deg_nodes,
+                       var_nf, var_mf, var_out, ntype=None):
+    """Internal function to generate the per-bucket reduce and merge schedule.
+
+    Parameters
+    ----------
+    reduce_udf : callable
+        The UDF to reduce messages.
+    bkt_list : list of tuple
+        Each tuple is (degree, node ids, message ids, mask) of one bucket. The
+        mask is None if the mailboxes of the bucket are not padded.
+    zero_deg_nodes : utils.Index or None
+        The zero-degree nodes.
+    var_nf : var.FEAT_DICT
+        The variable for node feature frame.
+    var_mf : var.FEAT_DICT
+        The variable for message frame.
+    var_out : var.FEAT_DICT
+        The variable for output feature dicts.
+    ntype : str, optional
+        The node type, if running on a heterograph.
+    """
     # loop over each bucket
     idx_list = []
     fd_list = []
-    for deg, vbkt, mid in zip(degs, buckets, msg_ids):
+    for deg, vbkt, mid, mask in bkt_list:
         # create per-bkt rfunc
-        rfunc = _create_per_bkt_rfunc(reduce_udf, deg, vbkt, ntype=ntype)
+        rfunc = _create_per_bkt_rfunc(reduce_udf, deg, vbkt, ntype=ntype, mask=mask)
         # vars
         vbkt = var.IDX(vbkt)
         mid = var.IDX(mid)
@@ -83,6 +163,60 @@ def gen_degree_bucketing_schedule(
     reduced_feat = ir.MERGE_ROW(var_order, fd_list)
     ir.WRITE_DICT_(var_out, reduced_feat)
 
+def _annotate_prog(mode, degs):
+    """Record the bucketing decision in the current program."""
+    prog = ir.get_current_prog()
+    if prog is not None:
+        prog.annotate('reduce_bucketing', {'mode' : mode,
+                                           'num_buckets' : len(degs),
+                                           'degrees' : [int(deg) for deg in degs]})
+
+def _pad_buckets_by_size_class(degs, dsts, msg_ids):
+    """Group degree buckets into power-of-two size classes and pad them.
+
+    Parameters
+    ----------
+    degs : numpy.ndarray
+        The degree of each bucket (no zero-degree bucket).
+    dsts : list of utils.Index
+        The node ids of each bucket.
+    msg_ids : list of utils.Index
+        The message ids of each bucket.
+
+    Returns
+    -------
+    list of tuple
+        Each tuple is (padded degree, node ids, padded message ids, mask).
+        The mask is a float32 numpy array of shape (num_nodes, padded degree).
+    """
+    classes = {}
+    for deg, vbkt, mid in zip(degs, dsts, msg_ids):
+        deg = int(deg)
+        # size class k holds degrees in (2^(k-1), 2^k]
+        classes.setdefault((deg - 1).bit_length(), []).append((deg, vbkt, mid))
+    bkt_list = []
+    for cls in sorted(classes):
+        members = classes[cls]
+        pad_deg = max(deg for deg, _, _ in members)
+        v_list = []
+        mid_list = []
+        mask_list = []
+        for deg, vbkt, mid in members:
+            mid = mid.tonumpy().reshape(len(vbkt), deg)
+            # pad with the last real message so that duplicate-insensitive
+            # reducers (max, min) stay correct even without masking
+            pad = np.repeat(mid[:, -1:], pad_deg - deg, axis=1)
+            mask = np.zeros((len(vbkt), pad_deg), dtype=np.float32)
+            mask[:, :deg] = 1
+            v_list.append(vbkt.tonumpy())
+            mid_list.append(np.concatenate([mid, pad], axis=1).reshape(-1))
+            mask_list.append(mask)
+        bkt_list.append((pad_deg,
+                         utils.toindex(np.concatenate(v_list)),
+                         utils.toindex(np.concatenate(mid_list)),
+                         np.concatenate(mask_list)))
+    return bkt_list
+
 def _degree_bucketing_schedule(mids, dsts, v):
     """Return the bucketing by degree scheduling for destination nodes of
     messages
@@ -145,7 +279,7 @@ def _process_node_buckets(buckets):
 
     return v, degs, dsts, msg_ids, zero_deg_nodes
 
-def _create_per_bkt_rfunc(reduce_udf, deg, vbkt, ntype=None):
+def _create_per_bkt_rfunc(reduce_udf, deg, vbkt, ntype=None, mask=None):
     """Internal function to generate the per degree bucket node UDF."""
     def _rfunc_wrapper(node_data, mail_data):
         def _reshaped_getter(key):
@@ -153,7 +287,14 @@ def _create_per_bkt_rfunc(reduce_udf, deg, vbkt, ntype=None):
             new_shape = (len(vbkt), deg) + F.shape(msg)[1:]
             return F.reshape(msg, new_shape)
         reshaped_mail_data = utils.LazyDict(_reshaped_getter, mail_data.keys())
-        nbatch = NodeBatch(vbkt, node_data, reshaped_mail_data, ntype=ntype)
+        msg_mask = None
+        if mask is not None:
+            msg_mask = F.zerocopy_from_numpy(mask)
+            if len(mail_data) > 0:
+                ctx = F.context(mail_data[next(iter(mail_data.keys()))])
+                msg_mask = F.copy_to(msg_mask, ctx)
+        nbatch = NodeBatch(vbkt, node_data, reshaped_mail_data, ntype=ntype,
+                           msg_mask=msg_mask)
         return reduce_udf(nbatch)
     return _rfunc_wrapper
 
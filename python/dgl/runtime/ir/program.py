@@ -9,11 +9,26 @@ from .registry import IR_REGISTRY
 class Prog(object):
     """The program.
 
-    A program is simply a list of executors.
+    A program is simply a list of executors. Schedulers may also attach
+    annotations describing the decisions they made (e.g. how reduce
+    functions are bucketed), which are kept in ``annotations``.
     """
     def __init__(self):
         self.execs = []
         self.varcount = 0
+        self.annotations = {}
+
+    def annotate(self, key, value):
+        """Attach an annotation to this program.
+
+        Parameters
+        ----------
+        key : str
+            The annotation name.
+        value : any
+            The annotation value.
+        """
+        self.annotations[key] = value
 
     def issue(self, exe):
         """Issue an executor to this program.
@@ -42,6 +57,8 @@ class Prog(object):
 
     def pprint(self):
         """Pretty-print the program."""
+        for key, value in self.annotations.items():
+            print("# %s: %s" % (key, value))
         for exe in self.execs:
             self.pprint_exe(exe)
 
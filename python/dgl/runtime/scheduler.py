@@ -197,7 +197,8 @@ def schedule_update_all(graph,
                         message_func,
                         reduce_func,
                         apply_func,
-                        outframe=None):
+                        outframe=None,
+                        bucketing='degree'):
     """Get send and recv schedule
 
     Parameters
@@ -212,7 +213,11 @@ def schedule_update_all(graph,
         The apply node function
     outframe : FrameRef, optional
         The storage to write output data. If None, use graph.dstframe.
+    bucketing : str, optional
+        How to bucket the receiving nodes for a UDF reduce function.
+        Either "degree" or "padded". See :func:`_get_bucketing_schedule`.
     """
+    _get_bucketing_schedule(bucketing)
     if graph.num_edges() == 0:
         # All the nodes are zero degree; downgrade to apply nodes
         if apply_func is not None:
@@ -244,7 +249,8 @@ def schedule_update_all(graph,
                                         uv_getter=uv_getter,
                                         adj_creator=adj_creator,
                                         out_map_creator=out_map_creator,
-                                        canonical_etype=graph.canonical_etype)
+                                        canonical_etype=graph.canonical_etype,
+                                        bucketing=bucketing)
         # generate optional apply
         final_feat = _apply_with_accum(var_recv_nodes, var_dst_nf,
                                        reduced_feat, apply_func,
@@ -454,7 +460,8 @@ def schedule_pull(graph,
                   reduce_func,
                   apply_func,
                   inplace,
-                  outframe=None):
+                  outframe=None,
+                  bucketing='degree'):
     """Get pull schedule
 
     Parameters
@@ -473,7 +480,11 @@ def schedule_pull(graph,
         If True, the update will be done in place
     outframe : FrameRef, optional
         The storage to write output data. If None, use graph.dstframe.
+    bucketing : str, optional
+        How to bucket the receiving nodes for a UDF reduce function.
+        Either "degree" or "padded". See :func:`_get_bucketing_schedule`.
     """
+    _get_bucketing_schedule(bucketing)
     # TODO(minjie): `in_edges` can be omitted if message and reduce func pairs
     #   can be specialized to SPMV. This needs support for creating adjmat
     #   directly from pull node frontier.
@@ -503,7 +514,8 @@ def schedule_pull(graph,
                                         message_func, reduce_func, var_eid,
                                         var_pull_nodes, uv_getter, adj_creator,
                                         out_map_creator,
-                                        canonical_etype=graph.canonical_etype)
+                                        canonical_etype=graph.canonical_etype,
+                                        bucketing=bucketing)
         # generate optional apply
         final_feat = _apply_with_accum(var_pull_nodes, var_dst_nf,
                                        reduced_feat, apply_func,
@@ -713,6 +725,34 @@ def _standardize_func_usage(func, func_name):
                            ' Got: %s' % (func_name, str(func)))
         return func
 
+def _get_bucketing_schedule(bucketing):
+    """Return the schedule generator for UDF reduce of the given bucketing mode.
+
+    * "degree": one bucket per distinct in-degree. The reduce UDF is called
+      once per distinct in-degree.
+    * "padded": in-degrees are grouped into power-of-two size classes and the
+      mailboxes are padded within each class. The reduce UDF is called
+      O(log(max_degree)) times and receives a
+      :attr:`~dgl.udf.NodeBatch.mailbox_mask`.
+
+    Parameters
+    ----------
+    bucketing : str
+        The bucketing mode.
+
+    Returns
+    -------
+    callable
+        The schedule generator in :mod:`degree_bucketing`.
+    """
+    if bucketing == 'degree':
+        return db.gen_degree_bucketing_schedule
+    elif bucketing == 'padded':
+        return db.gen_padded_bucketing_schedule
+    else:
+        raise DGLError('Invalid bucketing mode "%s". Must be either "degree"'
+                       ' or "padded".' % str(bucketing))
+
 def _apply_with_accum(var_nodes, var_nf, var_accum, apply_func, ntype=None):
     """Apply with accumulated features.
 
@@ -809,7 +849,8 @@ def _gen_send_reduce(
         uv_getter,
         adj_creator,
         out_map_creator,
-        canonical_etype=(None, None, None)):
+        canonical_etype=(None, None, None),
+        bucketing='degree'):
     """Generate send and reduce schedule.
 
     The function generates symbolic program for computing
@@ -856,6 +897,9 @@ def _gen_send_reduce(
     canonical_etype : tuple[str, str, str], optional
         Canonical edge type if running on a heterograph.
         Default: (None, None, None), if running on a homogeneous graph.
+    bucketing : str, optional
+        The bucketing mode used for UDF reduce. Either "degree" or "padded".
+        Default: "degree".
 
     Returns
     -------
@@ -954,9 +998,10 @@ def _gen_send_reduce(
     else:
         # gen degree bucketing schedule for UDF recv
         mid = utils.toindex(slice(0, len(var_v.data)))
-        db.gen_degree_bucketing_schedule(rfunc, mid, var_v.data,
-                                         reduce_nodes, var_dst_nf, var_mf,
-                                         var_out, ntype=canonical_etype[-1])
+        gen_bucketing_schedule = _get_bucketing_schedule(bucketing)
+        gen_bucketing_schedule(rfunc, mid, var_v.data,
+                               reduce_nodes, var_dst_nf, var_mf,
+                               var_out, ntype=canonical_etype[-1])
         return var_out
 
 def _gen_udf_send(var_src_nf, var_dst_nf, var_ef, u, v, eid, mfunc,
@@ -2,3 +2,4 @@
 from .randomwalks import *
 from .pinsage import *
 from .neighbor import *
+from .loader import *
@@ -0,0 +1,271 @@
+"""Multi-layer neighbor sampling minibatch loader"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .. import backend as F
+from .. import transform
+from ..base import DGLError, EID, NID
+from .neighbor import sample_neighbors
+
+__all__ = ['NeighborSamplingLoader', 'FeatureFetcher']
+
+class NeighborSamplingLoader(object):
+    """Iterate over minibatches of seed nodes together with their sampled
+    multi-layer computation graphs.
+
+    For each minibatch, the neighbors of the seed nodes are sampled with
+    :func:`~dgl.sampling.sample_neighbors` layer by layer, starting from the
+    output layer. Each sampled frontier is compacted with
+    :func:`~dgl.compact_graphs`, and the nodes of the compacted frontier become
+    the seeds of the layer below. Minibatches are produced by a pool of
+    background threads and buffered in a bounded queue, so that sampling
+    overlaps with training.
+
+    Parameters
+    ----------
+    g : DGLHeteroGraph
+        The graph.
+    seed_nodes : tensor or dict[str, tensor]
+        The nodes to iterate over. A dictionary from node types to node ids is
+        required if the graph has more than one node type.
+    fanouts : list[int or list[int]]
+        The fan-out of each layer, from the input layer to the output layer.
+        See :func:`~dgl.sampling.sample_neighbors` for the fan-out of one
+        layer.
+    batch_size : int
+        The number of seed nodes per minibatch.
+    shuffle : bool, optional
+        If True, shuffle the seed nodes at every epoch. (Default: False)
+    drop_last : bool, optional
+        If True, drop the last incomplete minibatch. (Default: False)
+    edge_dir : str, optional
+        Edge direction ('in' or 'out'). (Default: 'in')
+    prob : str, optional
+        Edge feature name of the neighbor sampling probabilities.
+    replace : bool, optional
+        If True, sample with replacement. (Default: False)
+    node_feats : list[str], optional
+        Node features to slice for the nodes of every layer. They are
+        gathered once for the input layer into reusable buffers (see
+        :class:`FeatureFetcher`) and stored in the node data of every graph of
+        the minibatch. The features are overwritten by later minibatches, so
+        they are only valid until the next minibatch is requested.
+    pin_memory : bool, optional
+        If True, gather the node features into page-locked memory for faster
+        copies to GPU. (Default: False)
+    num_workers : int, optional
+        The number of sampling threads. The C++ kernels of neighbor sampling,
+        compaction and feature gathering release the GIL, so they run in
+        parallel in several threads. The Python code between the kernels
+        still runs one thread at a time, which bounds the speedup for small
+        minibatches. (Default: 1)
+    prefetch : int, optional
+        The maximum number of minibatches sampled ahead of the consumer.
+        (Default: 2)
+
+    Examples
+    --------
+    >>> loader = dgl.sampling.NeighborSamplingLoader(
+    ...     g, train_nid, [10, 25], batch_size=1000, shuffle=True,
+    ...     node_feats=['features'], num_workers=4)
+    >>> for seeds, graphs in loader:
+    ...     h = graphs[0].ndata['features'].to(device)
+    ...     for layer, graph in zip(layers, graphs):
+    ...         h = layer(graph, h)
+
+    Each element of ``graphs`` is the compacted frontier of one layer. Its
+    ``dgl.NID`` node feature maps the compacted nodes to the original graph,
+    and its ``dgl.EID`` edge feature maps the sampled edges to the original
+    graph. The nodes of ``graphs[i + 1]`` are the first nodes of
+    ``graphs[i]``.
+    """
+    def __init__(self, g, seed_nodes, fanouts, batch_size, shuffle=False, drop_last=False,
+                 edge_dir='in', prob=None, replace=False, node_feats=None,
+                 pin_memory=False, num_workers=1, prefetch=2):
+        if not isinstance(seed_nodes, dict):
+            if len(g.ntypes) > 1:
+                raise DGLError("Must specify node type when the graph is not homogeneous.")
+            seed_nodes = {g.ntypes[0] : seed_nodes}
+        if num_workers < 1 or prefetch < 1:
+            raise DGLError('num_workers and prefetch must be positive.')
+        self.g = g
+        self.fanouts = list(fanouts)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.edge_dir = edge_dir
+        self.prob = prob
+        self.replace = replace
+        self.num_workers = num_workers
+        self.prefetch = prefetch
+        # The consumer holds one minibatch while at most prefetch + 1 others
+        # are in flight, each of which needs its own buffers.
+        self._num_slots = prefetch + 2
+        if node_feats:
+            self._fetcher = FeatureFetcher(g, node_feats, self._num_slots, pin_memory)
+        else:
+            self._fetcher = None
+        self._return_dict = len(g.ntypes) > 1
+        # Seeds of all types as parallel arrays of node type id and node id
+        self._seed_types = np.concatenate(
+            [np.full(len(nodes), g.get_ntype_id(ntype), dtype=np.int64)
+             for ntype, nodes in seed_nodes.items()])
+        self._seed_ids = np.concatenate(
+            [F.asnumpy(nodes).astype(np.int64) for nodes in seed_nodes.values()])
+
+    def __len__(self):
+        num_seeds = len(self._seed_ids)
+        if self.drop_last:
+            return num_seeds // self.batch_size
+        return (num_seeds + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        if self.shuffle:
+            order = np.random.permutation(len(self._seed_ids))
+        else:
+            order = np.arange(len(self._seed_ids))
+        executor = ThreadPoolExecutor(max_workers=self.num_workers)
+        pending = deque()
+        try:
+            for i in range(len(self)):
+                batch = order[i * self.batch_size:(i + 1) * self.batch_size]
+                pending.append(executor.submit(self._sample, batch, i % self._num_slots))
+                if len(pending) > self.prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # Minibatches already being sampled cannot be cancelled. Wait for
+            # them so that they are done writing their feature slots before the
+            # next iteration reuses the slots.
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _sample(self, batch, slot):
+        """Sample the computation graphs of one minibatch.
+
+        Parameters
+        ----------
+        batch : numpy.ndarray
+            Positions of the seed nodes of the minibatch.
+        slot : int
+            The feature buffer slot of the minibatch.
+
+        Returns
+        -------
+        tensor or dict[str, tensor]
+            The seed nodes.
+        list[DGLHeteroGraph]
+            The compacted frontiers from the input layer to the output layer.
+        """
+        g = self.g
+        types = self._seed_types[batch]
+        ids = self._seed_ids[batch]
+        seeds = {}
+        for ntype in g.ntypes:
+            nodes = ids[types == g.get_ntype_id(ntype)]
+            if len(nodes) > 0:
+                seeds[ntype] = F.zerocopy_from_numpy(nodes)
+
+        graphs = []
+        cur = seeds
+        for fanout in reversed(self.fanouts):
+            frontier = sample_neighbors(g, cur, fanout, edge_dir=self.edge_dir,
+                                        prob=self.prob, replace=self.replace)
+            # Keep the seeds first so that they are the first nodes of the block.
+            block = transform.compact_graphs(frontier, always_preserve=cur)
+            for etype in frontier.canonical_etypes:
+                block.edges[etype].data[EID] = frontier.edges[etype].data[EID]
+            cur = {ntype : block.nodes[ntype].data[NID] for ntype in block.ntypes
+                   if block.number_of_nodes(ntype) > 0}
+            graphs.insert(0, block)
+
+        if self._fetcher is not None:
+            # The nodes of each layer are the first nodes of the layer below,
+            # so the features of all layers are prefixes of the input layer's.
+            feats = self._fetcher.fetch(cur, slot)
+            for graph in graphs:
+                for ntype, ntype_feats in feats.items():
+                    num_nodes = graph.number_of_nodes(ntype)
+                    for name, feat in ntype_feats.items():
+                        graph.nodes[ntype].data[name] = F.narrow_row(feat, 0, num_nodes)
+
+        if not self._return_dict:
+            seeds = seeds[g.ntypes[0]]
+        return seeds, graphs
+
+class FeatureFetcher(object):
+    """Gather node features into reusable preallocated buffers.
+
+    The buffers are organized in slots. Fetching into a slot overwrites the
+    features previously fetched into the same slot, so a caller pipelining
+    several minibatches should use one slot per minibatch alive at the same
+    time. A buffer grows when a fetch needs more rows than its capacity.
+    Features that autograd records, e.g. learnable embeddings, are gathered
+    into new tensors instead, so that their gradients are computed.
+
+    Parameters
+    ----------
+    g : DGLHeteroGraph
+        The graph holding the node features.
+    node_feats : list[str]
+        The names of the node features to gather. Node types without a
+        feature are skipped.
+    num_slots : int
+        The number of buffer slots.
+    pin_memory : bool, optional
+        If True, allocate the buffers of CPU features in page-locked memory.
+        (Default: False)
+    """
+    def __init__(self, g, node_feats, num_slots, pin_memory=False):
+        self.g = g
+        self.node_feats = list(node_feats)
+        self.pin_memory = pin_memory
+        self._buffers = [dict() for _ in range(num_slots)]
+
+    def fetch(self, nodes, slot):
+        """Gather the features of the given nodes.
+
+        Parameters
+        ----------
+        nodes : dict[str, tensor]
+            Node IDs of each node type.
+        slot : int
+            The buffer slot to gather into.
+
+        Returns
+        -------
+        dict[str, dict[str, tensor]]
+            The features of each node type, which are views of the buffers.
+        """
+        buffers = self._buffers[slot]
+        ret = {}
+        for ntype, ids in nodes.items():
+            data = self.g.nodes[ntype].data
+            ret[ntype] = {}
+            for name in self.node_feats:
+                if name not in data:
+                    continue
+                feat = data[name]
+                buf = self._get_buffer(buffers, (ntype, name), feat, len(ids))
+                ids = F.copy_to(ids, F.context(feat))
+                ret[ntype][name] = F.gather_row_into(
+                    feat, ids, F.narrow_row(buf, 0, len(ids)))
+        return ret
+
+    def _get_buffer(self, buffers, key, feat, num_rows):
+        """Return the buffer of the key with at least num_rows rows."""
+        buf = buffers.get(key)
+        if buf is None or F.shape(buf)[0] < num_rows or \
+                F.shape(buf)[1:] != F.shape(feat)[1:] or F.dtype(buf) != F.dtype(feat):
+            capacity = num_rows if buf is None else max(num_rows, 2 * F.shape(buf)[0])
+            ctx = F.context(feat)
+            buf = F.zeros((capacity,) + tuple(F.shape(feat)[1:]), F.dtype(feat), ctx)
+            if self.pin_memory and ctx == F.cpu():
+                buf = F.pin_memory(buf)
+            buffers[key] = buf
+        return buf
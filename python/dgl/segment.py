@@ -0,0 +1,221 @@
+"""Segment operators on rows grouped into consecutive segments.
+
+A batched graph stores the nodes (edges) of its member graphs in consecutive
+rows, so graph-level readouts are reductions over consecutive segments whose
+lengths are given by ``batch_num_nodes`` (``batch_num_edges``). The operators
+here run sum and mean with the backend's native segment sum, max and min with
+DGL's copy-reduce kernel on a bipartite graph connecting each row to its
+segment, and top-k with a sort of all rows by segment and value. Apart from
+max and min of data types the kernels do not support, they never pad the rows
+into a dense ``(B, max_len, *)`` tensor.
+"""
+from __future__ import absolute_import
+
+from collections import OrderedDict
+import numpy as np
+
+from .base import DGLError
+from . import backend as F
+from . import utils
+from .function.base import TargetCode
+from .heterograph_index import create_unitgraph_from_coo
+
+__all__ = ['segment_reduce', 'segment_softmax', 'segment_topk']
+
+def _seglen_numpy(seglen):
+    """Convert segment lengths to an int64 numpy array."""
+    if F.is_tensor(seglen):
+        seglen = F.asnumpy(seglen)
+    return np.asarray(seglen, dtype=np.int64)
+
+def _segment_ids(seglen):
+    """Return the segment id of each row as a numpy array."""
+    return np.repeat(np.arange(len(seglen), dtype=np.int64), seglen)
+
+# Segment graphs of recently seen segment lengths, keyed by the lengths and
+# the device. Readouts of a batched graph reuse the same lengths every layer.
+_SEGMENT_GRAPH_CACHE = OrderedDict()
+_SEGMENT_GRAPH_CACHE_SIZE = 16
+
+def _segment_graph(seglen, ctx):
+    """Return the bipartite graph with an edge from each row to its segment,
+    on the given context."""
+    key = (seglen.tobytes(), ctx.device_type, ctx.device_id)
+    graph = _SEGMENT_GRAPH_CACHE.pop(key, None)
+    if graph is None:
+        num_rows = int(seglen.sum())
+        row = utils.toindex(np.arange(num_rows, dtype=np.int64))
+        col = utils.toindex(_segment_ids(seglen))
+        gidx = create_unitgraph_from_coo(2, num_rows, len(seglen), row, col, 'any')
+        graph = gidx.get_unitgraph(0, ctx)
+    _SEGMENT_GRAPH_CACHE[key] = graph
+    while len(_SEGMENT_GRAPH_CACHE) > _SEGMENT_GRAPH_CACHE_SIZE:
+        _SEGMENT_GRAPH_CACHE.popitem(last=False)
+    return graph
+
+def _fill_rows(data, rows, value):
+    """Out-place fill the given rows of data with a constant."""
+    if len(rows) == 0:
+        return data
+    ctx = F.context(data)
+    fill = F.ones((len(rows),) + F.shape(data)[1:], F.dtype(data), ctx) * value
+    rows = F.copy_to(F.zerocopy_from_numpy(rows.astype(np.int64)), ctx)
+    return F.scatter_row(data, rows, fill)
+
+def _gather_cols(data, index):
+    """Gather data[index[i, j], j] for a 2D data and a 2D integer index."""
+    num_cols = F.shape(data)[1]
+    cols = F.reshape(F.copy_to(F.arange(0, num_cols), F.context(index)), (1, -1))
+    flat = F.reshape(index * num_cols + cols, (-1,))
+    return F.reshape(F.gather_row(F.reshape(data, (-1,)), flat), (-1, num_cols))
+
+def segment_reduce(seglen, value, reducer='sum'):
+    """Reduce each segment of rows.
+
+    Parameters
+    ----------
+    seglen : list of int, numpy.ndarray or tensor
+        The length of each segment. The lengths must sum up to the number of
+        rows of ``value``.
+    value : tensor
+        The data of shape :math:`(N, *)`.
+    reducer : str, optional
+        One of ``"sum"``, ``"mean"``, ``"max"`` and ``"min"``. (Default: "sum")
+
+    Returns
+    -------
+    tensor
+        The reduced data of shape :math:`(B, *)` where :math:`B` is the number
+        of segments. An empty segment yields zero for ``"sum"`` and
+        ``"mean"``, ``-inf`` for ``"max"`` and ``inf`` for ``"min"``.
+
+    Examples
+    --------
+
+    >>> import torch as th
+    >>> from dgl.segment import segment_reduce
+    >>> value = th.tensor([[1.], [2.], [3.], [4.], [5.]])
+    >>> segment_reduce([2, 0, 3], value, 'max')
+    tensor([[2.],
+            [-inf],
+            [5.]])
+    """
+    if reducer not in ('sum', 'mean', 'max', 'min'):
+        raise DGLError('Invalid segment reducer "%s". Must be one of "sum",'
+                       ' "mean", "max" and "min".' % str(reducer))
+    seglen = _seglen_numpy(seglen)
+    n_segs = len(seglen)
+    if int(seglen.sum()) != F.shape(value)[0]:
+        raise DGLError('Segment lengths sum up to %d but the data has %d rows.'
+                       % (int(seglen.sum()), F.shape(value)[0]))
+    if reducer in ('sum', 'mean'):
+        seg_id = F.copy_to(F.zerocopy_from_numpy(_segment_ids(seglen)), F.context(value))
+        if reducer == 'sum':
+            return F.unsorted_1d_segment_sum(value, seg_id, n_segs, 0)
+        return F.unsorted_1d_segment_mean(value, seg_id, n_segs, 0)
+    if F.dtype(value) != F.float32:
+        # DGL kernels only support float32 for now.
+        return _segment_reduce_fallback(seglen, value, reducer)
+    graph = _segment_graph(seglen, utils.to_dgl_context(F.context(value)))
+    out = F.copy_reduce(reducer, graph, TargetCode.SRC, value, n_segs,
+                        (None, None), (None, None))
+    empty = np.nonzero(seglen == 0)[0]
+    return _fill_rows(out, empty, -float('inf') if reducer == 'max' else float('inf'))
+
+def _segment_reduce_fallback(seglen, value, reducer):
+    """Segment max or min with tensor operators, for dtypes unsupported by kernels."""
+    if reducer == 'max':
+        return F.max(F.pad_packed_tensor(value, seglen.tolist(), -float('inf')), 1)
+    else:
+        return F.min(F.pad_packed_tensor(value, seglen.tolist(), float('inf')), 1)
+
+def segment_softmax(seglen, value):
+    """Apply softmax over the rows of each segment.
+
+    Parameters
+    ----------
+    seglen : list of int, numpy.ndarray or tensor
+        The length of each segment.
+    value : tensor
+        The data of shape :math:`(N, *)`.
+
+    Returns
+    -------
+    tensor
+        The result of shape :math:`(N, *)`.
+    """
+    seglen = _seglen_numpy(seglen)
+    seg_id = F.copy_to(F.zerocopy_from_numpy(_segment_ids(seglen)), F.context(value))
+    value_max = segment_reduce(seglen, value, 'max')
+    value = F.exp(value - F.gather_row(value_max, seg_id))
+    value_sum = segment_reduce(seglen, value, 'sum')
+    return value / F.gather_row(value_sum, seg_id)
+
+def segment_topk(seglen, value, k, descending=True, idx=None):
+    """Return the top-k rows of each segment.
+
+    Rows are ranked within their segment by column ``idx`` of ``value``. If
+    ``idx`` is None, each column is ranked independently.
+
+    Parameters
+    ----------
+    seglen : list of int, numpy.ndarray or tensor
+        The length of each segment.
+    value : tensor
+        The data of shape :math:`(N, D)`.
+    k : int
+        The :math:`k` in "top-:math:`k`".
+    descending : bool, optional
+        If True, return the largest elements, otherwise the smallest ones.
+        (Default: True)
+    idx : int, optional
+        The column to rank on. (Default: None)
+
+    Returns
+    -------
+    tuple of tensors
+        The top-k data of shape :math:`(B, K, D)` and their indices within the
+        segments, of shape :math:`(B, K)` (or :math:`(B, K, D)` if ``idx`` is
+        None). Segments shorter than :math:`k` are padded with zero data and
+        zero indices.
+    """
+    seglen = _seglen_numpy(seglen)
+    batch_size = len(seglen)
+    num_rows = F.shape(value)[0]
+    ctx = F.context(value)
+    keys = value if idx is None else F.slice_axis(value, -1, idx, idx + 1)
+    num_cols = F.shape(keys)[1]
+
+    # Sort the rows of each column by key, then by segment. The position in
+    # the first order breaks the ties of the second sort, so each segment
+    # keeps the rows in the order of their keys.
+    order = F.argsort(keys, 0, descending)
+    seg_id = F.copy_to(F.zerocopy_from_numpy(_segment_ids(seglen)), ctx)
+    pos = F.reshape(F.copy_to(F.arange(0, num_rows), ctx), (-1, 1))
+    seg_key = F.reshape(F.gather_row(seg_id, F.reshape(order, (-1,))), (-1, num_cols))
+    order = _gather_cols(order, F.argsort(seg_key * num_rows + pos, 0, False))
+
+    # order[offsets[b] + j] holds the j-th ranked row(s) of segment b
+    offsets = np.cumsum(seglen) - seglen
+    num_topk = np.minimum(seglen, k)
+    rank = np.arange(k, dtype=np.int64)
+    valid = (rank[None, :] < seglen[:, None]).reshape(-1)
+    sel = (offsets[:, None] + rank[None, :]).reshape(-1)[valid]
+    rows = F.gather_row(order, F.copy_to(F.zerocopy_from_numpy(sel), ctx))
+    local = rows - F.reshape(F.copy_to(F.zerocopy_from_numpy(
+        np.repeat(offsets, num_topk)), ctx), (-1, 1))
+    out_pos = F.copy_to(F.zerocopy_from_numpy(np.nonzero(valid)[0].astype(np.int64)), ctx)
+
+    if idx is not None:
+        topk_feat = F.gather_row(value, F.reshape(rows, (-1,)))
+    else:
+        topk_feat = _gather_cols(value, rows)
+    out = F.zeros((batch_size * k,) + F.shape(value)[1:], F.dtype(value), ctx)
+    out = F.scatter_row(out, out_pos, topk_feat)
+    topk_indices = F.zeros((batch_size * k, num_cols), F.int64, ctx)
+    topk_indices = F.scatter_row(topk_indices, out_pos, local)
+    if idx is not None:
+        topk_indices = F.reshape(topk_indices, (batch_size, k))
+    else:
+        topk_indices = F.reshape(topk_indices, (batch_size, k, num_cols))
+    return F.reshape(out, (batch_size, k, -1)), topk_indices
@@ -116,12 +116,17 @@ class NodeBatch(object):
     ntype : str, optional
         The node type of this node batch, if running
         on a heterograph.
+    msg_mask : tensor, optional
+        A float tensor of shape ``(B, D)`` marking which mailbox slots
+        hold real messages (1) and which are padding (0). Only given
+        when the reduce function runs under padded bucketing.
     """
-    def __init__(self, nodes, data, msgs=None, ntype=None):
+    def __init__(self, nodes, data, msgs=None, ntype=None, msg_mask=None):
         self._nodes = nodes
         self._data = data
         self._msgs = msgs
         self._ntype = ntype
+        self._msg_mask = msg_mask
 
     @property
     def data(self):
@@ -148,6 +153,26 @@ class NodeBatch(object):
         """
         return self._msgs
 
+    @property
+    def mailbox_mask(self):
+        """Return the mask of valid mailbox slots.
+
+        Under ``bucketing="padded"``, nodes of different in-degrees share a
+        bucket and their mailboxes are padded to the same length by repeating
+        the last real message. Reducers that are insensitive to duplicates
+        (e.g. max, min) can ignore the padding; other reducers should weight
+        the messages with this mask, e.g.
+        ``(nodes.mailbox['m'] * nodes.mailbox_mask.unsqueeze(-1)).sum(1)``.
+
+        Returns
+        -------
+        tensor or None
+            A float tensor of shape ``(B, D)`` where ``B`` is the batch size
+            and ``D`` the padded mailbox length. ``None`` if the mailboxes
+            are not padded.
+        """
+        return self._msg_mask
+
     def nodes(self):
         """Return the nodes contained in this batch.
 
@@ -331,6 +331,40 @@ DGL_REGISTER_GLOBAL("heterograph_index._CAPI_DGLHeteroGetAdj")
         hg->GetAdj(etype, transpose, fmt));
   });
 
+namespace {
+// Return the unit graph of the relation, which is the graph itself if it is a unit graph.
+UnitGraphPtr GetRelationUnitGraph(HeteroGraphRef hg, dgl_type_t etype) {
+  auto ug = std::dynamic_pointer_cast<UnitGraph>(hg.sptr());
+  if (ug == nullptr)
+    ug = std::dynamic_pointer_cast<UnitGraph>(hg->GetRelationGraph(etype));
+  CHECK(ug) << "The relation graph of edge type " << etype << " is not a unit graph.";
+  return ug;
+}
+}  // namespace
+
+DGL_REGISTER_GLOBAL("heterograph_index._CAPI_DGLHeteroGetCreatedFormats")
+.set_body([] (DGLArgs args, DGLRetValue* rv) {
+    HeteroGraphRef hg = args[0];
+    dgl_type_t etype = args[1];
+    *rv = GetRelationUnitGraph(hg, etype)->GetCreatedFormats();
+  });
+
+DGL_REGISTER_GLOBAL("heterograph_index._CAPI_DGLHeteroCreateFormat")
+.set_body([] (DGLArgs args, DGLRetValue* rv) {
+    HeteroGraphRef hg = args[0];
+    dgl_type_t etype = args[1];
+    const std::string fmt = args[2];
+    GetRelationUnitGraph(hg, etype)->CreateFormat(ParseSparseFormat(fmt));
+  });
+
+DGL_REGISTER_GLOBAL("heterograph_index._CAPI_DGLHeteroDropFormat")
+.set_body([] (DGLArgs args, DGLRetValue* rv) {
+    HeteroGraphRef hg = args[0];
+    dgl_type_t etype = args[1];
+    const std::string fmt = args[2];
+    *rv = GetRelationUnitGraph(hg, etype)->DropFormat(ParseSparseFormat(fmt));
+  });
+
 DGL_REGISTER_GLOBAL("heterograph_index._CAPI_DGLHeteroVertexSubgraph")
 .set_body([] (DGLArgs args, DGLRetValue* rv) {
     HeteroGraphRef hg = args[0];
@@ -14,6 +14,8 @@
 #include <cstdlib>
 #include <cmath>
 #include <numeric>
+#include <random>
+#include <vector>
 #include "../c_api_common.h"
 
 using namespace dgl::runtime;
@@ -1929,4 +1931,110 @@ DGL_REGISTER_GLOBAL("sampling._CAPI_ResetWeightedEdgeSample")
   sampler->Reset();
 });
 
+/*!
+ * \brief Sampler of the negative nodes of chunks of positive edges.
+ *
+ * Unlike the edge samplers, it only generates node IDs and never builds
+ * negative subgraphs. Nodes are drawn with replacement, either uniformly or
+ * proportionally to node weights (e.g., degrees) by a binary search in their
+ * cumulative sums. The chunks are sampled in parallel, each with a random
+ * generator seeded by the given seed and the chunk index, so the result does
+ * not depend on the number of threads or their schedule.
+ */
+class NegativeNodeSamplerObject: public Object {
+ public:
+  NegativeNodeSamplerObject(const int64_t num_nodes, FloatArray node_weight)
+    : num_nodes_(num_nodes) {
+    CHECK_GT(num_nodes, 0) << "Cannot sample negative nodes from an empty graph";
+    const int64_t num_weights = node_weight->shape[0];
+    if (num_weights > 0) {
+      CHECK_EQ(num_weights, num_nodes)
+        << "The number of node weights must equal the number of nodes";
+      const float *weight_data = static_cast<const float *>(node_weight->data);
+      cdf_.resize(num_nodes);
+      double sum = 0;
+      for (int64_t i = 0; i < num_nodes; ++i) {
+        CHECK_GE(weight_data[i], 0) << "Node weights must be non-negative";
+        sum += weight_data[i];
+        cdf_[i] = sum;
+      }
+      CHECK_GT(sum, 0) << "Node weights must not be all zero";
+    }
+  }
+
+  /*!
+   * \brief Sample the negative nodes of chunks of positive edges.
+   * \param num_chunks The number of chunks.
+   * \param neg_sample_size The number of negative nodes per chunk.
+   * \param seed The seed of the random generators.
+   * \return The negative nodes, neg_sample_size consecutive ones per chunk.
+   */
+  IdArray Sample(const int64_t num_chunks, const int64_t neg_sample_size,
+                 const uint64_t seed) const {
+    IdArray ret = aten::NewIdArray(num_chunks * neg_sample_size);
+    dgl_id_t *ret_data = static_cast<dgl_id_t *>(ret->data);
+#pragma omp parallel for
+    for (int64_t c = 0; c < num_chunks; ++c) {
+      std::seed_seq seq{static_cast<uint32_t>(seed), static_cast<uint32_t>(seed >> 32),
+                        static_cast<uint32_t>(c), static_cast<uint32_t>(c >> 32)};
+      std::mt19937_64 rng(seq);
+      dgl_id_t *out = ret_data + c * neg_sample_size;
+      if (cdf_.empty()) {
+        std::uniform_int_distribution<int64_t> dist(0, num_nodes_ - 1);
+        for (int64_t j = 0; j < neg_sample_size; ++j)
+          out[j] = dist(rng);
+      } else {
+        std::uniform_real_distribution<double> dist(0, cdf_.back());
+        for (int64_t j = 0; j < neg_sample_size; ++j) {
+          const auto it = std::upper_bound(cdf_.begin(), cdf_.end(), dist(rng));
+          out[j] = std::min<int64_t>(it - cdf_.begin(), num_nodes_ - 1);
+        }
+      }
+    }
+    return ret;
+  }
+
+  DGL_DECLARE_OBJECT_TYPE_INFO(NegativeNodeSamplerObject, Object);
+
+ private:
+  int64_t num_nodes_;
+  // cumulative sums of the node weights; empty for uniform sampling
+  std::vector<double> cdf_;
+};
+
+class NegativeNodeSampler: public ObjectRef {
+ public:
+  NegativeNodeSampler() {}
+  explicit NegativeNodeSampler(std::shared_ptr<runtime::Object> obj): ObjectRef(obj) {}
+
+  NegativeNodeSamplerObject* operator->() const {
+    return static_cast<NegativeNodeSamplerObject*>(obj_.get());
+  }
+
+  std::shared_ptr<NegativeNodeSamplerObject> sptr() const {
+    return CHECK_NOTNULL(std::dynamic_pointer_cast<NegativeNodeSamplerObject>(obj_));
+  }
+
+  operator bool() const { return this->defined(); }
+  using ContainerType = NegativeNodeSamplerObject;
+};
+
+DGL_REGISTER_GLOBAL("sampling._CAPI_CreateNegativeNodeSampler")
+.set_body([] (DGLArgs args, DGLRetValue* rv) {
+    const int64_t num_nodes = args[0];
+    FloatArray node_weight = args[1];
+    CHECK_EQ(node_weight->ctx.device_type, kDLCPU)
+      << "NegativeNodeSampler only support CPU sampling";
+    *rv = std::make_shared<NegativeNodeSamplerObject>(num_nodes, node_weight);
+});
+
+DGL_REGISTER_GLOBAL("sampling._CAPI_SampleNegativeNodes")
+.set_body([] (DGLArgs args, DGLRetValue* rv) {
+    NegativeNodeSampler sampler = args[0];
+    const int64_t num_chunks = args[1];
+    const int64_t neg_sample_size = args[2];
+    const int64_t seed = args[3];
+    *rv = sampler->Sample(num_chunks, neg_sample_size, static_cast<uint64_t>(seed));
+});
+
 }  // namespace dgl
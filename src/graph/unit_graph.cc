@@ -1197,6 +1197,52 @@ UnitGraph::COOPtr UnitGraph::GetCOO() const {
   return coo_;
 }
 
+int64_t UnitGraph::GetCreatedFormats() const {
+  int64_t ret = 0;
+  if (coo_)
+    ret |= 1;
+  if (out_csr_)
+    ret |= 2;
+  if (in_csr_)
+    ret |= 4;
+  return ret;
+}
+
+bool UnitGraph::DropFormat(SparseFormat format) {
+  if (format == restrict_format_)
+    return false;
+  const int64_t created = GetCreatedFormats();
+  int64_t bit = 0;
+  switch (format) {
+    case SparseFormat::COO:
+      bit = 1;
+      break;
+    case SparseFormat::CSR:
+      bit = 2;
+      break;
+    case SparseFormat::CSC:
+      bit = 4;
+      break;
+    default:
+      LOG(FATAL) << "unsupported format code";
+  }
+  // keep at least one format to re-create the others from
+  if (!(created & bit) || created == bit)
+    return false;
+  switch (format) {
+    case SparseFormat::COO:
+      coo_ = nullptr;
+      break;
+    case SparseFormat::CSR:
+      out_csr_ = nullptr;
+      break;
+    default:
+      in_csr_ = nullptr;
+      break;
+  }
+  return true;
+}
+
 aten::CSRMatrix UnitGraph::GetCSCMatrix(dgl_type_t etype) const {
   return GetInCSR()->adj();
 }
@@ -192,6 +192,29 @@ class UnitGraph : public BaseHeteroGraph {
   /*! \return Return the COO format. Create from other format if not exist. */
   COOPtr GetCOO() const;
 
+  /*!
+   * \return Return the bitmask of the materialized formats, where bit 0 is COO,
+   *         bit 1 is CSR and bit 2 is CSC.
+   */
+  int64_t GetCreatedFormats() const;
+
+  /*! \brief Materialize the given format if it does not exist. */
+  void CreateFormat(SparseFormat format) const {
+    GetFormat(format);
+  }
+
+  /*!
+   * \brief Release the given format to save memory.
+   *
+   * The format is kept if it is the only materialized format or the restricted
+   * format of the graph. It is re-created on demand by later queries.
+   *
+   * Note that this is not thread-safe with concurrent queries on the graph.
+   *
+   * \return Whether the format is released.
+   */
+  bool DropFormat(SparseFormat format);
+
   /*! \return Return the COO matrix form */
   aten::COOMatrix GetCOOMatrix(dgl_type_t etype) const override;
 
@@ -359,6 +359,81 @@ def test_update_routines():
     assert(reduce_msg_shapes == {(1, 8, D), (9, 1, D)})
     reduce_msg_shapes.clear()
 
+def test_update_all_padded_bucketing():
+    g = generate_graph()
+    # in-degrees become: 1 -> 3, 2 -> 2, 3 -> 4, 9 -> 8, others -> 1
+    g.add_edges([2, 3, 4, 5, 6, 7], [1, 1, 2, 3, 3, 3])
+    g.ndata['h'] = F.randn((10, D))
+    mailbox_shapes = []
+
+    def masked_sum(nodes):
+        msgs = nodes.mailbox['m']
+        mailbox_shapes.append(tuple(msgs.shape))
+        mask = F.unsqueeze(nodes.mailbox_mask, 2)
+        return {'s' : F.sum(msgs * mask, 1), 'mx' : F.max(msgs, 1)}
+
+    def plain_sum(nodes):
+        msgs = nodes.mailbox['m']
+        assert nodes.mailbox_mask is None
+        return {'s' : F.sum(msgs, 1), 'mx' : F.max(msgs, 1)}
+
+    g.update_all(message_func, plain_sum)
+    s, mx = g.ndata.pop('s'), g.ndata.pop('mx')
+    g.update_all(message_func, masked_sum, bucketing='padded')
+    # degrees {1, 2, 3, 4, 8} fall into size classes {1}, {2}, {3, 4}, {8}
+    assert len(mailbox_shapes) == 4
+    assert (2, 4, D) in mailbox_shapes
+    assert F.allclose(g.ndata['s'], s)
+    assert F.allclose(g.ndata['mx'], mx)
+
+    # pull on a subset
+    mailbox_shapes.clear()
+    g.ndata.pop('s')
+    g.ndata.pop('mx')
+    v = F.tensor([1, 2, 9])
+    g.pull(v, message_func, masked_sum, bucketing='padded')
+    assert len(mailbox_shapes) == 3
+    assert F.allclose(F.gather_row(g.ndata['s'], v), F.gather_row(s, v))
+
+    try:
+        g.update_all(message_func, masked_sum, bucketing='foo')
+        assert False
+    except dgl.DGLError:
+        pass
+
+def test_schedule_cache():
+    import dgl.function as fn
+    from dgl.runtime import cache
+    g = generate_graph()
+    g.ndata['h'] = F.randn((10, D))
+    cache.set_schedule_cache_capacity(2)
+
+    def check(mfunc, rfunc, expect):
+        g.update_all(mfunc, rfunc)
+        assert F.allclose(g.ndata.pop('accum'), expect)
+
+    g.update_all(message_func, reduce_func)
+    expect = g.ndata.pop('accum')
+    check(message_func, reduce_func, expect)
+    # builtins are compared by value
+    check(fn.copy_src('h', 'm'), fn.sum('m', 'accum'), expect)
+    check(fn.copy_src('h', 'm'), fn.sum('m', 'accum'), expect)
+    info = cache.schedule_cache_info(g)
+    assert info['hits'] == 2 and info['misses'] == 2 and info['size'] == 2
+
+    # new feature values and local frames must be picked up by cached programs
+    g.ndata['h'] = g.ndata['h'] * 2
+    with g.local_scope():
+        check(message_func, reduce_func, expect * 2)
+    assert cache.schedule_cache_info(g)['hits'] == 3
+    g.local_var().pull(F.tensor([1, 9]), message_func, reduce_func)
+    assert cache.schedule_cache_info(g)['misses'] == 3
+
+    # mutation invalidates the cache
+    g.add_nodes(1)
+    assert cache.schedule_cache_info(g)['size'] == 0
+    cache.set_schedule_cache_capacity(8)
+
 def test_recv_0deg():
     # test recv with 0deg nodes;
     g = DGLGraph()
@@ -820,6 +895,8 @@ if __name__ == '__main__':
     test_apply_nodes()
     test_apply_edges()
     test_update_routines()
+    test_update_all_padded_bucketing()
+    test_schedule_cache()
     test_recv_0deg()
     test_recv_0deg_newfld()
     test_update_all_0deg()
@@ -203,9 +203,61 @@ def test_batch_no_edge():
     g3.add_nodes(1)  # no edges
     g = dgl.batch([g1, g3, g2]) # should not throw an error
 
+def test_batch_unbatch_many_columns():
+    graphs = []
+    for i in range(20):
+        g = dgl.DGLGraph()
+        g.add_nodes(i % 4)
+        if i % 4 > 1:
+            g.add_edges([0, 1], [1, 0])
+        for k in range(4):
+            g.ndata['h%d' % k] = F.randn((i % 4, k + 1))
+        g.edata['w'] = F.randn((g.number_of_edges(), 2))
+        graphs.append(g)
+    bg = dgl.batch(graphs)
+    assert bg.batch_num_nodes == [i % 4 for i in range(20)]
+    for k in range(4):
+        assert F.allclose(bg.ndata['h%d' % k],
+                          F.cat([g.ndata['h%d' % k] for g in graphs if g.number_of_nodes() > 0], 0))
+    assert F.allclose(bg.edata['w'],
+                      F.cat([g.edata['w'] for g in graphs if g.number_of_edges() > 0], 0))
+
+    ubg = dgl.unbatch(bg)
+    assert len(ubg) == 20
+    for g, ug in zip(graphs, ubg):
+        assert ug.number_of_nodes() == g.number_of_nodes()
+        assert ug.number_of_edges() == g.number_of_edges()
+        for k in range(4):
+            assert F.allclose(ug.ndata['h%d' % k], g.ndata['h%d' % k])
+        assert F.allclose(ug.edata['w'], g.edata['w'])
+    # out-place updates on an unbatched graph do not touch the batched graph
+    old = F.clone(bg.ndata['h0'])
+    ubg[1].ndata['h0'] = F.zeros((1, 1), F.float32, F.ctx())
+    assert F.allclose(bg.ndata['h0'], old)
+
+def test_batch_backward():
+    graphs = []
+    for i in range(3):
+        g = dgl.DGLGraph()
+        g.add_nodes(i + 1)
+        g.ndata['h'] = F.randn((i + 1, 2))
+        g.ndata['x'] = F.randn((i + 1, 3))
+        graphs.append(g)
+    h = [F.attach_grad(F.clone(g.ndata['h'])) for g in graphs]
+    with F.record_grad():
+        for g, hi in zip(graphs, h):
+            g.ndata['h'] = hi
+        # several columns are batched at once
+        bg = dgl.batch(graphs)
+        F.backward(F.reduce_sum(bg.ndata['h'] * 2))
+    for hi in h:
+        assert F.allclose(F.grad(hi), F.ones(F.shape(hi), F.float32, F.ctx()) * 2)
+
 if __name__ == '__main__':
     test_batch_unbatch()
     test_batch_unbatch1()
+    test_batch_unbatch_many_columns()
+    test_batch_backward()
     #test_batch_unbatch2()
     #test_batched_edge_ordering()
     #test_batch_send_then_recv()
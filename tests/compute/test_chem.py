@@ -0,0 +1,177 @@
+import os
+import tempfile
+import unittest
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import dgl
+from dgl.data.chem import MoleculeCSVDataset
+import backend as F
+
+def _has_rdkit():
+    try:
+        import rdkit
+        return True
+    except ImportError:
+        return False
+
+_FAIL_ON = set()
+_CALLS = []
+
+def _smiles_to_graph(smiles, node_featurizer=None, edge_featurizer=None):
+    # one node per character, scaled by node_featurizer to tell featurizers apart
+    _CALLS.append(smiles)
+    if smiles in _FAIL_ON:
+        raise RuntimeError('interrupted')
+    g = dgl.DGLGraph()
+    g.add_nodes(len(smiles))
+    g.ndata['h'] = F.tensor(np.full((len(smiles), 1), node_featurizer, dtype=np.float32))
+    return g
+
+def _make_dataset(df, path, node_featurizer=1., **kwargs):
+    return MoleculeCSVDataset(df, _smiles_to_graph, node_featurizer, None,
+                              'smiles', path, **kwargs)
+
+def _check_dataset(dataset, smiles, scale=1.):
+    assert len(dataset) == len(smiles)
+    for i, s in enumerate(smiles):
+        s_i, g, label, mask = dataset[i]
+        assert s_i == s
+        assert g.number_of_nodes() == len(s)
+        assert np.all(F.asnumpy(g.ndata['h']) == scale)
+        assert F.asnumpy(label)[0] == i
+
+def _interrupt(df, path, fail_on, **kwargs):
+    _FAIL_ON.add(fail_on)
+    try:
+        _make_dataset(df, path, **kwargs)
+        assert False, 'the pre-processing should have been interrupted'
+    except RuntimeError:
+        pass
+    finally:
+        _FAIL_ON.clear()
+
+def test_csv_dataset_parallel():
+    smiles = ['C' * (i + 1) for i in range(11)]
+    df = pd.DataFrame({'smiles': smiles, 'task': np.arange(11, dtype=np.float32)})
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for num_processes in [1, 3]:
+            path = os.path.join(tmpdir, 'graphs_{:d}.bin'.format(num_processes))
+            dataset = _make_dataset(df, path, num_processes=num_processes, chunk_size=2)
+            _check_dataset(dataset, smiles)
+            assert not os.path.exists(path + '.shards')
+            # reload the merged cache
+            _check_dataset(_make_dataset(df, path, chunk_size=2), smiles)
+
+def test_csv_dataset_resume():
+    smiles = ['C' * (i + 1) for i in range(6)]
+    df = pd.DataFrame({'smiles': smiles, 'task': np.arange(6, dtype=np.float32)})
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'graphs.bin')
+        # the first two chunks are finished before the interruption
+        _interrupt(df, path, smiles[4], chunk_size=2)
+        del _CALLS[:]
+        dataset = _make_dataset(df, path, chunk_size=2)
+        assert _CALLS == smiles[4:]
+        _check_dataset(dataset, smiles)
+
+        # chunks of other inputs are not reused
+        other = ['N' * (i + 1) for i in range(6)]
+        df_other = pd.DataFrame({'smiles': other, 'task': np.arange(6, dtype=np.float32)})
+        for kwargs, new_df, new_smiles, scale in [
+                ({'chunk_size': 3}, df, smiles, 1.),
+                ({'node_featurizer': 2.}, df, smiles, 2.),
+                ({}, df_other, other, 1.)]:
+            os.remove(path)
+            _interrupt(df, path, smiles[4], chunk_size=2)
+            del _CALLS[:]
+            kwargs.setdefault('chunk_size', 2)
+            dataset = _make_dataset(new_df, path, **kwargs)
+            assert _CALLS == new_smiles
+            _check_dataset(dataset, new_smiles, scale)
+
+        # load=False processes everything again
+        os.remove(path)
+        _interrupt(df, path, smiles[4], chunk_size=2)
+        del _CALLS[:]
+        dataset = _make_dataset(df, path, chunk_size=2, load=False)
+        assert _CALLS == smiles
+        _check_dataset(dataset, smiles)
+
+def _atom_index(atom):
+    # depends on more than one property, so it is called per atom
+    return [atom.GetIdx(), atom.GetDegree()]
+
+def _bond_atoms(bond):
+    return [bond.GetBeginAtomIdx(), bond.GetEndAtomIdx()]
+
+def _check_featurize_batch(featurizer, mols, get_items, num_copies):
+    feats, offsets = featurizer.featurize_batch(mols)
+    offsets = F.asnumpy(offsets)
+    assert offsets[0] == 0
+    for i, mol in enumerate(mols):
+        items = get_items(mol)
+        assert offsets[i + 1] - offsets[i] == num_copies * len(items)
+        for name, func in featurizer.featurizer_funcs.items():
+            feat = F.asnumpy(feats[name])[offsets[i]:offsets[i + 1]]
+            assert feat.dtype == np.float32
+            if len(items) == 0:
+                assert feat.shape == (0, featurizer.feat_size(name))
+                continue
+            # the baseline stacks the features of every item
+            expected = np.stack([np.asarray(func(x), dtype=np.float32) for x in items])
+            assert np.array_equal(feat, np.repeat(expected, num_copies, axis=0))
+    for name in featurizer.featurizer_funcs:
+        assert F.shape(feats[name])[0] == offsets[-1]
+
+@unittest.skipIf(not _has_rdkit(), reason="RDKit is not installed")
+def test_featurize_batch():
+    from rdkit import Chem
+    from dgl.data import chem
+    smiles = ['CCO', 'c1ccccc1O', '[Na+].[Cl-]', 'C[N+](C)(C)C', 'F/C=C/F',
+              'C[C@H](N)C(=O)O', 'C#N', '[CH2]C', 'O=S(=O)(O)c1ccc(Br)cc1']
+    mols = [Chem.MolFromSmiles(s) for s in smiles]
+
+    atom_featurizer = chem.BaseAtomFeaturizer({
+        'h': chem.ConcatFeaturizer([
+            partial(chem.atom_type_one_hot, allowable_set=['C', 'N', 'O'],
+                    encode_unknown=True),
+            chem.atom_degree_one_hot,
+            chem.atom_total_degree,
+            chem.atom_implicit_valence_one_hot,
+            chem.atom_hybridization_one_hot,
+            partial(chem.atom_formal_charge_one_hot, allowable_set=[-1, 0, 1]),
+            chem.atom_num_radical_electrons,
+            chem.atom_is_aromatic,
+            chem.atom_total_num_H_one_hot,
+            chem.atom_chiral_tag_one_hot,
+            _atom_index]),
+        'mass': partial(chem.atom_mass, coef=0.1),
+        'number': chem.atomic_number})
+    bond_featurizer = chem.BaseBondFeaturizer({
+        'e': chem.ConcatFeaturizer([
+            chem.bond_type_one_hot,
+            partial(chem.bond_is_conjugated_one_hot, encode_unknown=True),
+            chem.bond_is_in_ring,
+            chem.bond_stereo_one_hot,
+            _bond_atoms])})
+    get_atoms = lambda mol: list(mol.GetAtoms())
+    get_bonds = lambda mol: list(mol.GetBonds())
+    # the lookup tables kept from earlier batches must not leak into later ones
+    for batch in [mols, mols[::-1], mols[2:3], mols[:4]]:
+        _check_featurize_batch(atom_featurizer, batch, get_atoms, 1)
+        _check_featurize_batch(bond_featurizer, batch, get_bonds, 2)
+    for featurizer in [chem.CanonicalAtomFeaturizer(), chem.CanonicalBondFeaturizer()]:
+        name = list(featurizer.featurizer_funcs.keys())[0]
+        feats, offsets = featurizer.featurize_batch(mols)
+        offsets = F.asnumpy(offsets)
+        for i, mol in enumerate(mols):
+            # per-molecule featurization agrees with the batch
+            assert np.array_equal(F.asnumpy(featurizer(mol)[name]),
+                                  F.asnumpy(feats[name])[offsets[i]:offsets[i + 1]])
+
+if __name__ == '__main__':
+    test_csv_dataset_parallel()
+    test_csv_dataset_resume()
+    test_featurize_batch()
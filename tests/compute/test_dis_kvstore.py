@@ -0,0 +1,303 @@
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from multiprocessing import Process
+from unittest.mock import patch
+
+import numpy as np
+import dgl
+from dgl.contrib import dis_kvstore
+from dgl.contrib.dis_kvstore import KVClient, KVServer, LatencyHistogram, StripedLock
+from dgl.network import KVMsgType, KVStoreMsg, get_kv_codec, set_kv_codec
+import backend as F
+
+# three machines with one server each
+NAMEBOOK = {0 : [0, '127.0.0.1', 30050, 1],
+            1 : [1, '127.0.0.2', 30050, 1],
+            2 : [2, '127.0.0.3', 30050, 1]}
+NUM_IDS = 40
+
+# kvstore updates CPU tensors in place
+_skip_kvstore = unittest.skipIf(
+    dgl.backend.backend_name == "tensorflow" or F._default_context_str == 'gpu',
+    reason="kvstore only supports CPU tensors of PyTorch and MXNet")
+
+def _add_handler(name, ID, data, target):
+    # a read-modify-write update
+    F.scatter_row_inplace(target[name], ID, F.gather_row(target[name], ID) + data)
+
+class _FakeNetwork(object):
+    """Replace the sockets of a client by servers answering from a table of all
+    rows. Pulls are answered in reverse order of sending."""
+    def __init__(self, table):
+        self.table = table
+        self.sent = []
+
+    def send(self, sender, msg, recv_id):
+        self.sent.append((recv_id, msg))
+
+    def recv(self, receiver):
+        for i in reversed(range(len(self.sent))):
+            server_id, msg = self.sent[i]
+            if msg.type == KVMsgType.PULL:
+                del self.sent[i]
+                return KVStoreMsg(type=KVMsgType.PULL_BACK, rank=server_id, name=msg.name,
+                                  id=msg.id, data=F.gather_row(self.table, msg.id), c_ptr=None)
+        assert False, 'no pull request to answer'
+
+    def patch(self):
+        return patch.multiple(dis_kvstore, _send_kv_msg=self.send, _recv_kv_msg=self.recv,
+                              _clear_kv_msg=lambda msg: None)
+
+def _make_client(name, table, **kwargs):
+    """Create a client on machine 0 holding the local rows of data name."""
+    client = KVClient(server_namebook=NAMEBOOK, **kwargs)
+    client._machine_id = 0
+    client._client_id = 0
+    part = np.arange(NUM_IDS) % 3
+    g2l = np.zeros((NUM_IDS,), dtype=np.int64)
+    for machine in range(3):
+        g2l[part == machine] = np.arange((part == machine).sum())
+    client._data_store[name+'-part-'] = F.tensor(part, dtype=F.int64)
+    client._data_store[name+'-g2l-'] = F.tensor(g2l, dtype=F.int64)
+    client._data_store[name+'-data-'] = F.gather_row(
+        table, F.tensor(np.nonzero(part == 0)[0], dtype=F.int64))
+    client._has_data.update([name+'-part-', name+'-g2l-', name+'-data-'])
+    return client
+
+def test_latency_histogram():
+    hist = LatencyHistogram()
+    assert hist.summary() == {'count' : 0, 'mean' : 0., 'p50' : 0., 'p99' : 0., 'max' : 0.}
+    latencies = [1e-6 * (i + 1) for i in range(99)] + [0.5]
+    threads = [threading.Thread(target=lambda part: [hist.record(t) for t in part],
+                                args=(latencies[i::4],)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    summary = hist.summary()
+    assert summary['count'] == 100
+    assert np.isclose(summary['mean'], sum(latencies) / 100)
+    assert summary['max'] == 0.5
+    # percentiles are upper bounds within a factor of two
+    assert 50e-6 <= summary['p50'] <= 100e-6
+    assert 99e-6 <= summary['p99'] <= 198e-6
+    assert hist.percentile(100) == 0.5
+
+@_skip_kvstore
+def test_striped_lock():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        num_rows = 100
+        lock = StripedLock(os.path.join(tmpdir, 'lock'), num_rows, num_stripes=8)
+        calls = []
+        def _handler(name, ID, data, target):
+            calls.append(F.asnumpy(ID))
+            _add_handler(name, ID, data, target)
+        target = {'x' : F.zeros((num_rows, 2), F.float32, F.cpu())}
+        ids = np.array([99, 0, 13, 12, 50, 1], dtype=np.int64)
+        data = F.tensor(np.arange(12, dtype=np.float32).reshape(6, 2))
+        lock.apply(_handler, 'x', F.tensor(ids), data, target)
+        # one call per stripe, holding the rows of the stripe only
+        assert sorted(c.tolist() for c in calls) == [[0, 12, 1], [13], [50], [99]]
+        expected = np.zeros((num_rows, 2), dtype=np.float32)
+        expected[ids] = F.asnumpy(data)
+        assert np.array_equal(F.asnumpy(target['x']), expected)
+
+        # concurrent read-modify-write updates of the same rows are not lost
+        target = {'x' : F.zeros((num_rows, 2), F.float32, F.cpu())}
+        ids = F.arange(0, num_rows)
+        ones = F.ones((num_rows, 2), F.float32, F.cpu())
+        def _push():
+            for _ in range(20):
+                lock.apply(_add_handler, 'x', ids, ones, target)
+        threads = [threading.Thread(target=_push) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert np.all(F.asnumpy(target['x']) == 80)
+
+@_skip_kvstore
+def test_split_push():
+    server = KVServer(server_id=0, server_namebook=NAMEBOOK, num_client=1, num_push_shards=4)
+    server._data_store['x-data-'] = F.zeros((10, 2), F.float32, F.cpu())
+    local_id = F.tensor([9, 0, 5, 2, 7, 3], dtype=F.int64)
+    data = F.tensor(np.arange(12, dtype=np.float32).reshape(6, 2))
+    parts = server._split_push('x', local_id, data)
+    # shards of 2.5 rows, in order of shard
+    assert [p[0] for p in parts] == [0, 1, 2, 3]
+    assert [F.asnumpy(p[1]).tolist() for p in parts] == [[0, 2], [3], [5, 7], [9]]
+    for _, ID, part_data in parts:
+        assert np.array_equal(F.asnumpy(part_data)[:, 0] // 2,
+                              [F.asnumpy(local_id).tolist().index(i) for i in F.asnumpy(ID)])
+    # a push within one shard is not copied
+    local_id = F.tensor([3, 4], dtype=F.int64)
+    data = data[:2]
+    parts = server._split_push('x', local_id, data)
+    assert len(parts) == 1
+    assert parts[0][0] == 1 and parts[0][1] is local_id and parts[0][2] is data
+
+@_skip_kvstore
+def test_unique_id():
+    table = F.zeros((NUM_IDS, 2), F.float32, F.cpu())
+    client = _make_client('x', table)
+    for ids in [F.tensor([7, 3, 7, 39, 3, 0], dtype=F.int64),
+                F.tensor([39, 0, 39], dtype=F.int64)]:
+        unique_id, inverse = client._unique_id(ids)
+        assert len(np.unique(F.asnumpy(unique_id))) == F.shape(unique_id)[0]
+        assert F.array_equal(F.gather_row(unique_id, inverse), ids)
+    # IDs without duplicates are returned as they are
+    ids = F.tensor([4, 1, 2], dtype=F.int64)
+    unique_id, inverse = client._unique_id(ids)
+    assert unique_id is ids and inverse is None
+
+@_skip_kvstore
+def test_partition_by_machine():
+    table = F.zeros((NUM_IDS, 2), F.float32, F.cpu())
+    client = _make_client('x', table)
+    ids = F.tensor([39, 0, 20, 1, 21], dtype=F.int64)
+    sorted_id, machines, count = client._partition_by_machine('x', ids)
+    machine_id = F.asnumpy(client._data_store['x-part-'])[F.asnumpy(ids)]
+    assert count.dtype == np.int64
+    assert count.tolist() == np.bincount(machine_id, minlength=len(machines)).tolist()
+    # the IDs of each machine keep their order
+    assert F.asnumpy(sorted_id).tolist() == np.argsort(machine_id, kind='stable').tolist()
+
+@_skip_kvstore
+def test_pull_async():
+    table = F.tensor(np.arange(NUM_IDS * 2, dtype=np.float32).reshape(NUM_IDS, 2))
+    set_kv_codec('sorted_x', 'delta', None)
+    try:
+        for name, coalesce in [('x', True), ('x', False), ('sorted_x', True)]:
+            client = _make_client(name, table, coalesce_pull=coalesce, max_inflight_pulls=2)
+            network = _FakeNetwork(table)
+            # each request but the last one needs both remote machines
+            requests = [np.concatenate([[1, 2], np.random.randint(0, NUM_IDS, 30)])
+                        for _ in range(3)]
+            requests.append(np.array([0, 3, 0], dtype=np.int64)) # local rows only
+            with network.patch():
+                handles = [client.pull_async(name, F.tensor(ids, dtype=F.int64))
+                           for ids in requests]
+                # a request waits for responses once two are in flight, and the
+                # newest responses arrive first
+                assert not handles[0].done()
+                assert all(handle.done() for handle in handles[1:])
+                assert len(client._inflight_pulls) == 1
+                for handle, ids in zip(handles, requests):
+                    assert np.array_equal(F.asnumpy(handle.wait()), F.asnumpy(table)[ids])
+            assert len(client._inflight_pulls) == 0
+            pulled = sum(len(np.unique(ids)) if coalesce else len(ids) for ids in requests)
+            stats = client.get_traffic_stats()
+            assert stats['local_pull_rows'] + stats['remote_pull_rows'] == pulled
+    finally:
+        set_kv_codec('sorted_x')
+
+@_skip_kvstore
+def test_coalesce_push():
+    table = F.zeros((NUM_IDS, 2), F.float32, F.cpu())
+    for lock_shared_data in [False, True]:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            client = _make_client('x', table, coalesce_push=True)
+            if lock_shared_data:
+                client._locks['x'] = StripedLock(os.path.join(tmpdir, 'x-lock'), NUM_IDS)
+            client._push_handler = _add_handler
+            network = _FakeNetwork(table)
+            ids = np.array([3, 4, 3, 5, 4, 3], dtype=np.int64)
+            data = np.arange(12, dtype=np.float32).reshape(6, 2)
+            with network.patch():
+                client.push('x', F.tensor(ids, dtype=F.int64), F.tensor(data))
+            expected = np.zeros((NUM_IDS, 2), dtype=np.float32)
+            np.add.at(expected, ids, data)
+            # ID 3 is local, 4 and 5 are sent once each to their machines
+            assert np.array_equal(F.asnumpy(client._data_store['x-data-'])[1], expected[3])
+            sent = sorted((server_id, F.asnumpy(msg.id).tolist()) for server_id, msg in network.sent)
+            assert sent == [(1, [4]), (2, [5])]
+            for _, msg in network.sent:
+                assert msg.type == KVMsgType.PUSH
+                assert np.array_equal(F.asnumpy(msg.data), expected[F.asnumpy(msg.id)])
+            stats = client.get_coalesce_stats()
+            assert stats['push_rows'] == 6 and stats['push_unique_rows'] == 3
+
+@_skip_kvstore
+def test_push_topk_requires_coalesce():
+    table = F.zeros((NUM_IDS, 2), F.float32, F.cpu())
+    client = _make_client('topk_x', table)
+    # duplicate IDs would add the same residual several times
+    raised = False
+    try:
+        client.set_push_topk('topk_x', 0.5)
+    except AssertionError:
+        raised = True
+    assert raised
+    client = _make_client('topk_x', table, coalesce_push=True)
+    client.set_push_topk('topk_x', 0.5)
+    assert get_kv_codec('topk_x')[2] == 0.5
+    client.set_push_topk('topk_x', None)
+    assert get_kv_codec('topk_x') == (None, None, None)
+
+def _free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+def _run_server(workdir, namebook, name, num_threads):
+    # the shapes of shared tensors are exchanged through files of the working directory
+    os.chdir(workdir)
+    server = KVServer(server_id=0, server_namebook=namebook, num_client=1,
+                      num_threads=num_threads)
+    server.init_data(name, F.zeros((NUM_IDS, 2), F.float32, F.cpu()))
+    server.start()
+
+def _run_client(workdir, namebook, name):
+    os.chdir(workdir)
+    client = KVClient(server_namebook=namebook)
+    # pretend to be on another machine, so every request goes through the sockets
+    client._machine_id = 1
+    client.set_partition_book(name, F.zeros((NUM_IDS,), F.int64, F.cpu()))
+    client.connect()
+    expected = np.arange(NUM_IDS * 2, dtype=np.float32).reshape(NUM_IDS, 2)
+    client.push(name, F.arange(0, NUM_IDS), F.tensor(expected))
+    # more pulls than max_inflight_pulls, each waiting for the push before it
+    requests = [np.random.randint(0, NUM_IDS, 30) for _ in range(8)]
+    handles = [client.pull_async(name, F.tensor(ids, dtype=F.int64)) for ids in requests]
+    for handle, ids in zip(handles, requests):
+        assert np.array_equal(F.asnumpy(handle.wait()), expected[ids])
+    ids = np.arange(0, NUM_IDS, 3)
+    expected[ids] = -1
+    client.push(name, F.tensor(ids, dtype=F.int64), F.tensor(expected[ids]))
+    assert np.array_equal(F.asnumpy(client.pull(name, F.arange(0, NUM_IDS))), expected)
+    client.barrier()
+    client.shut_down()
+
+@_skip_kvstore
+def test_threaded_server():
+    namebook = {0 : [0, '127.0.0.1', _free_port(), 1]}
+    name = 'threaded_x_%d' % os.getpid()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        server = Process(target=_run_server, args=(tmpdir, namebook, name, 4))
+        client = Process(target=_run_client, args=(tmpdir, namebook, name))
+        server.start()
+        client.start()
+        client.join(timeout=120)
+        server.join(timeout=10)
+        hung = [p.is_alive() for p in [client, server]]
+        for p in [client, server]:
+            if p.is_alive():
+                p.terminate()
+        assert not any(hung), 'kvstore processes did not finish'
+        assert client.exitcode == 0 and server.exitcode == 0
+
+if __name__ == '__main__':
+    test_latency_histogram()
+    test_striped_lock()
+    test_split_push()
+    test_unique_id()
+    test_partition_by_machine()
+    test_pull_async()
+    test_coalesce_push()
+    test_push_topk_requires_coalesce()
+    test_threaded_server()
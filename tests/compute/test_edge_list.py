@@ -0,0 +1,120 @@
+import os
+import tempfile
+
+import numpy as np
+import dgl
+from dgl.base import DGLError
+from dgl.data.edge_list import IdMap, load_edge_list, graph_from_edge_list
+import backend as F
+
+def test_id_map():
+    id_map = IdMap()
+    assert np.array_equal(id_map.map(np.array(['b', 'a', 'b'])), [0, 1, 0])
+    # longer keys widen the key dtype
+    assert np.array_equal(id_map.map(np.array(['ccc', 'a', 'bb'])), [2, 1, 3])
+    assert np.array_equal(id_map.map(np.array(['x', 'bb']), add=False), [-1, 3])
+    assert len(id_map) == 4
+    assert id_map.keys().tolist() == ['b', 'a', 'ccc', 'bb']
+
+    # keys added in many chunks
+    id_map = IdMap()
+    keys = np.random.permutation(1000)
+    for start in range(0, 1000, 10):
+        assert np.array_equal(id_map.map(keys[start:start + 10]), np.arange(start, start + 10))
+    assert np.array_equal(id_map.map(keys[::-1]), np.arange(1000)[::-1])
+    assert np.array_equal(id_map.keys(), keys)
+    # runs of similar sizes are merged
+    assert len(id_map._runs) <= 10
+
+def test_load_edge_list_text():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'edges.tsv')
+        with open(path, 'w') as f:
+            f.write('src\trel\tdst\n# comment\n')
+            for i in range(100):
+                f.write('n%d\tr\tn%d\n' % (i, (i * 7) % 50))
+        # tiny chunks to exercise the streaming
+        src, dst, id_map = load_edge_list(path, columns=(0, 2), delimiter='\t',
+                                          skip_rows=1, string_ids=True, chunk_size=64)
+        keys = id_map.keys()
+        assert len(src) == 100
+        assert [keys[s] for s in src] == [b'n%d' % i for i in range(100)]
+        assert [keys[d] for d in dst] == [b'n%d' % ((i * 7) % 50) for i in range(100)]
+
+        g, id_map = graph_from_edge_list(path, columns=(0, 2), delimiter='\t', skip_rows=1,
+                                         string_ids=True)
+        assert g.number_of_nodes() == 100
+        assert g.number_of_edges() == 100
+
+def test_load_edge_list_extra_columns():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'weighted.txt')
+        with open(path, 'w') as f:
+            for i in range(10):
+                f.write('%d %d 0.5\n' % (i, i + 100))
+            f.write('\n')
+        # the weights are ignored, whatever the chunk boundaries
+        for chunk_size in (8, 1 << 20):
+            src, dst, _ = load_edge_list(path, chunk_size=chunk_size)
+            assert np.array_equal(src, np.arange(10))
+            assert np.array_equal(dst, np.arange(100, 110))
+        with open(path, 'a') as f:
+            f.write('1 2\n3 4\n')
+        try:
+            load_edge_list(path)
+            assert False, 'lines with fewer columns must be rejected'
+        except DGLError:
+            pass
+
+def test_load_edge_list_lines():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'edges.csv')
+        with open(path, 'wb') as f:
+            f.write(b'0,1\r\n  # comment\r\n\r\n2,3\r\n \t\r\n4,5')
+        for chunk_size in (1, 5, 1 << 20):
+            src, dst, _ = load_edge_list(path, delimiter=',', chunk_size=chunk_size)
+            assert np.array_equal(src, [0, 2, 4])
+            assert np.array_equal(dst, [1, 3, 5])
+        # a short line and a long line are rejected with the line number
+        with open(path, 'wb') as f:
+            f.write(b'0 1\n\n2\n3 4 5\n')
+        for chunk_size in (1, 1 << 20):
+            try:
+                load_edge_list(path, chunk_size=chunk_size)
+                assert False, 'lines with other numbers of columns must be rejected'
+            except DGLError as e:
+                assert 'line 3' in str(e)
+
+def test_load_edge_list_npy():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'edges.npy')
+        edges = np.random.randint(0, 30, (1000, 2))
+        np.save(path, edges)
+        src, dst, id_map = load_edge_list(path, chunk_size=128)
+        assert id_map is None
+        assert np.array_equal(src, edges[:, 0])
+        assert np.array_equal(dst, edges[:, 1])
+        g, _ = graph_from_edge_list(path, card=40)
+        assert g.number_of_nodes() == 40
+        u, v = g.all_edges(order='eid')
+        assert np.array_equal(F.asnumpy(u), edges[:, 0])
+        assert np.array_equal(F.asnumpy(v), edges[:, 1])
+
+def test_malformed_edge_list():
+    elist = [(0, 1, 2), (3, 4, 5)]
+    for create in [dgl.graph, dgl.DGLGraph]:
+        try:
+            create(elist)
+            assert False, 'tuples that are not (src, dst) pairs must be rejected'
+        except DGLError:
+            pass
+    g = dgl.graph([(0, 1), (1, 2)])
+    assert g.number_of_edges() == 2
+
+if __name__ == '__main__':
+    test_id_map()
+    test_load_edge_list_text()
+    test_load_edge_list_extra_columns()
+    test_load_edge_list_lines()
+    test_load_edge_list_npy()
+    test_malformed_edge_list()
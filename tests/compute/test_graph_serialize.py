@@ -7,7 +7,7 @@ import os
 
 from dgl import DGLGraph
 import dgl
-from dgl.data.utils import save_graphs, load_graphs, load_labels
+from dgl.data.utils import save_graphs, load_graphs, load_labels, open_graphs
 
 np.random.seed(44)
 
@@ -133,7 +133,45 @@ def test_graph_serialize_with_labels():
     os.unlink(path)
 
 
+def test_graph_serialize_mmap():
+    num_graphs = 20
+    g_list = construct_graph(num_graphs)
+    labels = {"label": F.randn((num_graphs, 3))}
+
+    # create a temporary file and immediately release it so DGL can open it.
+    f = tempfile.NamedTemporaryFile(delete=False)
+    path = f.name
+    f.close()
+
+    save_graphs(path, g_list, labels, version=2)
+
+    gfile = open_graphs(path)
+    assert len(gfile) == num_graphs
+    assert F.allclose(gfile.labels['label'], labels['label'])
+    assert F.allclose(load_labels(path)['label'], labels['label'])
+
+    idx_list = np.random.permutation(np.arange(num_graphs)).tolist()[:5]
+    loadg_list, l_labels = load_graphs(path, idx_list)
+    assert F.allclose(l_labels['label'], labels['label'])
+    for idx, load_g in zip(idx_list, loadg_list):
+        g = g_list[idx]
+        assert gfile.num_nodes(idx) == g.number_of_nodes()
+        assert gfile.num_edges(idx) == g.number_of_edges()
+        assert load_g.is_readonly
+        load_edges = load_g.all_edges('uv', 'eid')
+        g_edges = g.all_edges('uv', 'eid')
+        assert F.allclose(load_edges[0], g_edges[0])
+        assert F.allclose(load_edges[1], g_edges[1])
+        assert F.allclose(load_g.edata['e1'], g.edata['e1'])
+        assert F.allclose(load_g.edata['e2'], g.edata['e2'])
+        assert F.allclose(load_g.ndata['n1'], g.ndata['n1'])
+
+    del gfile, loadg_list, l_labels
+    os.unlink(path)
+
+
 if __name__ == "__main__":
     test_graph_serialize_with_feature()
     test_graph_serialize_without_feature()
     test_graph_serialize_with_labels()
+    test_graph_serialize_mmap()
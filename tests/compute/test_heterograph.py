@@ -1448,6 +1448,47 @@ def test_stack_reduce():
             'stack')
     assert g.nodes['game'].data['y'].shape == (g.number_of_nodes('game'), 1, 200)
 
+def test_format_materialization():
+    g = create_test_heterograph()
+    gidx = g._graph
+    num_etypes = len(g.canonical_etypes)
+    etid = g.get_etype_id('plays')
+    gidx.create_formats(['coo', 'csr', 'csc'])
+    for etype in range(num_etypes):
+        assert gidx.formats(etype) == ['coo', 'csr', 'csc']
+
+    # the last format is never released
+    assert gidx.evict_formats(['coo', 'csr'], [etid]) > 0
+    assert gidx.formats(etid) == ['csc']
+    assert gidx.evict_formats('csc', [etid]) == 0
+    assert gidx.formats(etid) == ['csc']
+    # released formats are re-created on demand
+    assert sorted(F.asnumpy(g.successors(1, etype='plays')).tolist()) == [0, 1]
+    assert 'csr' in gidx.formats(etid)
+    assert F.array_equal(g.in_degrees(etype='plays'), F.tensor([2, 2], dtype=F.int64))
+    # the cached degrees are not shared with the returned tensors
+    deg = g.in_degrees(etype='plays')
+    deg += 1
+    assert F.array_equal(g.in_degrees(etype='plays'), F.tensor([2, 2], dtype=F.int64))
+
+    # formats of hot relations are released last
+    gidx.create_formats(['coo', 'csr', 'csc'])
+    total = sum(gidx.format_nbytes(etype, fmt) for etype in range(num_etypes)
+                for fmt in ['coo', 'csr', 'csc'])
+    assert gidx.enforce_format_budget(total - 1, hot_etypes=[etid]) < total
+    assert gidx.formats(etid) == ['coo', 'csr', 'csc']
+    used = gidx.enforce_format_budget(0)
+    for etype in range(num_etypes):
+        assert len(gidx.formats(etype)) == 1
+    assert used == sum(gidx.format_nbytes(etype, gidx.formats(etype)[0])
+                       for etype in range(num_etypes))
+
+    # the relation graphs are converted by several threads
+    gidx.create_formats(['csr', 'csc'], num_threads=4)
+    for etype in range(num_etypes):
+        assert {'csr', 'csc'} <= set(gidx.formats(etype))
+    assert F.array_equal(g.in_degrees(etype='plays'), F.tensor([2, 2], dtype=F.int64))
+
 if __name__ == '__main__':
     test_create()
     test_query()
@@ -1470,3 +1511,4 @@ if __name__ == '__main__':
     test_empty_heterograph()
     test_types_in_function()
     test_stack_reduce()
+    test_format_materialization()
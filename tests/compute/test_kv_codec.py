@@ -0,0 +1,78 @@
+import numpy as np
+from dgl import network
+
+def test_delta_id_codec():
+    codec = network.DeltaIdCodec()
+    for ids in [np.array([], dtype=np.int64),
+                np.arange(0, 1000, 3, dtype=np.int64),
+                np.array([5, 2, 2**40, 7, 0], dtype=np.int64),
+                np.random.randint(0, 2**62, 100).astype(np.int64)]:
+        buf = codec.encode(ids)
+        assert buf.dtype == np.int64
+        assert np.array_equal(codec.decode(buf), ids)
+    # sorted IDs with small gaps take one byte each
+    ids = np.cumsum(np.random.randint(1, 200, 1000)).astype(np.int64)
+    assert codec.encode(ids).nbytes < ids.nbytes // 4
+
+def test_data_codec():
+    data = np.random.randn(50, 8).astype(np.float32)
+    data[3] = 0
+    for codec, tol in [(network.Float16Codec(), 1e-2), (network.Int8RowCodec(), 1e-2)]:
+        buf = codec.encode(data)
+        assert buf.dtype == np.float32
+        assert buf.nbytes < data.nbytes
+        out = codec.decode(buf)
+        assert out.shape == data.shape
+        scale = np.abs(data).max(1, keepdims=True) + 1e-6
+        assert np.all(np.abs(out - data) / scale < tol)
+        empty = codec.decode(codec.encode(np.zeros((0, 8), dtype=np.float32)))
+        assert empty.shape == (0, 8)
+
+def test_topk_sparsifier():
+    sparsifier = network.TopKSparsifier(0.5)
+    ids = np.arange(10, dtype=np.int64)
+    grad = np.ones((10, 4), dtype=np.float32)
+    grad[:5] = 2
+    sent_ids, sent = sparsifier.sparsify(ids, grad)
+    assert np.array_equal(np.sort(sent_ids), np.arange(5))
+    assert np.all(sent == 2)
+    # the residuals are added to the next gradients of the same IDs
+    sent_ids, sent = sparsifier.sparsify(ids[5:], np.zeros((5, 4), dtype=np.float32))
+    assert len(sent_ids) == 3
+    assert np.all(sent == 1)
+
+def test_topk_sparsifier_sparse_ids():
+    sparsifier = network.TopKSparsifier(0.25)
+    ids = np.array([3, 10**12, 7 * 10**10, 5 * 10**11], dtype=np.int64)
+    grad = np.array([[4.], [1.], [2.], [3.]], dtype=np.float32)
+    sent_ids, sent = sparsifier.sparsify(ids, grad)
+    assert sent_ids.tolist() == [3] and sent.tolist() == [[4.]]
+    # only the rows left out are stored, not a table of the largest ID
+    assert sparsifier.num_residuals() == 3
+    sent_ids, sent = sparsifier.sparsify(np.array([10**12, 9], dtype=np.int64),
+                                         np.array([[5.], [1.]], dtype=np.float32))
+    assert sent_ids.tolist() == [10**12] and sent.tolist() == [[6.]]
+    assert sparsifier.num_residuals() == 3
+    assert sparsifier._residual_ids.tolist() == [9, 7 * 10**10, 5 * 10**11]
+
+def test_topk_sparsifier_flush():
+    network.set_kv_codec('test_flush', topk_ratio=0.5)
+    sparsifier = network._KV_CODECS['test_flush'][2]
+    ids = np.array([8, 2, 5, 1], dtype=np.int64)
+    grad = np.array([[4.], [1.], [3.], [2.]], dtype=np.float32)
+    sent_ids, _ = sparsifier.sparsify(ids, grad)
+    assert sorted(sent_ids.tolist()) == [5, 8]
+    # the rows left out are returned by the flush and removed
+    res_ids, res_rows = network.flush_kv_residuals('test_flush')
+    assert res_ids.tolist() == [1, 2] and res_rows.tolist() == [[2.], [1.]]
+    assert sparsifier.num_residuals() == 0
+    assert network.flush_kv_residuals('test_flush') is None
+    network.set_kv_codec('test_flush')
+    assert network.flush_kv_residuals('test_flush') is None
+
+if __name__ == '__main__':
+    test_delta_id_codec()
+    test_data_codec()
+    test_topk_sparsifier()
+    test_topk_sparsifier_sparse_ids()
+    test_topk_sparsifier_flush()
@@ -9,6 +9,7 @@ import backend as F
 import dgl.function as fn
 import pickle
 import io
+import unittest
 
 def _assert_is_identical(g, g2):
     assert g.is_multigraph == g2.is_multigraph
@@ -260,6 +261,23 @@ def test_pickling_heterograph():
     new_g = _reconstruct_pickle(g)
     _assert_is_identical_hetero(g, new_g)
 
+def _has_rdkit():
+    try:
+        import rdkit
+        return True
+    except ImportError:
+        return False
+
+@unittest.skipIf(not _has_rdkit(), reason="RDKit is not installed")
+def test_pickling_featurizer():
+    from rdkit import Chem
+    from dgl.data.chem import CanonicalAtomFeaturizer, CanonicalBondFeaturizer
+    mol = Chem.MolFromSmiles('CCO')
+    for featurizer, name in [(CanonicalAtomFeaturizer(), 'h'), (CanonicalBondFeaturizer(), 'e')]:
+        # the featurizer is pickled after it has been used
+        feats = featurizer(mol)
+        new_featurizer = _reconstruct_pickle(featurizer)
+        assert F.allclose(new_featurizer(mol)[name], feats[name])
 
 if __name__ == '__main__':
     test_pickling_index()
@@ -269,3 +287,4 @@ if __name__ == '__main__':
     test_pickling_nodeflow()
     test_pickling_batched_graph()
     test_pickling_heterograph()
+    test_pickling_featurizer()
@@ -242,6 +242,37 @@ def test_broadcast_edges():
         bg, F.cat([feat0, feat1, feat2, feat3], 0)
     ), ground_truth)
 
+def test_segment_reduce():
+    seglen = [3, 0, 1, 4]
+    value = F.randn((8, 5))
+    segs = [value[0:3], value[3:4], value[4:8]]
+    s = dgl.segment.segment_reduce(seglen, value, 'sum')
+    m = dgl.segment.segment_reduce(seglen, value, 'mean')
+    mx = dgl.segment.segment_reduce(seglen, value, 'max')
+    mn = dgl.segment.segment_reduce(seglen, value, 'min')
+    for i, j in zip([0, 2, 3], range(3)):
+        assert F.allclose(s[i], F.sum(segs[j], 0))
+        assert F.allclose(m[i], F.mean(segs[j], 0))
+        assert F.allclose(mx[i], F.max(segs[j], 0))
+        assert F.allclose(mn[i], F.min(segs[j], 0))
+    # empty segment
+    assert F.allclose(s[1], F.zeros((5,)))
+    assert F.allclose(m[1], F.zeros((5,)))
+    assert F.asnumpy(mx[1]).max() == -float('inf')
+    assert F.asnumpy(mn[1]).min() == float('inf')
+    # softmax
+    sm = dgl.segment.segment_softmax(seglen, value)
+    assert F.allclose(sm[0:3], F.softmax(segs[0], 0))
+    assert F.allclose(sm[4:8], F.softmax(segs[2], 0))
+    # topk with an empty segment and a segment shorter than k
+    val, indices = dgl.segment.segment_topk(seglen, value, 2, idx=0)
+    assert F.shape(val) == (4, 2, 5)
+    assert F.allclose(val[1], F.zeros((2, 5)))
+    assert F.allclose(val[2, 0], value[3])
+    assert F.allclose(val[2, 1], F.zeros((5,)))
+    gt = F.argsort(F.slice_axis(segs[2], -1, 0, 1), 0, True)[:2]
+    assert F.allclose(indices[3], F.reshape(gt, (2,)))
+
 if __name__ == '__main__':
     test_simple_readout()
     test_topk_nodes()
@@ -250,3 +281,4 @@ if __name__ == '__main__':
     test_softmax_edges()
     test_broadcast_nodes()
     test_broadcast_edges()
+    test_segment_reduce()
@@ -708,6 +708,59 @@ def test_negative_sampler():
     #disable this check for now. It might take too long time.
     #check_negative_sampler('head', False, 100)
 
+def test_negative_index_sampler():
+    g = generate_rand_graph(100)
+    num_edges = g.number_of_edges()
+    rels = F.tensor(np.random.randint(0, 5, num_edges), F.int64)
+
+    def sample_epoch(sampler):
+        return [tuple(F.asnumpy(x) for x in batch) for batch in sampler]
+
+    sampler = dgl.contrib.sampling.NegativeIndexSampler(
+        g, 50, 10, negative_mode='chunk-tail', relations=rels, seed=1)
+    batches = sample_epoch(sampler)
+    src, dst = g.all_edges(order='eid')
+    src, dst, rels = F.asnumpy(src), F.asnumpy(dst), F.asnumpy(rels)
+    for heads, brels, tails, neg_nodes in batches:
+        assert len(heads) % 10 == 0
+        assert neg_nodes.shape == (len(heads) // 10, 10)
+        assert np.all((neg_nodes >= 0) & (neg_nodes < g.number_of_nodes()))
+        # the positive edges are edges of the graph
+        eids = F.asnumpy(g.edge_ids(F.tensor(heads), F.tensor(tails)))
+        assert np.array_equal(rels[eids], brels)
+
+    # the same seed, rank and epoch give the same samples
+    same = sample_epoch(dgl.contrib.sampling.NegativeIndexSampler(
+        g, 50, 10, negative_mode='chunk-tail', relations=rels, seed=1))
+    for batch, same_batch in zip(batches, same):
+        for x, y in zip(batch, same_batch):
+            assert np.array_equal(x, y)
+    # but a new epoch does not
+    assert not np.array_equal(batches[0][3], sample_epoch(sampler)[0][3])
+
+    # nodes of zero weight are never sampled
+    node_weight = np.ones((g.number_of_nodes(),), dtype=np.float32)
+    node_weight[::2] = 0
+    sampler = dgl.contrib.sampling.NegativeIndexSampler(
+        g, 20, 10, negative_mode='head', node_weight=F.tensor(node_weight))
+    for heads, brels, _, neg_nodes in sampler:
+        assert brels is None
+        neg_nodes = F.asnumpy(neg_nodes)
+        assert neg_nodes.shape == (len(heads), 10)
+        assert np.all(neg_nodes % 2 == 1)
+    sampler = dgl.contrib.sampling.NegativeIndexSampler(
+        g, 20, 10, node_weight='degree')
+    degree = F.asnumpy(g.in_degrees() + g.out_degrees())
+    for _, _, _, neg_nodes in sampler:
+        assert np.all(degree[F.asnumpy(neg_nodes)] > 0)
+
+    # the number of batches agrees with the batches yielded, including a last
+    # batch shorter than one chunk
+    for num_seeds in [0, 9, 10, 49, 50, 59, 60, 99]:
+        sampler = dgl.contrib.sampling.NegativeIndexSampler(
+            g, 50, 10, seed_edges=F.arange(0, num_seeds))
+        assert len(sampler) == len(list(sampler))
+
 
 if __name__ == '__main__':
     test_create_full()
@@ -719,3 +772,4 @@ if __name__ == '__main__':
     test_nonuniform_neighbor_sampler()
     test_setseed()
     test_negative_sampler()
+    test_negative_index_sampler()
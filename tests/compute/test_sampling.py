@@ -452,6 +452,102 @@ def test_sample_neighbors_topk_outedge():
     _test_sample_neighbors_topk_outedge(False)
     _test_sample_neighbors_topk_outedge(True)
 
+@unittest.skipIf(F._default_context_str == 'gpu', reason="GPU sample neighbors not implemented")
+def test_neighbor_sampling_loader():
+    g = dgl.graph([(i, j) for i in range(20) for j in range(20) if i != j])
+    g.ndata['x'] = F.randn((20, 3))
+    seeds = F.arange(0, 10)
+    loader = dgl.sampling.NeighborSamplingLoader(
+        g, seeds, [2, 3], batch_size=4, shuffle=True, node_feats=['x'],
+        num_workers=2, prefetch=1)
+    assert len(loader) == 3
+    all_seeds = []
+    for batch_seeds, graphs in loader:
+        assert len(graphs) == 2
+        all_seeds.extend(F.asnumpy(batch_seeds).tolist())
+        # the output nodes of each layer are the first input nodes
+        nid1 = F.asnumpy(graphs[1].ndata[dgl.NID])
+        nid0 = F.asnumpy(graphs[0].ndata[dgl.NID])
+        assert np.array_equal(nid1[:len(batch_seeds)], F.asnumpy(batch_seeds))
+        assert np.array_equal(nid0[:len(nid1)], nid1)
+        assert F.allclose(graphs[0].ndata['x'], F.gather_row(g.ndata['x'], graphs[0].ndata[dgl.NID]))
+        assert F.allclose(graphs[1].ndata['x'], F.gather_row(g.ndata['x'], graphs[1].ndata[dgl.NID]))
+        assert F.asnumpy(graphs[1].in_degrees(F.arange(0, len(batch_seeds)))).max() <= 3
+        src, dst = graphs[1].edges(order='eid')
+        osrc, odst = g.find_edges(graphs[1].edata[dgl.EID])
+        assert F.array_equal(F.gather_row(graphs[1].ndata[dgl.NID], src), osrc)
+        assert F.array_equal(F.gather_row(graphs[1].ndata[dgl.NID], dst), odst)
+    assert sorted(all_seeds) == list(range(10))
+
+    loader = dgl.sampling.NeighborSamplingLoader(
+        g, seeds, [2], batch_size=4, drop_last=True)
+    assert len(loader) == 2
+    assert len(list(loader)) == 2
+
+    # an interrupted iteration does not leave samplers writing the buffers of
+    # the next one
+    loader = dgl.sampling.NeighborSamplingLoader(
+        g, F.arange(0, 20), [5, 5], batch_size=2, node_feats=['x'],
+        num_workers=4, prefetch=3)
+    for _ in range(3):
+        for batch_seeds, graphs in loader:
+            break
+        all_seeds = []
+        for batch_seeds, graphs in loader:
+            all_seeds.extend(F.asnumpy(batch_seeds).tolist())
+            for graph in graphs:
+                assert F.allclose(graph.ndata['x'],
+                                  F.gather_row(g.ndata['x'], graph.ndata[dgl.NID]))
+        assert all_seeds == list(range(20))
+
+def test_neighbor_sampling_loader_workers():
+    g = dgl.graph([(i, j) for i in range(20) for j in range(20) if i != j])
+    g.ndata['x'] = F.randn((20, 3))
+    # sampling all the neighbors is deterministic up to the order of edges,
+    # so several workers give the minibatches of one worker in the same order
+    def _batches(num_workers):
+        loader = dgl.sampling.NeighborSamplingLoader(
+            g, F.arange(0, 20), [19, 19], batch_size=3, node_feats=['x'],
+            num_workers=num_workers, prefetch=4)
+        batches = []
+        for batch_seeds, graphs in loader:
+            eids = [sorted(F.asnumpy(graph.edata[dgl.EID]).tolist()) for graph in graphs]
+            for graph in graphs:
+                assert F.allclose(graph.ndata['x'],
+                                  F.gather_row(g.ndata['x'], graph.ndata[dgl.NID]))
+            batches.append((F.asnumpy(batch_seeds).tolist(), eids))
+        return batches
+    expected = _batches(1)
+    assert len(expected) == 7
+    for num_workers in [2, 4]:
+        assert _batches(num_workers) == expected
+
+def test_feature_fetcher():
+    g = dgl.graph([(0, 1), (1, 2)], 'user', 'follows', card=10)
+    g.ndata['x'] = F.randn((10, 3))
+    fetcher = dgl.sampling.FeatureFetcher(g, ['x', 'y'], 2)
+    ids = F.tensor([3, 1, 4], dtype=F.int64)
+    feats = fetcher.fetch({'user' : ids}, 0)
+    assert set(feats['user'].keys()) == {'x'}
+    assert F.allclose(feats['user']['x'], F.gather_row(g.ndata['x'], ids))
+    # other slots are untouched
+    feats1 = fetcher.fetch({'user' : F.tensor([0, 9], dtype=F.int64)}, 1)
+    assert F.allclose(feats['user']['x'], F.gather_row(g.ndata['x'], ids))
+    assert F.allclose(feats1['user']['x'], F.gather_row(g.ndata['x'], F.tensor([0, 9])))
+    # buffers grow on demand
+    ids = F.arange(0, 10)
+    feats = fetcher.fetch({'user' : ids}, 0)
+    assert F.allclose(feats['user']['x'], g.ndata['x'])
+    # features that require grad are gathered out of the buffers
+    emb = F.attach_grad(F.randn((10, 3)))
+    with F.record_grad():
+        g.ndata['x'] = emb
+        feats = fetcher.fetch({'user' : F.tensor([3, 1, 3], dtype=F.int64)}, 0)
+        F.backward(F.reduce_sum(feats['user']['x']))
+    expected = np.zeros((10, 3), dtype=np.float32)
+    expected[[1, 3]] = [[1, 1, 1], [2, 2, 2]]
+    assert np.allclose(F.asnumpy(F.grad(emb)), expected)
+
 if __name__ == '__main__':
     test_random_walk()
     test_pack_traces()
@@ -460,3 +556,6 @@ if __name__ == '__main__':
     test_sample_neighbors_outedge()
     test_sample_neighbors_topk()
     test_sample_neighbors_topk_outedge()
+    test_neighbor_sampling_loader()
+    test_neighbor_sampling_loader_workers()
+    test_feature_fetcher()
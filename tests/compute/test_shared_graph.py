@@ -0,0 +1,116 @@
+import gc
+import dgl
+import backend as F
+import numpy as np
+import unittest
+from multiprocessing import Process, Queue
+from dgl.contrib.shared_graph import share_graph, attach_graph
+
+def _check_in_worker(name, queue):
+    try:
+        g = attach_graph(name).graph
+        # write through the shared memory
+        g.ndata['h'][0] = 10.
+        queue.put((F.asnumpy(g.edata['w']), g.number_of_edges()))
+    except Exception as e:
+        queue.put(e)
+
+@unittest.skipIf(dgl.backend.backend_name == "tensorflow", reason="TF tensors are immutable")
+def test_shared_graph():
+    g = dgl.DGLGraph()
+    g.add_nodes(5)
+    g.add_edges([0, 1, 2, 3], [1, 2, 3, 4])
+    g.ndata['h'] = F.zeros((5, 2))
+    g.edata['w'] = F.randn((4, 3))
+    handle = share_graph(g, 'test_shared_graph')
+    sg = handle.graph
+    assert F.allclose(sg.edata['w'], g.edata['w'])
+    src, dst = sg.all_edges(order='eid')
+    assert F.asnumpy(src).tolist() == [0, 1, 2, 3]
+    assert F.asnumpy(dst).tolist() == [1, 2, 3, 4]
+
+    queue = Queue()
+    p = Process(target=_check_in_worker, args=('test_shared_graph', queue))
+    p.start()
+    ret = queue.get()
+    p.join()
+    assert not isinstance(ret, Exception), ret
+    assert np.allclose(ret[0], F.asnumpy(g.edata['w']))
+    assert ret[1] == 4
+    assert F.asnumpy(sg.ndata['h'])[0].tolist() == [10., 10.]
+
+    handle.close()
+    # the last reference has been released
+    try:
+        attach_graph('test_shared_graph')
+        fail = True
+    except dgl.DGLError:
+        fail = False
+    assert not fail
+
+@unittest.skipIf(dgl.backend.backend_name == "tensorflow", reason="TF tensors are immutable")
+def test_shared_graph_kept_by_graph():
+    g = dgl.DGLGraph()
+    g.add_nodes(3)
+    g.add_edges([0, 1], [1, 2])
+    g.ndata['h'] = F.ones((3, 2))
+    # the handles are discarded but their graphs keep the references
+    sg = share_graph(g, 'test_shared_graph_kept').graph
+    sg2 = attach_graph('test_shared_graph_kept').graph
+    gc.collect()
+    handle = attach_graph('test_shared_graph_kept')
+    assert F.allclose(handle.graph.ndata['h'], sg.ndata['h'])
+    handle.close()
+    del sg, sg2
+    gc.collect()
+    try:
+        attach_graph('test_shared_graph_kept')
+        fail = True
+    except dgl.DGLError:
+        fail = False
+    assert not fail
+
+def test_share_graph_failure():
+    # a graph that cannot be published does not take the name
+    for _ in range(2):
+        try:
+            share_graph('not a graph', 'test_shared_graph_failure')
+            fail = True
+        except dgl.DGLError as e:
+            fail = 'already exists' in str(e)
+        assert not fail
+    g = dgl.DGLGraph()
+    g.add_nodes(2)
+    handle = share_graph(g, 'test_shared_graph_failure')
+    assert handle.graph.number_of_nodes() == 2
+    handle.close()
+
+@unittest.skipIf(dgl.backend.backend_name == "tensorflow", reason="TF tensors are immutable")
+def test_shared_heterograph():
+    g = dgl.heterograph({
+        ('user', 'follows', 'user'): [(2, 1), (0, 1), (1, 2), (0, 2)],
+        ('user', 'plays', 'game'): [(0, 0), (1, 0), (2, 1)]})
+    g.nodes['user'].data['h'] = F.randn((3, 4))
+    g.edges['plays'].data['w'] = F.randn((3, 1))
+    handle = share_graph(g, 'test_shared_heterograph')
+    sg = attach_graph('test_shared_heterograph').graph
+    assert sg.canonical_etypes == g.canonical_etypes
+    # the relation graphs are created on the shared CSR
+    for etid in range(len(sg.canonical_etypes)):
+        assert sg._graph.formats(etid) == ['csr']
+    assert sorted(F.asnumpy(sg.successors(0, etype='follows')).tolist()) == [1, 2]
+    assert sg.number_of_nodes('game') == 2
+    for etype in g.canonical_etypes:
+        src, dst = g.all_edges(order='eid', etype=etype)
+        ssrc, sdst = sg.all_edges(order='eid', etype=etype)
+        assert F.array_equal(src, ssrc)
+        assert F.array_equal(dst, sdst)
+    assert F.allclose(sg.nodes['user'].data['h'], g.nodes['user'].data['h'])
+    assert F.allclose(sg.edges['plays'].data['w'], g.edges['plays'].data['w'])
+    handle.close()
+
+if __name__ == '__main__':
+    test_shared_graph()
+    test_shared_graph_kept_by_graph()
+    test_share_graph_failure()
+    test_shared_heterograph()
@@ -3,9 +3,16 @@
 
 import subprocess
 import os
+import shutil
+import time
+from multiprocessing import Process
 from pathlib import Path
 import numpy as np
 import tempfile
+import dgl
+import dgl.function as fn
+from dgl import backend as F
+from dgl.data.utils import save_graphs, load_graphs
 
 base_path = Path("~/regression/dgl/")
 
@@ -57,3 +64,287 @@ class GCNBenchmark:
 
 GCNBenchmark.track_gcn_time.unit = 's'
 GCNBenchmark.track_gcn_accuracy.unit = '%'
+
+
+#
+# Microbenchmarks of the core operators.
+#
+# Each benchmark runs on synthetic graphs from ``dgl.rand_graph`` at several
+# scales. ``time_*`` methods track the run time and ``peakmem_*`` methods the
+# peak resident memory of the benchmark process, so regressions in either are
+# caught when comparing commits with ``asv continuous``.
+#
+
+# (number of nodes, number of edges)
+GRAPH_SCALES = [(1000, 10000), (10000, 200000), (100000, 2000000)]
+FEAT_SIZE = 16
+
+
+def _randn(*shape):
+    return F.tensor(np.random.randn(*shape).astype(np.float32))
+
+
+def _rand_graph(num_nodes, num_edges):
+    # rand_graph draws from the C++ generator of dgl.random, and the features
+    # from numpy
+    dgl.random.seed(42)
+    np.random.seed(42)
+    return dgl.rand_graph(num_nodes, num_edges)
+
+
+def _rand_dglgraph(num_nodes, num_edges):
+    src, dst = _rand_graph(num_nodes, num_edges).edges(order='eid')
+    g = dgl.DGLGraph()
+    g.add_nodes(num_nodes)
+    g.add_edges(src, dst)
+    return g
+
+
+def _udf_message(edges):
+    return {'m' : edges.src['h']}
+
+
+def _udf_reduce(nodes):
+    return {'h_new' : F.sum(nodes.mailbox['m'], 1)}
+
+
+class UpdateAllBenchmark:
+
+    params = [GRAPH_SCALES, ['builtin', 'udf']]
+    param_names = ['scale', 'func']
+    timeout = 300
+
+    def setup(self, scale, func):
+        if func == 'udf' and scale[1] > 200000:
+            raise NotImplementedError('UDF degree bucketing is too slow at this scale.')
+        self.g = _rand_graph(*scale)
+        self.g.ndata['h'] = _randn(scale[0], FEAT_SIZE)
+        if func == 'builtin':
+            self.funcs = (fn.copy_u('h', 'm'), fn.sum('m', 'h_new'))
+        else:
+            self.funcs = (_udf_message, _udf_reduce)
+
+    def time_update_all(self, scale, func):
+        self.g.update_all(*self.funcs)
+
+    def peakmem_update_all(self, scale, func):
+        self.g.update_all(*self.funcs)
+
+
+class SampleNeighborsBenchmark:
+
+    params = [GRAPH_SCALES, [5, 25]]
+    param_names = ['scale', 'fanout']
+
+    def setup(self, scale, fanout):
+        self.g = _rand_graph(*scale)
+        self.seeds = F.arange(0, min(1000, scale[0]))
+        # build the in-edge CSC once outside of the timed region
+        dgl.sampling.sample_neighbors(self.g, self.seeds, fanout)
+
+    def time_sample_neighbors(self, scale, fanout):
+        dgl.sampling.sample_neighbors(self.g, self.seeds, fanout)
+
+    def peakmem_sample_neighbors(self, scale, fanout):
+        dgl.sampling.sample_neighbors(self.g, self.seeds, fanout)
+
+
+class RandomWalkBenchmark:
+
+    params = [GRAPH_SCALES, [16, 64]]
+    param_names = ['scale', 'length']
+
+    def setup(self, scale, length):
+        self.g = _rand_graph(*scale)
+        self.seeds = F.arange(0, scale[0])
+
+    def time_random_walk(self, scale, length):
+        dgl.sampling.random_walk(self.g, self.seeds, length=length)
+
+    def peakmem_random_walk(self, scale, length):
+        dgl.sampling.random_walk(self.g, self.seeds, length=length)
+
+
+class TransformBenchmark:
+
+    params = [GRAPH_SCALES]
+    param_names = ['scale']
+
+    def setup(self, scale):
+        self.g = _rand_graph(*scale)
+        # a multigraph with every edge duplicated
+        src, dst = self.g.edges(order='eid')
+        self.multi_g = dgl.graph((F.cat([src, src], 0), F.cat([dst, dst], 0)),
+                                 card=scale[0], validate=False)
+        self.frontier = dgl.sampling.sample_neighbors(
+            self.g, F.arange(0, min(1000, scale[0])), 10)
+
+    def time_to_simple(self, scale):
+        dgl.to_simple(self.multi_g)
+
+    def peakmem_to_simple(self, scale):
+        dgl.to_simple(self.multi_g)
+
+    def time_compact_graphs(self, scale):
+        dgl.compact_graphs(self.frontier)
+
+    def peakmem_compact_graphs(self, scale):
+        dgl.compact_graphs(self.frontier)
+
+
+class BatchBenchmark:
+
+    # (number of graphs, nodes per graph, edges per graph)
+    params = [[(1000, 20, 50), (10000, 20, 50), (100, 1000, 5000)]]
+    param_names = ['scale']
+
+    def setup(self, scale):
+        num_graphs, num_nodes, num_edges = scale
+        self.graphs = []
+        for _ in range(num_graphs):
+            g = _rand_dglgraph(num_nodes, num_edges)
+            g.ndata['h'] = _randn(num_nodes, FEAT_SIZE)
+            g.edata['w'] = _randn(num_edges, 1)
+            self.graphs.append(g)
+        self.bg = dgl.batch(self.graphs)
+
+    def time_batch(self, scale):
+        dgl.batch(self.graphs)
+
+    def peakmem_batch(self, scale):
+        dgl.batch(self.graphs)
+
+    def time_unbatch(self, scale):
+        dgl.unbatch(self.bg)
+
+    def peakmem_unbatch(self, scale):
+        dgl.unbatch(self.bg)
+
+
+class SerializeBenchmark:
+
+    params = [[(100, 1000, 10000), (10, 100000, 1000000)], [1, 2]]
+    param_names = ['scale', 'version']
+    timeout = 300
+
+    def setup(self, scale, version):
+        num_graphs, num_nodes, num_edges = scale
+        self.graphs = []
+        for _ in range(num_graphs):
+            g = _rand_dglgraph(num_nodes, num_edges)
+            g.ndata['h'] = _randn(num_nodes, FEAT_SIZE)
+            self.graphs.append(g)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.save_path = os.path.join(self.tmp_dir, 'save.bin')
+        self.load_path = os.path.join(self.tmp_dir, 'load.bin')
+        save_graphs(self.load_path, self.graphs, version=version)
+
+    def teardown(self, scale, version):
+        shutil.rmtree(self.tmp_dir)
+
+    def time_save_graphs(self, scale, version):
+        save_graphs(self.save_path, self.graphs, version=version)
+
+    def peakmem_save_graphs(self, scale, version):
+        save_graphs(self.save_path, self.graphs, version=version)
+
+    def time_load_graphs(self, scale, version):
+        load_graphs(self.load_path)
+
+    def peakmem_load_graphs(self, scale, version):
+        load_graphs(self.load_path)
+
+
+def _run_kvstore_server(ip_config, server_id, data):
+    server_namebook = dgl.contrib.read_ip_config(filename=ip_config)
+    server = dgl.contrib.KVServer(server_id=server_id, server_namebook=server_namebook,
+                                  num_client=1)
+    if data is not None:
+        server.init_data(name='embed', data_tensor=data)
+    server.start()
+
+
+class KVStoreBenchmark:
+    """Push/pull through two servers over loopback.
+
+    All rows are partitioned to the second "machine", so that every request
+    goes through the socket instead of the local shared-memory path.
+    """
+
+    params = [[(100000, 1000), (1000000, 100000)], [16, 400]]
+    param_names = ['scale', 'dim']
+    timeout = 300
+
+    def setup(self, scale, dim):
+        num_rows, batch_size = scale
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cwd = os.getcwd()
+        # kvstore writes its shape files into the working directory
+        os.chdir(self.tmp_dir)
+        port = np.random.randint(20000, 40000)
+        ip_config = os.path.join(self.tmp_dir, 'ip_config.txt')
+        with open(ip_config, 'w') as f:
+            f.write('127.0.0.1 {} 1\n127.0.0.1 {} 1\n'.format(port, port + 1))
+        data = F.zeros((num_rows, dim), F.float32, F.cpu())
+        self.servers = [Process(target=_run_kvstore_server, args=(ip_config, 0, None)),
+                        Process(target=_run_kvstore_server, args=(ip_config, 1, data))]
+        for p in self.servers:
+            p.start()
+        time.sleep(2)
+        self.client = dgl.contrib.KVClient(
+            server_namebook=dgl.contrib.read_ip_config(filename=ip_config))
+        self.client.set_partition_book(name='embed',
+                                       partition_book=F.ones((num_rows,), F.int64, F.cpu()))
+        self.client.connect()
+        self.ids = F.tensor(np.random.randint(0, num_rows, batch_size))
+        self.data = _randn(batch_size, dim)
+
+    def teardown(self, scale, dim):
+        self.client.shut_down()
+        for p in self.servers:
+            p.join()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp_dir)
+
+    def time_push(self, scale, dim):
+        self.client.push(name='embed', id_tensor=self.ids, data_tensor=self.data)
+        # push is asynchronous; the barrier waits for the servers to apply it
+        self.client.barrier()
+
+    def time_pull(self, scale, dim):
+        self.client.pull(name='embed', id_tensor=self.ids)
+
+    def peakmem_pull(self, scale, dim):
+        self.client.pull(name='embed', id_tensor=self.ids)
+
+
+def _push_handler(name, ID, data, target):
+    target[name][ID] = data
+
+
+class StripedLockBenchmark:
+    """Apply a push to a tensor directly and under the row locks of
+    ``lock_shared_data``, which split the push by stripes of rows."""
+
+    params = [[(100000, 1000), (1000000, 100000)], [False, True]]
+    param_names = ['scale', 'locked']
+    timeout = 120
+
+    def setup(self, scale, locked):
+        num_rows, batch_size = scale
+        self.tmp_dir = tempfile.mkdtemp()
+        self.target = {'embed' : F.zeros((num_rows, FEAT_SIZE), F.float32, F.cpu())}
+        self.lock = dgl.contrib.dis_kvstore.StripedLock(
+            os.path.join(self.tmp_dir, 'embed-lock'), num_rows)
+        self.ids = F.tensor(np.random.randint(0, num_rows, batch_size))
+        self.data = _randn(batch_size, FEAT_SIZE)
+
+    def teardown(self, scale, locked):
+        del self.lock
+        shutil.rmtree(self.tmp_dir)
+
+    def time_push(self, scale, locked):
+        if locked:
+            self.lock.apply(_push_handler, 'embed', self.ids, self.data, self.target)
+        else:
+            _push_handler('embed', self.ids, self.data, self.target)